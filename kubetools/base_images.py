@@ -0,0 +1,155 @@
+'''
+Cache of the base (FROM) images of Dockerfiles, so builds only check the registry
+for newer base images every BASE_IMAGE_CHECK_INTERVAL seconds, rather than on
+every build with `--pull`.
+'''
+
+import json
+import re
+
+from os import makedirs, path
+from threading import Lock
+from time import time
+
+import docker
+
+from kubetools.log import logger
+from kubetools.settings import get_settings, get_settings_directory
+
+BASE_IMAGES_FILENAME = 'base-images.json'
+
+ARG_REGEX = re.compile(r'^\s*ARG\s+(\w+)=(\S+)', re.IGNORECASE)
+FROM_REGEX = re.compile(r'^\s*FROM\s+(?:--\S+\s+)*(\S+)(?:\s+AS\s+(\S+))?', re.IGNORECASE)
+VARIABLE_REGEX = re.compile(r'\$\{?(\w+)\}?')
+
+# Dev builds run in threads, only check each image once at a time
+BASE_IMAGES_LOCK = Lock()
+
+
+def get_base_images(dockerfile, build_args=None):
+    '''
+    Get the base images of a Dockerfile, ignoring scratch and previous stages.
+    '''
+
+    with open(dockerfile, 'r') as f:
+        lines = f.read().splitlines()
+
+    # ARGs before the first FROM can be used in FROM lines
+    args = {}
+    base_images = []
+    stage_names = set()
+    seen_from = False
+
+    for line in lines:
+        match = FROM_REGEX.match(line)
+        if match:
+            seen_from = True
+            image, stage_name = match.groups()
+            image = VARIABLE_REGEX.sub(
+                lambda variable: (build_args or {}).get(
+                    variable.group(1),
+                    args.get(variable.group(1), variable.group(0)),
+                ),
+                image,
+            )
+
+            if image not in stage_names and image.lower() != 'scratch':
+                base_images.append(image)
+            if stage_name:
+                stage_names.add(stage_name)
+
+        elif not seen_from:
+            match = ARG_REGEX.match(line)
+            if match:
+                args[match.group(1)] = match.group(2).strip('"\'')
+
+    return base_images
+
+
+def _get_cache_filename():
+    return path.join(get_settings_directory(), BASE_IMAGES_FILENAME)
+
+
+def _load_cache():
+    cache_filename = _get_cache_filename()
+    if not path.exists(cache_filename):
+        return {}
+
+    try:
+        with open(cache_filename, 'r') as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def _save_cache(cache):
+    cache_filename = _get_cache_filename()
+    makedirs(path.dirname(cache_filename), exist_ok=True)
+
+    with open(cache_filename, 'w') as f:
+        json.dump(cache, f, indent=4, sort_keys=True)
+
+
+def _pull_image(docker_client, image):
+    repository, tag = docker.utils.parse_repository_tag(image)
+    pulled_image = docker_client.images.pull(repository, tag=tag or 'latest')
+
+    for repo_digest in pulled_image.attrs.get('RepoDigests', []):
+        if repo_digest.split('@', 1)[0] == repository:
+            return repo_digest.split('@', 1)[1]
+
+    return pulled_image.id
+
+
+def ensure_base_images(dockerfile, build_args=None, log=logger.info):
+    '''
+    Pull any base images of a Dockerfile not checked within the check interval.
+
+    Returns False if any base image can't be worked out (eg set by build args), in
+    which case the build should be run with `--pull`.
+    '''
+
+    base_images = get_base_images(dockerfile, build_args=build_args)
+    if any('$' in image for image in base_images):
+        return False
+
+    check_interval = int(get_settings().BASE_IMAGE_CHECK_INTERVAL)
+
+    with BASE_IMAGES_LOCK:
+        cache = _load_cache()
+        docker_client = None
+
+        for image in base_images:
+            # Images pinned to a digest never change
+            if '@' in image:
+                continue
+
+            checked_at = cache.get(image, {}).get('checked', 0)
+            if time() - checked_at < check_interval:
+                continue
+
+            if docker_client is None:
+                docker_client = docker.from_env()
+
+            log(f'Checking for updated base image: {image}')
+
+            try:
+                digest = _pull_image(docker_client, image)
+            except docker.errors.APIError as e:
+                # Build against the local image (if any) when we can't reach the registry
+                logger.warning(f'Could not check base image {image}: {e}')
+                continue
+
+            if cache.get(image, {}).get('digest') not in (None, digest):
+                log(f'Base image {image} updated to {digest}')
+
+            cache[image] = {
+                'digest': digest,
+                'checked': time(),
+            }
+
+        if docker_client is not None:
+            docker_client.close()
+            _save_cache(cache)
+
+    return True
@@ -129,6 +129,12 @@ def _validate_key_value_argument(ctx, param, value):
     default=True,
     help='Delete jobs after they complete.',
 )
+@click.option(
+    '--prepull',
+    is_flag=True,
+    default=False,
+    help='Pull the images onto the nodes before updating any deployments.',
+)
 @click.argument('namespace')
 @click.argument(
     'app_dirs',
@@ -148,6 +154,7 @@ def deploy(
     file,
     ignore_git_changes,
     delete_completed_jobs,
+    prepull,
     namespace,
     app_dirs,
 ):
@@ -207,6 +214,7 @@ def deploy(
         jobs,
         cronjobs,
         delete_completed_jobs=delete_completed_jobs,
+        prepull=prepull,
     )
 
 
@@ -1,11 +1,16 @@
 import json
 
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob, has_magic
+from os import makedirs, path, remove
 
 import click
 import yaml
 
 from kubetools.config import load_kubetools_config
+from kubetools.deploy.util import run_shell_command
+from kubetools.exceptions import KubeConfigError
 from kubetools.kubernetes.api import get_object_name
 from kubetools.kubernetes.config import generate_kubernetes_configs_for_project
 
@@ -14,6 +19,18 @@ from . import cli_bootstrap
 
 yaml.Dumper.ignore_aliases = lambda *args: True
 
+
+class RenderDumper(getattr(yaml, 'CSafeDumper', yaml.SafeDumper)):
+    '''
+    Fast (libyaml, when available) YAML dumper for rendering many configs.
+    '''
+
+    def ignore_aliases(self, data):
+        return True
+
+
+KUBETOOLS_FILENAMES = ('kubetools.yml', 'kubetools.yaml')
+
 FORMATTERS = {
     'json': lambda d: json.dumps(d, indent=4),
     'yaml': lambda d: yaml.dump(d),
@@ -76,3 +93,185 @@ def echo_resources(resources, resource_kind, output_format):
         click.echo(f'{resource_kind}: {click.style(name, bold=True)}')
         click.echo(formatter(resource))
         click.echo()
+
+
+def _get_app_dirs(app_dir_patterns):
+    app_dirs = []
+
+    for pattern in app_dir_patterns:
+        dirnames = sorted(glob(pattern)) if has_magic(pattern) else [pattern]
+
+        for dirname in dirnames:
+            dirname = path.normpath(dirname)
+
+            if dirname in app_dirs:
+                continue
+
+            if any(
+                path.exists(path.join(dirname, filename))
+                for filename in KUBETOOLS_FILENAMES
+            ):
+                app_dirs.append(dirname)
+            # Globs can match anything, only complain about explicit directories
+            elif not has_magic(pattern):
+                raise KubeConfigError(f'No kubetools config found in {dirname}')
+
+    return app_dirs
+
+
+def _get_changed_app_dirs(app_dirs, git_ref):
+    # Diff all the apps in one git call, paths are output relative to the cwd
+    changed_filenames = run_shell_command(
+        'git', 'diff', '--name-only', '--relative', git_ref, '--', *app_dirs,
+    ).decode().splitlines()
+
+    # Diffs don't include untracked files, eg an app that's not committed yet
+    changed_filenames.extend(run_shell_command(
+        'git', 'ls-files', '--others', '--exclude-standard', '--', *app_dirs,
+    ).decode().splitlines())
+
+    changed_app_dirs = set()
+
+    for app_dir in app_dirs:
+        app_dir_prefix = path.join(path.relpath(app_dir), '')
+
+        for filename in changed_filenames:
+            if app_dir_prefix == './' or filename.startswith(app_dir_prefix):
+                changed_app_dirs.add(app_dir)
+                break
+
+    return [app_dir for app_dir in app_dirs if app_dir in changed_app_dirs]
+
+
+def _render_app(app_dir, env, replicas, default_registry):
+    kubetools_config = load_kubetools_config(app_dir, env=env)
+    context_to_image = defaultdict(lambda: 'IMAGE')
+
+    services, deployments, jobs, cronjobs = generate_kubernetes_configs_for_project(
+        kubetools_config,
+        replicas=replicas,
+        context_name_to_image=context_to_image,
+        default_registry=default_registry,
+    )
+
+    objects = []
+    for kind, resources in (
+        ('service', services),
+        ('deployment', deployments),
+        ('job', jobs),
+        ('cronjob', cronjobs),
+    ):
+        for resource in resources:
+            objects.append((kind, get_object_name(resource), resource))
+
+    return kubetools_config['name'], objects
+
+
+def _write_app_objects(output_dir, app_name, objects):
+    app_output_dir = path.join(output_dir, app_name)
+    makedirs(app_output_dir, exist_ok=True)
+
+    # Remove any previously rendered objects, which may no longer exist
+    for filename in glob(path.join(app_output_dir, '*.yml')):
+        remove(filename)
+
+    for kind, name, resource in objects:
+        filename = path.join(app_output_dir, f'{kind}-{name}.yml')
+
+        with open(filename, 'w') as f:
+            yaml.dump(resource, f, Dumper=RenderDumper, default_flow_style=False)
+
+
+@cli_bootstrap.command(help_priority=5)
+@click.option(
+    '--replicas',
+    type=int,
+    default=1,
+    help='Default number of replicas for each app.',
+)
+@click.option(
+    '--default-registry',
+    help='Default registry for apps that do not specify.',
+)
+@click.option(
+    '--output-dir',
+    type=click.Path(file_okay=False),
+    help=(
+        'Write one file per object into this directory (APP_NAME/KIND-NAME.yml) '
+        'rather than a multi-document YAML stream to stdout.'
+    ),
+)
+@click.option(
+    '--changed-since',
+    metavar='GIT_REF',
+    help='Only render apps with changes since this git ref.',
+)
+@click.option(
+    '--workers',
+    type=int,
+    help='Number of processes to render with (defaults to the number of CPUs).',
+)
+@click.argument('app_dirs', nargs=-1, required=True)
+@click.pass_context
+def render(
+    ctx, replicas, default_registry,
+    output_dir, changed_since, workers, app_dirs,
+):
+    '''
+    Generate Kubernetes configs for many projects at once.
+
+    APP_DIRS can be directories or glob patterns (eg "services/*").
+    '''
+
+    env = ctx.meta['kube_context']
+
+    app_dirs = _get_app_dirs(app_dirs)
+
+    if changed_since:
+        app_dirs = _get_changed_app_dirs(app_dirs, changed_since)
+
+    if not app_dirs:
+        click.echo('No apps to render', err=True)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_render_app, app_dir, env, replicas, default_registry)
+            for app_dir in app_dirs
+        ]
+
+        rendered_apps = []
+        for app_dir, future in zip(app_dirs, futures):
+            try:
+                rendered_apps.append(future.result())
+            except Exception as e:
+                raise KubeConfigError(f'Failed to render {app_dir}: {e}')
+
+    if output_dir:
+        app_name_to_dir = {}
+
+        for app_dir, (app_name, _) in zip(app_dirs, rendered_apps):
+            # Objects are written to a directory per app name, which must be unique
+            if app_name in app_name_to_dir:
+                raise KubeConfigError((
+                    f'Cannot render multiple apps named {app_name} to one output dir: '
+                    f'{app_name_to_dir[app_name]}, {app_dir}'
+                ))
+            app_name_to_dir[app_name] = app_dir
+
+        # Only write once every app is valid, so a bad one doesn't leave a partial output
+        for app_name, objects in rendered_apps:
+            _write_app_objects(output_dir, app_name, objects)
+
+        click.echo(f'Rendered {len(rendered_apps)} apps to {output_dir}', err=True)
+
+    else:
+        click.echo(yaml.dump_all(
+            (
+                resource
+                for _, objects in rendered_apps
+                for _, _, resource in objects
+            ),
+            Dumper=RenderDumper,
+            default_flow_style=False,
+        ), nl=False)
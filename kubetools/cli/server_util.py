@@ -1,6 +1,7 @@
 import os
 
 from collections import deque
+from threading import Condition, Thread
 from time import sleep
 
 import click
@@ -12,72 +13,193 @@ TERMINAL_SIZE = os.popen('stty size', 'r').read().split()
 IS_TTY = bool(TERMINAL_SIZE)
 TERMINAL_WIDTH = int(TERMINAL_SIZE[1]) if IS_TTY else None
 
-# Rotate the spinner every 1/UPDATE_DIVISOR seconds
+# Check the status every check_status_divisor/UPDATE_DIVISOR seconds
 UPDATE_DIVISOR = 20
 
+# Rotate the spinner every REDRAW_INTERVAL seconds, and never redraw status
+# changes more often than every MIN_REDRAW_INTERVAL seconds.
+REDRAW_INTERVAL = 0.25
+MIN_REDRAW_INTERVAL = 0.1
+
 # Get stdout as defined by Click
 STDOUT = click.get_text_stream('stdout')
 
+# Blank out the current line and return to the start of it
+CLEAR_LINE = '{0}\r'.format(' ' * TERMINAL_WIDTH) if IS_TTY else ''
+# Move the cursor up one line
+CURSOR_UP = '\x1b[A'
 
-def _clear_line(return_=True):
-    line = ''.join(' ' for _ in range(0, TERMINAL_WIDTH))
 
-    if return_:
-        line = '{0}\r'.format(line)
+class ProgressTask(object):
+    def __init__(self, display, name=None):
+        self.display = display
+        self.name = name
+        self.status = ''
 
-    STDOUT.write(line)
-    STDOUT.flush()
+    def update(self, status):
+        self.display.update_task(self, status)
 
+    def done(self):
+        self.display.remove_task(self)
 
-def wait_with_spinner(
-    func,
-    check_status_divisor=UPDATE_DIVISOR,
-    tick_divisor=UPDATE_DIVISOR,
-):
-    wait_chars = deque(('-', '/', '|', '\\'))
-    wait_ticks = 0
 
-    # Store previous status so we still print progress w/o a tty, but only when
-    # it changes rather than every .05s.
-    previous_status = ''
+class ProgressDisplay(object):
+    '''
+    Renders one progress line per running task, so parallel tasks can share the
+    terminal. The render thread sleeps on a condition and only redraws when a
+    task changes or every REDRAW_INTERVAL seconds (to rotate the spinner). It
+    exits once there are no tasks left.
 
-    while True:
-        # Get build state every ~1s
-        if wait_ticks % check_status_divisor == 0:
-            status = func(previous_status)
+    Without a tty each status change is printed instead.
+    '''
+
+    def __init__(self):
+        self.condition = Condition()
+        self.tasks = []
+        self.changed = False
+        self.render_thread = None
+
+    def add_task(self, name=None):
+        task = ProgressTask(self, name)
 
-        # None = complete, so just break the loop
-        if status is None:
-            break
+        with self.condition:
+            self.tasks.append(task)
+            self.changed = True
 
+            if IS_TTY and not self.render_thread:
+                self.render_thread = Thread(target=self._render)
+                self.render_thread.daemon = True
+                self.render_thread.start()
+
+            self.condition.notify_all()
+
+        return task
+
+    def update_task(self, task, status):
         status = status.strip()
 
-        # Write status spinner
-        if IS_TTY:
+        with self.condition:
+            if status == task.status:
+                return
+
+            task.status = status
+            self.changed = True
+            self.condition.notify_all()
+
+        if not IS_TTY:
+            if task.name:
+                status = '{0}: {1}'.format(task.name, status)
+            click.echo('    status: {0}'.format(status))
+
+    def remove_task(self, task):
+        with self.condition:
+            self.tasks.remove(task)
+            self.changed = True
+            self.condition.notify_all()
+
+            # Wait for the render thread to clear the display when the last task
+            # is done, so any following output doesn't overlap the progress.
+            while self.render_thread and not self.tasks:
+                self.condition.wait()
+
+    def _format_line(self, wait_char, task):
+        line = '  {0}{1} in progress'.format(
+            wait_char,
+            ' {0}'.format(task.name) if task.name else '',
+        )
+
+        status = task.status
+        if status:
             # Limit prefix + status text width to terminal width
-            width_limit = TERMINAL_WIDTH - 50
+            width_limit = TERMINAL_WIDTH - len(line) - 20
             if len(status) > width_limit:
-                status = '{0}...'.format(status[:width_limit])
-
-            _clear_line()
-            STDOUT.write('  {0} in progress{1}\r'.format(
-                wait_chars[0],
-                ' (status = {0})'.format(status) if status else '',
-            ))
-            STDOUT.flush()
+                status = '{0}...'.format(status[:max(width_limit, 0)])
+
+            line = '{0} (status = {1})'.format(line, status)
+
+        return line
+
+    def _draw(self, drawn_lines, lines):
+        # Return to the first progress line, clearing the lines we drew
+        output = []
+        for i in range(drawn_lines):
+            output.append(CLEAR_LINE)
+            if i < drawn_lines - 1:
+                output.append(CURSOR_UP)
+
+        for i, line in enumerate(lines):
+            output.append(line)
+            output.append('\n' if i < len(lines) - 1 else '\r')
+
+        STDOUT.write(''.join(output))
+        STDOUT.flush()
+
+    def _render(self):
+        wait_chars = deque(('-', '/', '|', '\\'))
+        drawn_lines = 0
+
+        while True:
+            with self.condition:
+                if not self.changed:
+                    self.condition.wait(REDRAW_INTERVAL)
+
+                self.changed = False
+                lines = [
+                    self._format_line(wait_chars[0], task)
+                    for task in self.tasks
+                ]
+
+                # All done - clear the display and exit
+                if not lines:
+                    self._draw(drawn_lines, [])
+                    self.render_thread = None
+                    self.condition.notify_all()
+                    return
+
+            self._draw(drawn_lines, lines)
+            drawn_lines = len(lines)
+
             wait_chars.rotate(1)
+            sleep(MIN_REDRAW_INTERVAL)
+
+
+PROGRESS_DISPLAY = ProgressDisplay()
+
+
+def wait_with_spinner(
+    func,
+    check_status_divisor=UPDATE_DIVISOR,
+    tick_divisor=UPDATE_DIVISOR,
+    event=None,
+    name=None,
+):
+    '''
+    Show progress until func returns None. The func is called with the previous
+    status every check_status_divisor/tick_divisor seconds, or as soon as the
+    (optional) event is set, and should return the current status.
+    '''
+
+    check_interval = check_status_divisor / tick_divisor
+    task = PROGRESS_DISPLAY.add_task(name)
+
+    # Store previous status so func can return it when nothing has changed
+    previous_status = ''
+
+    try:
+        while True:
+            status = func(previous_status)
 
-        # Print out changes to status only when no tty
-        else:
-            if status != previous_status:
-                click.echo('    status: {0}'.format(status))
+            # None = complete, so just break the loop
+            if status is None:
+                break
 
-        previous_status = status
+            task.update(status)
+            previous_status = status
 
-        # Tick tock
-        wait_ticks += 1
-        sleep(1 / tick_divisor)
+            if event:
+                event.wait(check_interval)
+            else:
+                sleep(check_interval)
 
-    # This hack clears the progress bar line
-    if IS_TTY:
-        _clear_line()
+    finally:
+        task.done()
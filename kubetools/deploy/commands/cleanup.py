@@ -1,6 +1,5 @@
-from kubetools.deploy.util import delete_objects, log_actions
+from kubetools.deploy.util import delete_job_and_pods, delete_objects, log_actions
 from kubetools.kubernetes.api import (
-    delete_job,
     delete_namespace,
     delete_pod,
     delete_replica_set,
@@ -56,10 +55,14 @@ def get_cleanup_objects(build, cleanup_jobs):
 
         elif len(pod.metadata.owner_references) == 1:
             owner = pod.metadata.owner_references[0]
-            if owner.name in replica_set_names_to_delete or owner.name in jobs_set_names_to_delete:
+            if owner.name in replica_set_names_to_delete:
                 pods_to_delete.append(pod)
                 pod_names_to_delete.add(get_object_name(pod))
 
+            # Deleted along with the job
+            elif owner.name in jobs_set_names_to_delete:
+                pod_names_to_delete.add(get_object_name(pod))
+
         if pod.metadata.deletion_timestamp:
             pod_names_already_deleted.add(get_object_name(pod))
 
@@ -102,7 +105,7 @@ def execute_cleanup(build, namespace, replica_sets, pods, jobs):
         delete_objects(build, replica_sets, delete_replica_set)
 
     with build.stage('Delete jobs'):
-        delete_objects(build, jobs, delete_job)
+        delete_objects(build, jobs, delete_job_and_pods)
 
     with build.stage('Delete pods'):
         delete_objects(build, pods, delete_pod)
@@ -1,3 +1,5 @@
+from kubernetes.client.rest import ApiException
+
 from kubetools.cli.git_utils import get_git_info
 from kubetools.config import load_kubetools_config
 from kubetools.constants import (
@@ -5,13 +7,16 @@ from kubetools.constants import (
 )
 from kubetools.deploy.image import ensure_docker_images
 from kubetools.deploy.util import log_actions
+from kubetools.exceptions import KubeBuildError
 from kubetools.kubernetes.api import (
     create_cronjob,
+    create_daemon_set,
     create_deployment,
     create_job,
     create_namespace,
     create_service,
     cronjob_exists,
+    delete_daemon_set,
     delete_job,
     deployment_exists,
     get_object_name,
@@ -25,10 +30,12 @@ from kubetools.kubernetes.api import (
     update_deployment,
     update_namespace,
     update_service,
+    wait_for_daemon_set_images,
 )
 from kubetools.kubernetes.config import (
     generate_kubernetes_configs_for_project,
     generate_namespace_config,
+    make_prepull_daemon_set_configs,
 )
 
 
@@ -170,6 +177,47 @@ def log_deploy_changes(
         log_actions(build, 'UPDATE', 'cronjob', update_cronjobs, name_formatter)
 
 
+def prepull_images(build, deployments):
+    '''
+    Pull the deployment images onto the nodes they'll run on before the rollout,
+    using short-lived daemon sets.
+    '''
+
+    created_daemon_sets = []
+
+    try:
+        for daemon_set in make_prepull_daemon_set_configs(deployments):
+            build.log_info(f'Create daemon set: {get_object_name(daemon_set)}')
+            create_daemon_set(build.env, build.namespace, daemon_set)
+            created_daemon_sets.append(daemon_set)
+
+        for daemon_set in created_daemon_sets:
+            wait_for_daemon_set_images(build.env, build.namespace, daemon_set)
+
+    # Pre-pulling just speeds up the rollout, any problems will show there
+    except (ApiException, KubeBuildError) as e:
+        build.log_warning(f'Could not pre-pull images: {e}')
+
+    finally:
+        for daemon_set in created_daemon_sets:
+            build.log_info(f'Delete daemon set: {get_object_name(daemon_set)}')
+            delete_daemon_set(build.env, build.namespace, daemon_set)
+
+
+def _delete_completed_job(build, job):
+    # Jobs with a TTL are deleted by the TTL controller once finished
+    if job['spec'].get('ttlSecondsAfterFinished') is not None:
+        return
+
+    # Delete the job and its pods in the background, no need to wait for it
+    build.log_info(f'Delete job: {get_object_name(job)}')
+    delete_job(
+        build.env, build.namespace, job,
+        propagation_policy='Background',
+        wait=False,
+    )
+
+
 def execute_deploy(
     build,
     namespace,
@@ -178,6 +226,7 @@ def execute_deploy(
     jobs,
     cronjobs,
     delete_completed_jobs=True,
+    prepull=False,
 ):
     # Split services + deployments into app (main) and dependencies
     depend_services = []
@@ -207,6 +256,10 @@ def execute_deploy(
                 build.log_info(f'Create namespace: {get_object_name(namespace)}')
                 create_namespace(build.env, namespace)
 
+    if prepull and deployments:
+        with build.stage('Pre-pull images on nodes'):
+            prepull_images(build, deployments)
+
     if depend_services:
         with build.stage('Create and/or update dependency services'):
             for service in depend_services:
@@ -261,7 +314,7 @@ def execute_deploy(
                 build.log_info(f'Create job: {get_object_name(job)}')
                 create_job(build.env, build.namespace, job)
                 if delete_completed_jobs:
-                    delete_job(build.env, build.namespace, job)
+                    _delete_completed_job(build, job)
 
     if exist_main_deployments:
         with build.stage('Update existing app deployments'):
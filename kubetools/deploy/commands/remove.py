@@ -1,8 +1,12 @@
-from kubetools.deploy.util import delete_objects, get_app_objects, log_actions
+from kubetools.deploy.util import (
+    delete_job_and_pods,
+    delete_objects,
+    get_app_objects,
+    log_actions,
+)
 from kubetools.kubernetes.api import (
     delete_cronjob,
     delete_deployment,
-    delete_job,
     delete_service,
     list_cronjobs,
     list_deployments,
@@ -67,7 +71,7 @@ def execute_remove(build, services, deployments, jobs, cronjobs):
 
     if jobs:
         with build.stage('Delete jobs'):
-            delete_objects(build, jobs, delete_job)
+            delete_objects(build, jobs, delete_job_and_pods)
 
     # This will delete all cronjobs associated with a project
     # Need to look into this in the future, to be able to delete individual jobs
@@ -1,12 +1,27 @@
+import hashlib
 import subprocess
 
+from os import access, path, readlink, X_OK
+
 import requests
 
+from docker.utils.build import exclude_paths
+
+from kubetools.base_images import ensure_base_images
 from kubetools.exceptions import KubeBuildError
 from kubetools.kubernetes.config import make_context_name
 from kubetools.settings import get_settings
 
-from .util import run_shell_command
+from .prebuild import run_pre_build_commands
+from .registry import get_manifest_digest, retag_image
+from .sdk_builder import build_image, make_context_archive
+from .util import parse_build_args, read_dockerignore, run_shell_command
+
+# Tag images by git commit only, or also by a hash of the build inputs
+IMAGE_TAG_SCHEMES = ('commit', 'content')
+
+# Build images with the docker CLI or the Docker SDK
+IMAGE_BUILDERS = ('cli', 'sdk')
 
 
 def get_commit_hash_tag(context_name, commit_hash):
@@ -17,6 +32,14 @@ def get_commit_hash_tag(context_name, commit_hash):
     return '-'.join((context_name, 'commit', commit_hash))
 
 
+def get_content_hash_tag(context_name, content_hash):
+    '''
+    Turn a build content hash into a Docker registry tag.
+    '''
+
+    return '-'.join((context_name, 'content', content_hash))
+
+
 def get_docker_name(registry, app_name):
     return '{0}/{1}'.format(registry, app_name)
 
@@ -40,12 +63,18 @@ def has_app_commit_image(registry, app_name, context_name, commit_hash):
     if registry is None:
         raise KubeBuildError(f'Invalid registry to build {context_name}: {registry}')
 
-    commit_version = get_commit_hash_tag(context_name, commit_hash)
+    return has_app_image(registry, app_name, get_commit_hash_tag(context_name, commit_hash))
+
+
+def has_app_image(registry, app_name, version):
+    '''
+    Check the registry has an app image for a certain tag.
+    '''
 
     settings = get_settings()
     if settings.REGISTRY_CHECK_SCRIPT:
         # We have a REGISTRY_CHECK_SCRIPT config, so use it to check for an image
-        cmd = [settings.REGISTRY_CHECK_SCRIPT, registry, app_name, commit_version]
+        cmd = [settings.REGISTRY_CHECK_SCRIPT, registry, app_name, version]
         rc = subprocess.call(cmd)
         if rc == 0:
             # A return code of 0 means the image was found
@@ -60,7 +89,7 @@ def has_app_commit_image(registry, app_name, context_name, commit_hash):
             # Any other return code means an error occured and we should not continue
             raise Exception('Error checking app image status')
 
-    url = 'http://{0}/v2/{1}/manifests/{2}'.format(registry, app_name, commit_version)
+    url = 'http://{0}/v2/{1}/manifests/{2}'.format(registry, app_name, version)
 
     response = requests.head(url)
 
@@ -70,6 +99,57 @@ def has_app_commit_image(registry, app_name, context_name, commit_hash):
     return True
 
 
+def get_build_content_hash(app_dir, dockerfile, build_args):
+    '''
+    Hash the inputs to a Docker build - the Dockerfile, the files in the build
+    context (excluding any matching .dockerignore) and the build args.
+    '''
+
+    content_hash = hashlib.sha256()
+
+    def update(*values):
+        for value in values:
+            if isinstance(value, str):
+                value = value.encode()
+            # Length prefix each value so the boundaries are part of the hash
+            content_hash.update(str(len(value)).encode())
+            content_hash.update(b':')
+            content_hash.update(value)
+
+    # Hash the resolved values, including any taken from the environment
+    for key, value in sorted(parse_build_args(build_args).items()):
+        update('build-arg', key, value)
+
+    with open(path.join(app_dir, dockerfile), 'rb') as f:
+        update('dockerfile', dockerfile, f.read())
+
+    filenames = exclude_paths(app_dir, read_dockerignore(app_dir), dockerfile=dockerfile)
+
+    # Ignore kubetools own state (eg the pre-build command cache)
+    state_dirname = get_settings().DEV_CONFIG_DIRNAME
+
+    for filename in sorted(filenames):
+        if filename.split('/', 1)[0] == state_dirname:
+            continue
+
+        full_filename = path.join(app_dir, filename)
+
+        if path.islink(full_filename):
+            update('link', filename, readlink(full_filename))
+
+        elif path.isfile(full_filename):
+            file_hash = hashlib.sha256()
+            with open(full_filename, 'rb') as f:
+                for chunk in iter(lambda: f.read(65536), b''):
+                    file_hash.update(chunk)
+
+            # Executable bits are kept in the image, so are part of the content
+            is_executable = access(full_filename, X_OK)
+            update('file', filename, str(is_executable), file_hash.digest())
+
+    return content_hash.hexdigest()
+
+
 def get_container_contexts_from_config(app_config):
     context_name_to_build = {}
     container_contexts = app_config.get('containerContexts', {})
@@ -120,6 +200,10 @@ def _ensure_docker_images(
 
     project_name = kubetools_config['name']
 
+    image_tag_scheme = get_settings().IMAGE_TAG_SCHEME
+    if image_tag_scheme not in IMAGE_TAG_SCHEMES:
+        raise KubeBuildError(f'Invalid image tag scheme: {image_tag_scheme}')
+
     context_name_to_build = get_container_contexts_from_config(kubetools_config)
 
     build_inputs = {}
@@ -133,18 +217,12 @@ def _ensure_docker_images(
             commit_hash,
         )
 
-        additional_docker_tags = [
-            get_docker_tag(registry, project_name, additional_tag)
-            for additional_tag in additional_tags
-        ]
-        docker_tags = [docker_tag_for_commit]
-        docker_tags.extend(additional_docker_tags)
-
         build_inputs[context_name] = {
             'context': build_context,
             'registry': registry,
             'image': docker_tag_for_commit,
-            'tags': docker_tags,
+            # Registry tags for the image, first the commit tag and then any additional
+            'versions': [get_commit_hash_tag(context_name, commit_hash)] + list(additional_tags),
         }
 
     first_context, first_build_input = list(build_inputs.items())[0]
@@ -153,7 +231,8 @@ def _ensure_docker_images(
 
     build.log_info(f'Building {project_name} @ commit {commit_hash}')
 
-    # Now actually build the images
+    # Skip any images that already exist for this commit
+    context_names_to_build = []
     for context_name, build_input in build_inputs.items():
         if has_app_commit_image(
             build_input['registry'],
@@ -165,60 +244,226 @@ def _ensure_docker_images(
                 f'Docker image for {project_name}/{context_name} commit {commit_hash} exists, '
                 'skipping build'
             ))
+            if additional_tags:
+                _retag_image(
+                    build,
+                    build_input['registry'],
+                    project_name,
+                    build_input['versions'][0],
+                    additional_tags,
+                )
             continue
 
-        build_context = build_input['context']
-
-        # Run pre docker commands?
-        pre_build_commands = build_context.get('preBuildCommands', [])
-
-        for command in pre_build_commands:
-            build.log_info(f'Executing pre-build command: {command}')
-
-            # Run it, passing in the commit hashes as ENVars
-            env = {
-                'KUBE_ENV': build.env,
-                'BUILD_COMMIT': commit_hash,
-            }
-            if previous_commit:
-                env['PREVIOUS_BUILD_COMMIT'] = previous_commit
-
-            run_shell_command(*command, cwd=app_dir, env=env)
-
-        tag_arguments = []
-        for docker_tag in build_input['tags']:
-            tag_arguments.extend(['-t', docker_tag])
-
-        build_arg_arguments = []
-        for build_arg in build_args:
-            build_arg_arguments.extend(['--build-arg', build_arg])
-
-        # Build the image
-        build.log_info((
-            f'Building {project_name}/{context_name} '
-            f'(file: {build_context["dockerfile"]}, commit: {commit_hash})'
-        ))
-
-        run_shell_command(
-            'docker', 'build', '--pull',
-            '-f', build_context['dockerfile'],
-            *tag_arguments,
-            *build_arg_arguments,
-            '.',
-            cwd=app_dir,
-        )
+        context_names_to_build.append(context_name)
 
-        # Push the image and additional tags
-        for docker_tag in build_input['tags']:
-            build.log_info(f'Pushing docker image: {docker_tag}')
-            run_shell_command('docker', 'push', docker_tag)
+    # Run pre docker commands, passing in the commit hashes as ENVars
+    env = {
+        'KUBE_ENV': build.env,
+        'BUILD_COMMIT': commit_hash,
+    }
+    if previous_commit:
+        env['PREVIOUS_BUILD_COMMIT'] = previous_commit
+
+    run_pre_build_commands(build, app_dir, [
+        build_inputs[context_name]['context'].get('preBuildCommands', [])
+        for context_name in context_names_to_build
+    ], env)
+
+    image_builder = get_settings().IMAGE_BUILDER
+    if image_builder not in IMAGE_BUILDERS:
+        raise KubeBuildError(f'Invalid image builder: {image_builder}')
+
+    context_archive = None
+
+    try:
+        # Now actually build the images
+        for context_name in context_names_to_build:
+            build_input = build_inputs[context_name]
+            build_context = build_input['context']
+            versions = build_input['versions']
+
+            if image_tag_scheme == 'content':
+                # Hashed after the pre-build commands as these may generate files
+                content_hash = get_build_content_hash(
+                    app_dir,
+                    build_context['dockerfile'],
+                    build_args,
+                )
+                content_version = get_content_hash_tag(context_name, content_hash)
+
+                if has_app_image(build_input['registry'], project_name, content_version):
+                    build.log_info((
+                        f'Docker image for {project_name}/{context_name} content {content_hash} '
+                        'exists, skipping build'
+                    ))
+                    _retag_image(
+                        build,
+                        build_input['registry'],
+                        project_name,
+                        content_version,
+                        versions,
+                    )
+                    continue
+
+                # Build with the content tag, keeping the commit tags as aliases
+                versions = [content_version] + versions
+
+            docker_tags = [
+                get_docker_tag(build_input['registry'], project_name, version)
+                for version in versions
+            ]
+
+            # Use the previous commit image as a layer cache, BuildKit pulls just the
+            # layers that match from the registry using the inline cache metadata.
+            cache_from = None
+            if previous_commit and has_app_commit_image(
+                build_input['registry'],
+                project_name,
+                context_name,
+                previous_commit,
+            ):
+                cache_from = get_docker_tag_for_commit(
+                    build_input['registry'],
+                    project_name,
+                    context_name,
+                    previous_commit,
+                )
+                build.log_info(f'Using build cache from: {cache_from}')
+
+            # Build the image
+            build.log_info((
+                f'Building {project_name}/{context_name} '
+                f'(file: {build_context["dockerfile"]}, commit: {commit_hash})'
+            ))
 
+            # Only pull base images not checked recently (or that can't be worked out)
+            pull = not ensure_base_images(
+                path.join(app_dir, build_context['dockerfile']),
+                build_args=parse_build_args(build_args),
+                log=build.log_info,
+            )
+
+            if image_builder == 'sdk':
+                # Archive the context once and send it for each Dockerfile
+                if context_archive is None:
+                    context_archive = make_context_archive(app_dir, [
+                        build_inputs[name]['context']['dockerfile']
+                        for name in context_names_to_build
+                    ])
+
+                build_image(
+                    build, context_archive, build_context['dockerfile'], docker_tags,
+                    build_args=build_args,
+                    cache_from=cache_from,
+                    pull=pull,
+                )
+            else:
+                _build_image_with_cli(
+                    build, app_dir, build_context['dockerfile'], docker_tags,
+                    build_args=build_args,
+                    cache_from=cache_from,
+                    pull=pull,
+                )
+
+            # Push the image and then add the other tags to it in the registry
+            build.log_info(f'Pushing docker image: {docker_tags[0]}')
+            run_shell_command('docker', 'push', docker_tags[0], output_handler=build.log_info)
+
+            _retag_image(
+                build,
+                build_input['registry'],
+                project_name,
+                versions[0],
+                versions[1:],
+            )
+
+    # Always remove the archive (a temporary file), even if a build fails
+    finally:
+        if context_archive is not None:
+            context_archive.close()
+
+    # Pin the images to their digest, so nodes can use any copy they already have
     return {
-        context_name: build_input['image']
+        context_name: _get_digest_image(build, project_name, build_input)
         for context_name, build_input in build_inputs.items()
     }
 
 
+def _get_digest_image(build, project_name, build_input):
+    image = build_input['image']
+
+    try:
+        digest = get_manifest_digest(
+            build_input['registry'],
+            project_name,
+            build_input['versions'][0],
+        )
+    except KubeBuildError as e:
+        build.log_warning(f'{e}, using image without digest: {image}')
+        return image
+
+    return f'{image}@{digest}'
+
+
+def _build_image_with_cli(
+    build, app_dir, dockerfile, docker_tags,
+    build_args,
+    cache_from,
+    pull,
+):
+    tag_arguments = []
+    for docker_tag in docker_tags:
+        tag_arguments.extend(['-t', docker_tag])
+
+    build_arg_arguments = []
+    for build_arg in build_args:
+        build_arg_arguments.extend(['--build-arg', build_arg])
+
+    cache_from_arguments = []
+    if cache_from:
+        cache_from_arguments.extend(['--cache-from', cache_from])
+
+    pull_arguments = ['--pull'] if pull else []
+
+    run_shell_command(
+        'docker', 'build',
+        *pull_arguments,
+        '-f', dockerfile,
+        *tag_arguments,
+        *build_arg_arguments,
+        # Embed cache metadata in the pushed image so later builds can use it
+        '--build-arg', 'BUILDKIT_INLINE_CACHE=1',
+        *cache_from_arguments,
+        '.',
+        cwd=app_dir,
+        env={'DOCKER_BUILDKIT': '1'},
+        output_handler=build.log_info,
+    )
+
+
+def _retag_image(build, registry, project_name, source_version, versions):
+    if not versions:
+        return
+
+    source_image = get_docker_tag(registry, project_name, source_version)
+    build.log_info(f'Tagging docker image {source_image} as: {", ".join(versions)}')
+
+    try:
+        retag_image(registry, project_name, source_version, versions)
+        return
+
+    except KubeBuildError as e:
+        build.log_warning(f'{e}, falling back to docker push')
+
+    run_shell_command('docker', 'pull', source_image, output_handler=build.log_info)
+
+    for version in versions:
+        docker_tag = get_docker_tag(registry, project_name, version)
+        build.log_info(f'Pushing docker image: {docker_tag}')
+        run_shell_command('docker', 'tag', source_image, docker_tag)
+        run_shell_command('docker', 'push', docker_tag, output_handler=build.log_info)
+
+
 def _find_last_pushed_commit(app_dir, context_name, registry, project_name, max_commits=100):
     commit_history = run_shell_command(
         'git', 'log', '--pretty=format:"%h"', '--max-count', str(max_commits),
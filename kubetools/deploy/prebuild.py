@@ -0,0 +1,269 @@
+'''
+Run the `preBuildCommands` of build contexts. Commands may be a list of arguments,
+which always run, or a dict declaring the files they read and write:
+
+    preBuildCommands:
+      - command: [make, assets]
+        inputs: [assets/**, package.json]
+        outputs: [static/dist/**]
+
+Commands with inputs are fingerprinted and skipped when neither the inputs nor
+outputs have changed since they last ran.
+
+Lists of commands (eg from different build contexts) only run concurrently when
+every command in them declares its inputs/outputs and those don't overlap with
+the other lists, anything else runs one list after another.
+'''
+
+import hashlib
+import json
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
+from os import makedirs, path, walk
+from threading import Event
+
+from kubetools.settings import get_settings
+
+from .util import OUTPUT_TAIL_LINES, run_shell_command
+
+PRE_BUILD_CACHE_FILENAME = 'prebuild-cache.json'
+
+GLOB_CHARACTERS = ('*', '?', '[')
+
+
+def get_pre_build_command_args(command):
+    if isinstance(command, dict):
+        return command['command']
+    return command
+
+
+def _get_cache_filename(app_dir):
+    return path.join(app_dir, get_settings().DEV_CONFIG_DIRNAME, PRE_BUILD_CACHE_FILENAME)
+
+
+def _load_cache(app_dir):
+    cache_filename = _get_cache_filename(app_dir)
+    if not path.exists(cache_filename):
+        return {}
+
+    try:
+        with open(cache_filename, 'r') as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def _save_cache(app_dir, cache):
+    cache_filename = _get_cache_filename(app_dir)
+    makedirs(path.dirname(cache_filename), exist_ok=True)
+
+    with open(cache_filename, 'w') as f:
+        json.dump(cache, f, indent=4, sort_keys=True)
+
+
+def _get_filenames(app_dir, patterns):
+    filenames = set()
+
+    for pattern in patterns:
+        for filename in glob(path.join(app_dir, pattern), recursive=True):
+            if path.isdir(filename):
+                for dirpath, _, dir_filenames in walk(filename):
+                    filenames.update(
+                        path.join(dirpath, dir_filename)
+                        for dir_filename in dir_filenames
+                    )
+            else:
+                filenames.add(filename)
+
+    return sorted(filenames)
+
+
+def _hash_files(app_dir, patterns):
+    files_hash = hashlib.sha256()
+
+    for filename in _get_filenames(app_dir, patterns):
+        files_hash.update(path.relpath(filename, app_dir).encode())
+        files_hash.update(b'\0')
+
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                files_hash.update(chunk)
+        files_hash.update(b'\0')
+
+    return files_hash.hexdigest()
+
+
+def _get_fingerprint(app_dir, command, env):
+    return hashlib.sha256(json.dumps({
+        'command': command['command'],
+        'inputs': _hash_files(app_dir, command['inputs']),
+        'env': env.get('KUBE_ENV'),
+    }, sort_keys=True).encode()).hexdigest()
+
+
+def _get_command_list_patterns(commands):
+    # Returns None if any command doesn't declare the files it reads/writes
+    patterns = []
+
+    for command in commands:
+        if not isinstance(command, dict):
+            return None
+
+        command_patterns = command.get('inputs', []) + command.get('outputs', [])
+        if not command_patterns:
+            return None
+
+        patterns.extend(command_patterns)
+
+    return patterns
+
+
+def _get_pattern_prefix(pattern):
+    # The path components before any glob, ie the directory/file the pattern is within
+    prefix = []
+
+    for part in path.normpath(pattern).split(path.sep):
+        if any(character in part for character in GLOB_CHARACTERS):
+            break
+        prefix.append(part)
+
+    return prefix
+
+
+def _patterns_overlap(patterns, other_patterns):
+    for pattern in patterns:
+        prefix = _get_pattern_prefix(pattern)
+
+        for other_pattern in other_patterns:
+            other_prefix = _get_pattern_prefix(other_pattern)
+            length = min(len(prefix), len(other_prefix))
+
+            if prefix[:length] == other_prefix[:length]:
+                return True
+
+    return False
+
+
+def get_command_list_groups(command_lists):
+    '''
+    Group lists of commands that can run concurrently, keeping their order. Each
+    group should only start once the previous group has completed.
+    '''
+
+    groups = []
+    # Patterns of the current group, None if nothing else can join it
+    group_patterns = None
+
+    for commands in command_lists:
+        patterns = _get_command_list_patterns(commands)
+
+        if (
+            patterns is None
+            or group_patterns is None
+            or _patterns_overlap(patterns, group_patterns)
+        ):
+            groups.append([commands])
+            group_patterns = patterns
+        else:
+            groups[-1].append(commands)
+            group_patterns.extend(patterns)
+
+    return groups
+
+
+def _run_pre_build_command(build, app_dir, command, env, cache, cancel_event, buffer_output):
+    args = get_pre_build_command_args(command)
+
+    fingerprint = None
+    if isinstance(command, dict) and command.get('inputs'):
+        fingerprint = _get_fingerprint(app_dir, command, env)
+        cached = cache.get(json.dumps(args))
+
+        if (
+            cached
+            and cached['fingerprint'] == fingerprint
+            and cached['outputs'] == _hash_files(app_dir, command.get('outputs', []))
+        ):
+            build.log_info(f'Skipping unchanged pre-build command: {args}')
+            return
+
+    build.log_info(f'Executing pre-build command: {args}')
+
+    # When running alongside other commands, keep the output together
+    output_lines = None
+    output_handler = build.log_info
+    if buffer_output:
+        output_lines = deque(maxlen=OUTPUT_TAIL_LINES)
+        output_handler = output_lines.append
+
+    run_shell_command(
+        *args,
+        cwd=app_dir,
+        env=env,
+        output_handler=output_handler,
+        cancel_event=cancel_event,
+    )
+
+    if output_lines:
+        build.log_info(f'Output of pre-build command {args}:')
+        for line in output_lines:
+            build.log_info(line)
+
+    if fingerprint:
+        cache[json.dumps(args)] = {
+            'fingerprint': fingerprint,
+            'outputs': _hash_files(app_dir, command.get('outputs', [])),
+        }
+
+
+def run_pre_build_commands(build, app_dir, command_lists, env):
+    '''
+    Run lists of pre-build commands, each list in order and independent lists
+    concurrently. Identical lists (eg shared by two contexts) are only run once.
+    '''
+
+    unique_command_lists = []
+    for commands in command_lists:
+        if commands and commands not in unique_command_lists:
+            unique_command_lists.append(commands)
+
+    if not unique_command_lists:
+        return
+
+    cache = _load_cache(app_dir)
+
+    # Stop the other commands as soon as one fails
+    cancel_event = Event()
+    errors = []
+
+    def run_commands(commands, buffer_output):
+        try:
+            for command in commands:
+                _run_pre_build_command(
+                    build, app_dir, command, env, cache,
+                    cancel_event=cancel_event,
+                    buffer_output=buffer_output,
+                )
+        except Exception as e:
+            # Keep the error that caused any cancellation
+            if not cancel_event.is_set():
+                cancel_event.set()
+                errors.append(e)
+
+    max_workers = int(get_settings().PRE_BUILD_MAX_WORKERS)
+
+    for group in get_command_list_groups(unique_command_lists):
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(group))) as executor:
+            for commands in group:
+                executor.submit(run_commands, commands, len(group) > 1)
+
+        if errors:
+            break
+
+    # Keep the fingerprints of any commands that did succeed
+    _save_cache(app_dir, cache)
+
+    if errors:
+        raise errors[0]
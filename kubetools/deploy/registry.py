@@ -0,0 +1,114 @@
+'''
+Minimal Docker registry (V2 API) client, used to add tags to images already in
+the registry by copying the manifest - no layer data is moved and no local Docker
+daemon is needed.
+'''
+
+import requests
+
+from kubetools.exceptions import KubeBuildError
+from kubetools.log import logger
+
+# Manifest types we can copy as-is, the registry picks the first it has (which
+# should always be the one the image was pushed with).
+MANIFEST_MEDIA_TYPES = (
+    'application/vnd.docker.distribution.manifest.v2+json',
+    'application/vnd.docker.distribution.manifest.list.v2+json',
+    'application/vnd.oci.image.manifest.v1+json',
+    'application/vnd.oci.image.index.v1+json',
+)
+
+REGISTRY_TIMEOUT = 30
+
+
+def _get_manifest_url(registry, app_name, reference):
+    return 'http://{0}/v2/{1}/manifests/{2}'.format(registry, app_name, reference)
+
+
+def get_manifest(session, registry, app_name, reference):
+    '''
+    Get the raw manifest (and its media type) for an image tag or digest.
+    '''
+
+    response = session.get(
+        _get_manifest_url(registry, app_name, reference),
+        headers={'Accept': ', '.join(MANIFEST_MEDIA_TYPES)},
+        timeout=REGISTRY_TIMEOUT,
+    )
+
+    if response.status_code != 200:
+        raise KubeBuildError('Could not get manifest for {0}/{1}:{2}: {3}'.format(
+            registry, app_name, reference, response.status_code,
+        ))
+
+    media_type = response.headers.get('Content-Type')
+    if media_type not in MANIFEST_MEDIA_TYPES:
+        raise KubeBuildError('Unsupported manifest type for {0}/{1}:{2}: {3}'.format(
+            registry, app_name, reference, media_type,
+        ))
+
+    return response.content, media_type
+
+
+def get_manifest_digest(registry, app_name, reference):
+    '''
+    Get the content digest (sha256:...) of an image tag.
+    '''
+
+    try:
+        response = requests.head(
+            _get_manifest_url(registry, app_name, reference),
+            headers={'Accept': ', '.join(MANIFEST_MEDIA_TYPES)},
+            timeout=REGISTRY_TIMEOUT,
+        )
+    except requests.RequestException as e:
+        raise KubeBuildError(f'Could not get digest from registry {registry}: {e}')
+
+    digest = response.headers.get('Docker-Content-Digest')
+    if response.status_code != 200 or not digest:
+        raise KubeBuildError('Could not get digest for {0}/{1}:{2}: {3}'.format(
+            registry, app_name, reference, response.status_code,
+        ))
+
+    return digest
+
+
+def put_manifest(session, registry, app_name, tag, manifest, media_type):
+    '''
+    Put a raw manifest under a tag, the manifest must be unchanged (byte for
+    byte) to keep the same digest.
+    '''
+
+    response = session.put(
+        _get_manifest_url(registry, app_name, tag),
+        data=manifest,
+        headers={'Content-Type': media_type},
+        timeout=REGISTRY_TIMEOUT,
+    )
+
+    if response.status_code != 201:
+        raise KubeBuildError('Could not put manifest for {0}/{1}:{2}: {3}'.format(
+            registry, app_name, tag, response.status_code,
+        ))
+
+
+def retag_image(registry, app_name, source_tag, tags):
+    '''
+    Add tags to an image in the registry, fetching the manifest once and putting
+    it under each new tag.
+    '''
+
+    session = requests.Session()
+
+    try:
+        manifest, media_type = get_manifest(session, registry, app_name, source_tag)
+
+        for tag in tags:
+            logger.debug(f'Tagging {registry}/{app_name}:{source_tag} as {tag}')
+            put_manifest(session, registry, app_name, tag, manifest, media_type)
+
+    except requests.RequestException as e:
+        raise KubeBuildError(f'Could not tag image in registry {registry}: {e}')
+
+    finally:
+        session.close()
@@ -0,0 +1,118 @@
+'''
+Build images through the Docker SDK rather than the `docker` CLI, so the build
+context can be archived once and sent to the daemon for each Dockerfile.
+'''
+
+from collections import deque
+
+import docker
+
+from docker.utils.build import tar
+
+from kubetools.exceptions import KubeBuildError
+
+from .util import OUTPUT_TAIL_LINES, parse_build_args, read_dockerignore
+
+
+def make_context_archive(app_dir, dockerfiles):
+    '''
+    Create a tar archive of the build context, excluding anything matching the
+    .dockerignore except the Dockerfiles themselves (as the Docker CLI does).
+    '''
+
+    exclude = read_dockerignore(app_dir)
+    exclude.extend(f'!{dockerfile}' for dockerfile in dockerfiles)
+
+    return tar(app_dir, exclude=exclude)
+
+
+def _split_docker_tag(docker_tag):
+    repository, _, tag = docker_tag.rpartition(':')
+    if '/' in tag:  # registry host:port without a tag
+        return docker_tag, None
+    return repository, tag
+
+
+def _log_build_output(build, output):
+    output_lines = deque(maxlen=OUTPUT_TAIL_LINES)
+    image_id = None
+    last_status = None
+
+    for chunk in output:
+        if 'error' in chunk:
+            output_lines.append(chunk['error'])
+            raise KubeBuildError('Docker build failed: {0}\n\n{1}'.format(
+                chunk['error'], '\n'.join(output_lines),
+            ))
+
+        if 'aux' in chunk:
+            image_id = chunk['aux'].get('ID', image_id)
+
+        lines = []
+        if 'stream' in chunk:
+            lines = chunk['stream'].rstrip('\n').splitlines()
+
+        # Pull progress, only log changes in status (not each progress update)
+        elif 'status' in chunk:
+            status = ' '.join(filter(None, (chunk.get('id'), chunk['status'])))
+            if status != last_status:
+                lines = [status]
+            last_status = status
+
+        for line in lines:
+            output_lines.append(line)
+            build.log_info(line)
+
+    if not image_id:
+        raise KubeBuildError('Docker build did not return an image: {0}'.format(
+            '\n'.join(output_lines),
+        ))
+
+    return image_id
+
+
+def build_image(
+    build, context_archive, dockerfile, docker_tags,
+    build_args=None,
+    cache_from=None,
+    pull=True,
+):
+    '''
+    Build and tag an image from a context archive, logging the build output.
+    '''
+
+    docker_client = docker.from_env()
+
+    try:
+        if cache_from:
+            # The SDK uses the classic builder, which only uses local images as cache
+            try:
+                docker_client.images.pull(*_split_docker_tag(cache_from))
+            except docker.errors.APIError as e:
+                build.log_warning(f'Could not pull cache image {cache_from}: {e}')
+
+        context_archive.seek(0)
+
+        output = docker_client.api.build(
+            fileobj=context_archive,
+            custom_context=True,
+            dockerfile=dockerfile,
+            buildargs=parse_build_args(build_args or []),
+            cache_from=[cache_from] if cache_from else None,
+            pull=pull,
+            rm=True,
+            decode=True,
+        )
+        image_id = _log_build_output(build, output)
+
+        for docker_tag in docker_tags:
+            repository, tag = _split_docker_tag(docker_tag)
+            docker_client.api.tag(image_id, repository, tag)
+
+    except docker.errors.APIError as e:
+        raise KubeBuildError(f'Docker build failed: {e}')
+
+    finally:
+        docker_client.close()
+
+    return image_id
@@ -1,40 +1,140 @@
 import os
 
-from subprocess import CalledProcessError, check_output, STDOUT
+from collections import deque
+from subprocess import PIPE, Popen, STDOUT, TimeoutExpired
+from threading import Thread
+from time import time
 
 from kubetools.constants import NAME_LABEL_KEY, PROJECT_NAME_LABEL_KEY
 from kubetools.exceptions import KubeBuildError
 from kubetools.kubernetes.api import (
+    delete_job,
     get_object_labels_dict,
     get_object_name,
     is_kubetools_object,
 )
 from kubetools.log import logger
 
+# Lines of output kept for errors when streaming command output
+OUTPUT_TAIL_LINES = 100
 
-def run_shell_command(*command, **kwargs):
+# How often to check for command timeout/cancellation
+COMMAND_POLL_INTERVAL = 0.1
+COMMAND_KILL_TIMEOUT = 5
+
+
+def _read_lines(stream, handle_line):
+    for line in iter(stream.readline, b''):
+        handle_line(line)
+    stream.close()
+
+
+def run_shell_command(
+    *command,
+    cwd=None,
+    env=None,
+    output_handler=None,
+    timeout=None,
+    cancel_event=None,
+):
     '''
     Run a shell command and return it's output. Capture fails and pass to internal
     exception.
-    '''
 
-    cwd = kwargs.pop('cwd', None)
-    env = kwargs.pop('env', {})
+    With an output_handler each line of output is passed to it as the command runs
+    and only the last lines are kept, for the exception should the command fail.
+    '''
 
-    new_env = os.environ.copy()
-    new_env.update(env)
+    new_env = None
+    if env:
+        new_env = os.environ.copy()
+        new_env.update(env)
 
     logger.debug(f'Running shell command in {cwd}: {command}, env: {env}')
 
-    try:
-        return check_output(command, stderr=STDOUT, cwd=cwd, env=new_env)
-
-    except CalledProcessError as e:
-        raise KubeBuildError('Command failed: {0}\n\n{1}'.format(
+    if output_handler:
+        output_lines = deque(maxlen=OUTPUT_TAIL_LINES)
+
+        def handle_line(line):
+            output_lines.append(line)
+            output_handler(line.decode('utf-8', 'ignore').rstrip())
+    else:
+        output_lines = []
+        handle_line = output_lines.append
+
+    process = Popen(command, stdout=PIPE, stderr=STDOUT, cwd=cwd, env=new_env)
+
+    # Read in a thread so we can stop the command while it's (not) outputting
+    reader_thread = Thread(target=_read_lines, args=(process.stdout, handle_line))
+    reader_thread.daemon = True
+    reader_thread.start()
+
+    deadline = time() + timeout if timeout else None
+    error = None
+
+    while True:
+        try:
+            process.wait(timeout=COMMAND_POLL_INTERVAL)
+            break
+        except TimeoutExpired:
+            pass
+
+        if cancel_event and cancel_event.is_set():
+            error = 'Command cancelled'
+        elif deadline and time() > deadline:
+            error = f'Command timed out after {timeout}s'
+        else:
+            continue
+
+        process.kill()
+        process.wait()
+        break
+
+    # Don't wait forever for output if the command was killed, as any child
+    # processes it started may still be holding the output open.
+    reader_thread.join(COMMAND_KILL_TIMEOUT if error else None)
+    output = b''.join(output_lines)
+
+    if not error and process.returncode:
+        error = 'Command failed'
+
+    if error:
+        raise KubeBuildError('{0}: {1}\n\n{2}'.format(
+            error,
             ' '.join(command),
-            e.output.decode('utf-8', 'ignore'),
+            output.decode('utf-8', 'ignore'),
         ))
 
+    if not output_handler:
+        return output
+
+
+def read_dockerignore(app_dir):
+    dockerignore = os.path.join(app_dir, '.dockerignore')
+    if not os.path.exists(dockerignore):
+        return []
+
+    # Same parsing as the Docker client does when sending the build context
+    with open(dockerignore, 'r') as f:
+        lines = [line.strip() for line in f.read().splitlines()]
+
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+def parse_build_args(build_args):
+    # Like `docker build --build-arg`, args without a value come from the environment
+    buildargs = {}
+
+    for build_arg in build_args:
+        key, has_value, value = build_arg.partition('=')
+        if not has_value:
+            value = os.environ.get(key)
+            if value is None:
+                continue
+        buildargs[key] = value
+
+    return buildargs
+
 
 def log_actions(build, action, object_type, names, name_formatter):
     for name in names:
@@ -49,6 +149,11 @@ def delete_objects(build, objects, delete_function):
         delete_function(build.env, build.namespace, obj)
 
 
+def delete_job_and_pods(env, namespace, job):
+    # Jobs orphan their pods by default, cascade the deletion to them
+    delete_job(env, namespace, job, propagation_policy='Background')
+
+
 def get_app_objects(
     build, app_or_project_names, list_objects_function,
     force=False,
@@ -2,10 +2,11 @@ import sys
 
 from kubetools.settings import get_settings
 
-from . import docker_compose
+from . import docker_api, docker_compose
 
 
 DEV_BACKEND_PROVIDERS = {
+    'docker_api': docker_api,
     'docker_compose': docker_compose,
 }
 
@@ -0,0 +1,624 @@
+'''
+Dev backend that drives Docker directly through the Docker Engine API, rather
+than spawning a docker-compose process for every step.
+
+Containers, networks and images are created with the same names and labels
+docker-compose would use, so status/listing is shared with the docker_compose
+backend and environments can be switched between the two.
+
+Note: unlike `docker-compose up`, existing containers are started as-is rather
+than recreated when the kubetools config changes - use `ktd reload --destroy`.
+'''
+
+import os
+import shlex
+import sys
+
+from os import path
+from uuid import uuid4
+
+import click
+import docker
+
+from kubetools.base_images import ensure_base_images
+from kubetools.cli.server_util import PROGRESS_DISPLAY
+from kubetools.dev.process_util import CommandOutput, run_in_threads
+from kubetools.exceptions import KubeDevCommandError, KubeDevError
+from kubetools.log import logger
+
+# Container listing/status/printing is shared with the docker_compose backend
+from ..docker_compose import (  # noqa: F401
+    find_container_for_config,
+    follow_logs,
+    get_build_groups,
+    get_names_to_start,
+    print_containers,
+    probe_container,
+)
+from ..docker_compose.config import (  # noqa: F401
+    get_all_containers,
+    get_all_containers_by_name,
+    get_build_args,
+    get_compose_config,
+    get_compose_image_name,
+    get_compose_name,
+    get_compose_network_name,
+    get_container_start_groups,
+    get_service_image_name,
+    is_dev_network_env,
+    remove_compose_config,
+)
+from ..docker_compose.docker_util import (  # noqa: F401
+    ensure_docker_dev_network,
+    get_container_status,
+    get_containers_status,
+    get_docker_client,
+    kill_run_containers,
+    refresh_containers_status,
+)
+
+# Service (docker-compose) keys passed straight through to create_container
+CONTAINER_KEYS = (
+    'domainname',
+    'hostname',
+    'stop_signal',
+    'user',
+    'working_dir',
+)
+
+# Service (docker-compose) keys passed straight through to create_host_config
+HOST_CONFIG_KEYS = (
+    'cap_add',
+    'cap_drop',
+    'dns',
+    'extra_hosts',
+    'privileged',
+    'shm_size',
+)
+
+# Service keys handled explicitly below
+HANDLED_KEYS = CONTAINER_KEYS + HOST_CONFIG_KEYS + (
+    'build',
+    'command',
+    'entrypoint',
+    'environment',
+    'image',
+    'labels',
+    'networks',
+    'ports',
+    'stdin_open',
+    'tty',
+    'volumes',
+)
+
+
+def init_backend():
+    ensure_docker_dev_network()
+
+
+def _is_interactive():
+    return sys.stdin.isatty() and sys.stdout.isatty()
+
+
+def _get_service(kubetools_config, name):
+    services = get_compose_config(kubetools_config)['services']
+
+    if name not in services:
+        raise KubeDevError('Invalid container: {0}'.format(name))
+
+    return services[name]
+
+
+def _get_environment(service):
+    environment = service.get('environment') or []
+
+    if isinstance(environment, dict):
+        environment = [
+            '{0}={1}'.format(key, value)
+            for key, value in environment.items()
+        ]
+
+    return list(environment)
+
+
+def _get_container_id(kubetools_config, name):
+    status = get_container_status(kubetools_config, name)
+
+    if not status or not status['id']:
+        raise KubeDevError('Container {0} does not exist'.format(
+            click.style(name, bold=True),
+        ))
+
+    return status['id']
+
+
+def _get_project_labels(kubetools_config, name, oneoff=False):
+    return {
+        'com.docker.compose.project': get_compose_name(kubetools_config),
+        'com.docker.compose.service': name,
+        'com.docker.compose.oneoff': str(oneoff),
+        'com.docker.compose.container-number': '1',
+    }
+
+
+def _build_image(kubetools_config, name, service):
+    docker_client = get_docker_client()
+    build = service['build']
+
+    build_args = get_build_args(build)
+    context = build.get('context', '.')
+
+    image = get_service_image_name(kubetools_config, name, service)
+    logger.debug('Building image {0} with: {1}'.format(image, build))
+
+    output_lines = []
+    progress = PROGRESS_DISPLAY.add_task('build {0}'.format(name))
+
+    try:
+        for chunk in docker_client.api.build(
+            path=path.abspath(context),
+            dockerfile=build.get('dockerfile'),
+            tag=image,
+            buildargs=build_args,
+            # Only pull base images not checked recently (or that can't be worked out)
+            pull=not ensure_base_images(
+                path.join(context, build.get('dockerfile', 'Dockerfile')),
+                build_args=build_args,
+            ),
+            rm=True,
+            decode=True,
+        ):
+            if 'stream' in chunk:
+                output_lines.append(chunk['stream'])
+                logger.debug(chunk['stream'].rstrip('\n'))
+
+                if chunk['stream'].strip():
+                    progress.update(chunk['stream'])
+
+            if 'error' in chunk:
+                output_lines.append(chunk['error'])
+                raise KubeDevCommandError(
+                    'Docker build failed for {0}'.format(name),
+                    ''.join(output_lines),
+                )
+    finally:
+        progress.done()
+
+    return image
+
+
+def _ensure_image(kubetools_config, name, service):
+    docker_client = get_docker_client()
+    image = get_service_image_name(kubetools_config, name, service)
+
+    try:
+        docker_client.api.inspect_image(image)
+    except docker.errors.ImageNotFound:
+        if 'build' in service:
+            click.echo('--> Building image for {0}'.format(name))
+            _build_image(kubetools_config, name, service)
+        else:
+            click.echo('--> Pulling image {0}'.format(image))
+            repository, tag = docker.utils.parse_repository_tag(image)
+            docker_client.images.pull(repository, tag=tag or 'latest')
+
+    return image
+
+
+def _ensure_project_network(kubetools_config):
+    if is_dev_network_env(kubetools_config):
+        return  # the dev network is managed by init_backend
+
+    docker_client = get_docker_client()
+    network_name = get_compose_network_name(kubetools_config)
+
+    if any(
+        network['Name'] == network_name
+        for network in docker_client.api.networks(names=[network_name])
+    ):
+        return
+
+    docker_client.api.create_network(network_name, labels={
+        'com.docker.compose.network': 'default',
+        'com.docker.compose.project': get_compose_name(kubetools_config),
+    })
+
+
+def _make_volume_bind(volume):
+    '''
+    Returns the container path and bind (None for anonymous volumes) of a short
+    (`[source:]target[:mode]`) or long (dict) syntax service volume.
+    '''
+
+    if isinstance(volume, dict):
+        source = volume.get('source')
+        container_path = volume['target']
+        mode = 'ro' if volume.get('read_only') else None
+    else:
+        volume_parts = volume.split(':', 2)
+        if len(volume_parts) == 1:
+            volume_parts.insert(0, None)
+
+        source, container_path = volume_parts[:2]
+        mode = volume_parts[2] if len(volume_parts) > 2 else None
+
+    if not source:
+        return container_path, None
+
+    # Named volumes are passed through, paths are relative to the project directory
+    if source.startswith(('.', '/', '~')):
+        source = path.abspath(path.expanduser(source))
+
+    bind = '{0}:{1}'.format(source, container_path)
+    if mode:
+        bind = '{0}:{1}'.format(bind, mode)
+
+    return container_path, bind
+
+
+def _make_port_bindings(ports):
+    container_ports = []
+    port_bindings = {}
+
+    for port in ports:
+        port_parts = str(port).split(':')
+        container_port = port_parts[-1]
+        host_port = port_parts[-2] if len(port_parts) > 1 else None
+
+        if '/' in container_port:
+            port_number, protocol = container_port.split('/', 1)
+            container_ports.append((int(port_number), protocol))
+        else:
+            container_ports.append(int(container_port))
+
+        port_bindings[container_port] = int(host_port) if host_port else None
+
+    return container_ports, port_bindings
+
+
+def _create_container(
+    kubetools_config, name, service,
+    container_name,
+    labels,
+    aliases=None,
+    publish_ports=True,
+    **kwargs,
+):
+    docker_client = get_docker_client()
+
+    for key in service:
+        if key not in HANDLED_KEYS:
+            logger.warning('Ignoring unsupported container key for {0}: {1}'.format(
+                name, key,
+            ))
+
+    image = _ensure_image(kubetools_config, name, service)
+    _ensure_project_network(kubetools_config)
+
+    network_name = get_compose_network_name(kubetools_config)
+
+    container_ports = None
+    port_bindings = None
+    if publish_ports and service.get('ports'):
+        container_ports, port_bindings = _make_port_bindings(service['ports'])
+
+    volumes = []
+    binds = []
+    tmpfs = {}
+
+    for volume in service.get('volumes', []):
+        if isinstance(volume, dict) and volume.get('type') == 'tmpfs':
+            tmpfs[volume['target']] = ''
+            continue
+
+        container_path, bind = _make_volume_bind(volume)
+        volumes.append(container_path)
+        if bind:
+            binds.append(bind)
+
+    host_config = docker_client.api.create_host_config(
+        binds=binds,
+        port_bindings=port_bindings,
+        network_mode=network_name,
+        tmpfs=tmpfs or None,
+        **{
+            key: service[key]
+            for key in HOST_CONFIG_KEYS
+            if key in service
+        },
+    )
+
+    networking_config = docker_client.api.create_networking_config({
+        network_name: docker_client.api.create_endpoint_config(aliases=aliases),
+    })
+
+    container_labels = dict(service.get('labels', {}))
+    container_labels.update(labels)
+
+    container_kwargs = {
+        key: service[key]
+        for key in CONTAINER_KEYS
+        if key in service
+    }
+    container_kwargs.update({
+        'image': image,
+        'name': container_name,
+        'command': service.get('command'),
+        'entrypoint': service.get('entrypoint'),
+        'environment': _get_environment(service),
+        'tty': service.get('tty', False),
+        'stdin_open': service.get('stdin_open', False),
+        'labels': container_labels,
+        'ports': container_ports,
+        'volumes': volumes,
+        'host_config': host_config,
+        'networking_config': networking_config,
+    })
+    container_kwargs.update(kwargs)
+
+    return docker_client.api.create_container(**container_kwargs)['Id']
+
+
+def _build_containers(kubetools_config, names):
+    containers_status = get_containers_status(kubetools_config)
+
+    # Skip any containers that are already up
+    names = [
+        name for name in names
+        if not (name in containers_status and containers_status[name]['up'])
+    ]
+
+    if not names:
+        return
+
+    # Build the image once and tag it for every other container that shares
+    # the same build context.
+    build_name = names[0]
+    image = _build_image(
+        kubetools_config, build_name,
+        _get_service(kubetools_config, build_name),
+    )
+
+    docker_client = get_docker_client()
+    for name in names[1:]:
+        repository, tag = docker.utils.parse_repository_tag(get_service_image_name(
+            kubetools_config, name, _get_service(kubetools_config, name),
+        ))
+        docker_client.api.tag(image, repository, tag)
+
+
+def build_containers(kubetools_config, names=None):
+    # Build each unique context/Dockerfile in parallel
+    run_in_threads(
+        lambda names: _build_containers(kubetools_config, names),
+        get_build_groups(kubetools_config, names),
+    )
+
+
+def _up_container(kubetools_config, name):
+    docker_client = get_docker_client()
+    status = get_container_status(kubetools_config, name)
+
+    # Skip if the container is already up
+    if status and status['up']:
+        return
+
+    if status and status['id']:
+        container_id = status['id']
+    else:
+        service = _get_service(kubetools_config, name)
+        aliases = [name]
+        aliases.extend(service.get('networks', {}).get('default', {}).get('aliases', []))
+
+        container_id = _create_container(
+            kubetools_config, name, service,
+            container_name='{0}_{1}_1'.format(get_compose_name(kubetools_config), name),
+            labels=_get_project_labels(kubetools_config, name),
+            aliases=aliases,
+        )
+
+    docker_client.api.start(container_id)
+
+
+def up_containers(kubetools_config, names=None):
+    # Dependencies are started and probed together before any deployments
+    for names in get_container_start_groups(kubetools_config, names):
+        run_in_threads(lambda name: _up_container(kubetools_config, name), names)
+        refresh_containers_status(kubetools_config, names)
+
+        for name in names:
+            if not get_container_status(kubetools_config, name)['up']:
+                raise KubeDevError('Container {0} did not start properly'.format(
+                    click.style(name, bold=True),
+                ))
+
+        run_in_threads(lambda name: probe_container(kubetools_config, name), names)
+
+
+def destroy_containers(kubetools_config, names=None, remove_images=False):
+    docker_client = get_docker_client()
+
+    labels = ['com.docker.compose.project={0}'.format(get_compose_name(kubetools_config))]
+    if names:
+        names = set(names)
+
+    # Remove one-off (run) containers as well as the service containers
+    for container in docker_client.api.containers(all=True, filters={'label': labels}):
+        if names and container['Labels']['com.docker.compose.service'] not in names:
+            continue
+
+        logger.debug('Removing container: {0}'.format(container['Names'][0]))
+        docker_client.api.remove_container(container['Id'], force=True)
+
+    if not names and not is_dev_network_env(kubetools_config):
+        try:
+            docker_client.api.remove_network(get_compose_network_name(kubetools_config))
+        except docker.errors.NotFound:
+            pass
+
+    if remove_images:
+        compose_config = get_compose_config(kubetools_config)
+
+        # Remove images built for this environment (not pulled images), like
+        # `docker-compose down --rmi local`.
+        for name, service in compose_config['services'].items():
+            if names and name not in names:
+                continue
+
+            if 'build' in service and 'image' not in service:
+                try:
+                    docker_client.api.remove_image(
+                        get_compose_image_name(kubetools_config, name),
+                        force=True,
+                    )
+                except docker.errors.NotFound:
+                    pass
+
+    refresh_containers_status(kubetools_config, names)
+
+
+def start_containers(kubetools_config, names=None):
+    docker_client = get_docker_client()
+    names = get_names_to_start(kubetools_config, names)
+
+    for name in names:
+        docker_client.api.start(_get_container_id(kubetools_config, name))
+
+    refresh_containers_status(kubetools_config, names)
+
+
+def stop_containers(kubetools_config, names=None):
+    docker_client = get_docker_client()
+    containers_status = get_containers_status(kubetools_config)
+
+    if not names:
+        names = list(containers_status.keys())
+
+    for name in names:
+        container_status = containers_status.get(name)
+
+        if container_status and container_status['up']:
+            docker_client.api.stop(container_status['id'])
+
+    refresh_containers_status(kubetools_config, names)
+
+
+def _stream_output(output):
+    for chunk in output:
+        click.echo(chunk.decode('utf-8', 'ignore'), nl=False)
+
+
+def _capture_output(output_stream, progress_name):
+    output = CommandOutput()
+    progress = PROGRESS_DISPLAY.add_task(progress_name)
+
+    try:
+        for chunk in output_stream:
+            output.write(chunk)
+            progress.update(output.status)
+
+        output.finish()
+        return output.get_output()
+    finally:
+        progress.done()
+        output.close()
+
+
+def run_container(
+    kubetools_config, container, command,
+    envvars=None, capture_output=False, progress_name=None,
+):
+    if len(command) == 0:
+        raise KubeDevError('No command provided to run container')
+
+    docker_client = get_docker_client()
+    service = _get_service(kubetools_config, container)
+
+    # Match `docker-compose run --entrypoint`, where a single string is split
+    entrypoint = list(command)
+    if len(command) == 1:
+        entrypoint = shlex.split(command[0])
+
+    environment = _get_environment(service)
+    if envvars:
+        environment.extend(envvars)
+
+    interactive = not capture_output and _is_interactive()
+
+    container_id = _create_container(
+        kubetools_config, container, service,
+        container_name='{0}_{1}_run_{2}'.format(
+            get_compose_name(kubetools_config), container, uuid4().hex[:12],
+        ),
+        labels=_get_project_labels(kubetools_config, container, oneoff=True),
+        publish_ports=False,
+        entrypoint=entrypoint,
+        environment=environment,
+        tty=interactive,
+        stdin_open=interactive,
+    )
+
+    output = None
+
+    try:
+        # Attaching a terminal needs the docker client, as with `ktd attach`
+        if interactive:
+            exit_code = os.WEXITSTATUS(os.system(
+                'docker start --attach --interactive {0}'.format(container_id),
+            ))
+        else:
+            docker_client.api.start(container_id)
+            logs = docker_client.api.logs(container_id, stream=True, follow=True)
+
+            if capture_output:
+                output = _capture_output(logs, progress_name or 'run {0}'.format(container))
+            else:
+                _stream_output(logs)
+
+            exit_code = docker_client.api.wait(container_id)['StatusCode']
+    finally:
+        docker_client.api.remove_container(container_id, force=True)
+
+    if exit_code > 0:
+        raise KubeDevCommandError(
+            'Container command failed: {0}'.format(command),
+            output,
+        )
+
+    return output
+
+
+def exec_container(
+    kubetools_config, container, command,
+    capture_output=False, progress_name=None,
+):
+    container_id = _get_container_id(kubetools_config, container)
+    output = None
+
+    if not capture_output and _is_interactive():
+        exit_code = os.WEXITSTATUS(os.system('docker exec -it {0} {1}'.format(
+            container_id,
+            ' '.join(shlex.quote(arg) for arg in command),
+        )))
+    else:
+        docker_client = get_docker_client()
+        exec_id = docker_client.api.exec_create(container_id, list(command))
+        output_stream = docker_client.api.exec_start(exec_id, stream=True)
+
+        if capture_output:
+            output = _capture_output(
+                output_stream,
+                progress_name or 'exec {0}'.format(container),
+            )
+        else:
+            _stream_output(output_stream)
+
+        exit_code = docker_client.api.exec_inspect(exec_id)['ExitCode']
+
+    if exit_code:
+        raise KubeDevCommandError(
+            'Command failed in {0}: {1}'.format(container, command),
+            output,
+        )
+
+    return output
@@ -1,42 +1,43 @@
-import os
+import json
 import shlex
 
-from time import sleep
+from collections import OrderedDict
+from os import path
 
 import click
-import requests
-
-from pyretry import retry
+import docker
 
+from kubetools.base_images import ensure_base_images
+from kubetools.dev.process_util import run_in_threads
 from kubetools.exceptions import KubeDevError
-from kubetools.log import logger
 from kubetools.settings import get_settings
 
-from .config import (
+from .config import (  # noqa: F401
     get_all_containers,
     get_all_containers_by_name,
+    get_build_args,
+    get_compose_image_name,
+    get_container_start_groups,
+    get_service_image_name,
+    remove_compose_config,
 )
-from .docker_util import (
+from .docker_util import (  # noqa: F401
     ensure_docker_dev_network,
     get_container_status,
     get_containers_status,
+    get_docker_client,
+    kill_run_containers,
+    refresh_containers_status,
     run_compose_process,
 )
+from .log_util import follow_containers_logs
+from .probe import probe_container
 
 
 def init_backend():
     ensure_docker_dev_network()
 
 
-def http_get(url, timeout):
-    try:
-        response = requests.get(url, timeout=timeout)
-        response.raise_for_status()
-
-    except requests.RequestException as e:
-        raise KubeDevError('Container start failed HTTP check: {0}'.format(e))
-
-
 def find_container_for_config(kubetools_config, config):
     container_context = config['containerContext']
     all_containers = get_all_containers(kubetools_config)
@@ -50,21 +51,67 @@ def find_container_for_config(kubetools_config, config):
         ).format(container_context))
 
 
-def _build_container(kubetools_config, name, dockerfile):
-    container_status = get_containers_status(kubetools_config)
+def _get_build_key(config):
+    build = {
+        key: value
+        for key, value in config['build'].items()
+        if key not in ('preBuildCommands', 'registry')
+    }
+    build.setdefault('context', '.')
+    return json.dumps(build, sort_keys=True)
+
 
-    # Skip if the container is already up
-    if name in container_status and container_status[name]['up']:
+def _build_containers(kubetools_config, names):
+    containers_status = get_containers_status(kubetools_config)
+
+    # Skip any containers that are already up
+    names = [
+        name for name in names
+        if not (name in containers_status and containers_status[name]['up'])
+    ]
+
+    if not names:
         return
 
+    # Build the image once and tag it for every other container that shares
+    # the same build context.
+    build_name = names[0]
+    containers = get_all_containers_by_name(kubetools_config)
+    build = containers[build_name]['build']
+
+    # Only pull base images not checked recently (or that can't be worked out)
+    pull_arguments = ()
+    if not ensure_base_images(
+        path.join(build.get('context', '.'), build['dockerfile']),
+        build_args=get_build_args(build),
+    ):
+        pull_arguments = ('--pull',)
+
     run_compose_process(
         kubetools_config,
-        ('build', '--pull', name),
+        ('build', *pull_arguments, build_name),
         hide_output=True,
+        progress_name='build {0}'.format(build_name),
     )
 
+    if len(names) > 1:
+        image = get_docker_client().images.get(
+            get_service_image_name(kubetools_config, build_name, containers[build_name]),
+        )
+
+        for name in names[1:]:
+            repository, tag = docker.utils.parse_repository_tag(
+                get_service_image_name(kubetools_config, name, containers[name]),
+            )
+            image.tag(repository, tag=tag)
+
+
+def get_build_groups(kubetools_config, names=None):
+    '''
+    Get groups of container names that share the same build context/Dockerfile,
+    and so only need building once.
+    '''
 
-def build_containers(kubetools_config, names=None):
     all_containers = get_all_containers(kubetools_config)
 
     # Filter list of containers to build if specified
@@ -76,10 +123,11 @@ def build_containers(kubetools_config, names=None):
         ]
 
     seen_dockerfiles = set()
+    build_key_to_names = OrderedDict()
 
     for name, config in all_containers:
-        # Skip any image based containers
-        if 'image' in config:
+        # Skip any image based containers (images may also be built, as compose does)
+        if 'build' not in config:
             continue
 
         dockerfile = config['build']['dockerfile']
@@ -99,134 +147,73 @@ def build_containers(kubetools_config, names=None):
                 ))
 
                 for command in pre_build_commands:
+                    if isinstance(command, dict):
+                        command = command['command']
                     click.echo(' '.join(command))
 
         seen_dockerfiles.add(dockerfile)
-        _build_container(kubetools_config, name, dockerfile)
-
-
-def _up_container(kubetools_config, name):
-    containers_status = get_containers_status(kubetools_config)
-
-    # Skip if the container is already up
-    if name in containers_status and containers_status[name]['up']:
-        return
-
-    # Up the container in the background
-    run_compose_process(kubetools_config, ('up', '-d', name))
-
-    # Get the new status of the container
-    status = get_container_status(kubetools_config, name)
-
-    if not status['up']:
-        raise KubeDevError('Container {0} did not start properly'.format(
-            click.style(name, bold=True),
-        ))
-
-
-def _probe_container(kubetools_config, name):
-    settings = get_settings()
-
-    containers = get_all_containers_by_name(kubetools_config)
-    config = containers[name]
-
-    status = get_container_status(kubetools_config, name)
-
-    # Check for readinessProbe or probes (probes = readiness + liveness)
-    probe = config.get('readinessProbe', config.get('probes'))
-    if probe:
-        timeout = probe.get('timeoutSeconds', 5)
-        retries = probe.get('failureThreshold', 5)
-
-        # Execute a command to check for container up?
-        if 'exec' in probe:
-            ready_command = probe['exec']['command']
-
-            click.echo('--> Waiting for {0} to be ready with {1} (timeout={2}, retries={3})'.format(
-                name, click.style(' '.join(ready_command), bold=True), timeout, retries,
-            ))
-
-            command = ['exec', '-T', name]
-            command.extend(ready_command)
-
-            run_with_retry = retry(
-                KubeDevError,
-                num_retries=retries,
-                timeout=timeout,
-            )(run_compose_process)
+        build_key_to_names.setdefault(_get_build_key(config), []).append(name)
 
-            run_with_retry(kubetools_config, command, hide_output=True)
+    return list(build_key_to_names.values())
 
-        # Check HTTP status to check for container up?
-        if 'httpGet' in probe:
-            http_path = probe['httpGet'].get('path', '/')
 
-            click.echo((
-                '--> Waiting for {0} to be ready with HTTP GET '
-                '{1} (timeout={2}, retries={3})'
-            ).format(
-                name, click.style(http_path, bold=True), timeout, retries,
-            ))
-
-            http_port = probe['httpGet'].get('port', 80)
-            tcp_port = '{0}/tcp'.format(http_port)
+def build_containers(kubetools_config, names=None):
+    # Build each unique context/Dockerfile in parallel
+    run_in_threads(
+        lambda names: _build_containers(kubetools_config, names),
+        get_build_groups(kubetools_config, names),
+    )
 
-            # Find the localhost port # matching the containers HTTP port
-            target_port = None
-            for port in status['ports']:
-                if port['local'] == tcp_port:
-                    target_port = port['host']
-                    break
 
-            http_url = 'http://{0}:{1}{2}'.format(
-                settings.DEV_HOST, target_port, http_path,
-            )
+def _up_containers(kubetools_config, names):
+    containers_status = get_containers_status(kubetools_config)
 
-            get_with_retry = retry(
-                KubeDevError,
-                num_retries=retries,
-                timeout=timeout,
-            )(http_get)
+    # Skip any containers that are already up
+    names = [
+        name for name in names
+        if not (name in containers_status and containers_status[name]['up'])
+    ]
 
-            logger.debug('Executing HTTP check: {0}'.format(http_url))
-            get_with_retry(http_url, timeout)
+    if not names:
+        return
 
-    # No probe? Sleep 2s and check it's still up as a super basic check
-    else:
-        sleep(2)
+    # Up the containers together in the background
+    run_compose_process(kubetools_config, ('up', '-d') + tuple(names))
+    refresh_containers_status(kubetools_config, names)
 
+    for name in names:
         # Get the new status of the container
         status = get_container_status(kubetools_config, name)
 
         if not status['up']:
-            raise KubeDevError('Container {0} did not stay up for >2s'.format(
+            raise KubeDevError('Container {0} did not start properly'.format(
                 click.style(name, bold=True),
             ))
 
 
 def up_containers(kubetools_config, names=None):
-    all_containers = get_all_containers(kubetools_config)
-
-    # Filter matching containers if specified
-    if names:
-        all_containers = [
-            (name, container)
-            for name, container in all_containers
-            if name in names
-        ]
-
-    # Up & probe all the containers in order
-    for name, _ in all_containers:
-        _up_container(kubetools_config, name)
-        _probe_container(kubetools_config, name)
+    # Dependencies are started and probed together before any deployments
+    for names in get_container_start_groups(kubetools_config, names):
+        _up_containers(kubetools_config, names)
+        run_in_threads(
+            lambda name: probe_container(kubetools_config, name),
+            names,
+        )
 
 
-def destroy_containers(kubetools_config, names=None):
+def destroy_containers(kubetools_config, names=None, remove_images=False):
     containers_status = get_containers_status(kubetools_config)
 
-    if containers_status:
+    if containers_status or remove_images:
         if not names:  # Shortcut: bring the entire environment down
-            return run_compose_process(kubetools_config, ('down', '--remove-orphans'))
+            compose_command = ('down', '--remove-orphans')
+            if remove_images:
+                # Remove images built for this environment (not pulled images)
+                compose_command += ('--rmi', 'local')
+
+            run_compose_process(kubetools_config, compose_command)
+            refresh_containers_status(kubetools_config)
+            return
 
     all_containers = get_all_containers(kubetools_config)
 
@@ -241,8 +228,15 @@ def destroy_containers(kubetools_config, names=None):
     for name, config in all_containers:
         run_compose_process(kubetools_config, ('rm', '--stop', '--force', name))
 
+    refresh_containers_status(kubetools_config, [name for name, _ in all_containers])
+
+
+def get_names_to_start(kubetools_config, names=None):
+    '''
+    Get (and check) the names of existing containers to start, defaulting to
+    every container that exists.
+    '''
 
-def start_containers(kubetools_config, names=None):
     containers_status = get_containers_status(kubetools_config)
 
     # Check each container is stopped
@@ -272,12 +266,20 @@ def start_containers(kubetools_config, names=None):
                 'please use `ktd up` to create new containers.'
             ))
 
+    return names
+
+
+def start_containers(kubetools_config, names=None):
+    names = get_names_to_start(kubetools_config, names)
+
     run_compose_process(kubetools_config, ('start',) + tuple(names))
+    refresh_containers_status(kubetools_config, names)
 
 
 def stop_containers(kubetools_config, names=None):
     if not names:
         run_compose_process(kubetools_config, ('stop',))
+        refresh_containers_status(kubetools_config)
         return
 
     containers_status = get_containers_status(kubetools_config)
@@ -289,10 +291,16 @@ def stop_containers(kubetools_config, names=None):
         if container_status and container_status['up']:
             run_compose_process(kubetools_config, ('stop', name))
 
+    refresh_containers_status(kubetools_config, names)
 
-def build_run_compose_command(container, command, envvars):
+
+def build_run_compose_command(container, command, envvars, tty=True):
     compose_command = ['run']
 
+    if not tty:
+        # Don't allocate a tty when capturing the output
+        compose_command.append('-T')
+
     if envvars:
         compose_command.extend(['-e{0}'.format(e) for e in envvars])
 
@@ -309,29 +317,49 @@ def build_run_compose_command(container, command, envvars):
     return compose_command
 
 
-def run_container(kubetools_config, container, command, envvars=None):
-    compose_command = build_run_compose_command(container, command, envvars)
-    run_compose_process(kubetools_config, compose_command)
+def run_container(
+    kubetools_config, container, command,
+    envvars=None, capture_output=False, progress_name=None,
+):
+    compose_command = build_run_compose_command(
+        container, command, envvars,
+        tty=not capture_output,
+    )
 
+    return run_compose_process(
+        kubetools_config, compose_command,
+        hide_output=capture_output,
+        progress_name=progress_name,
+    )
 
-def exec_container(kubetools_config, container, command):
-    compose_command = ['exec', container]
-    compose_command.extend(command)
 
-    run_compose_process(kubetools_config, compose_command)
+def exec_container(
+    kubetools_config, container, command,
+    capture_output=False, progress_name=None,
+):
+    compose_command = ['exec']
 
+    if capture_output:
+        # Don't allocate a tty when capturing the output
+        compose_command.append('-T')
 
-def follow_logs(kubetools_config, containers, tail='all'):
-    # Set this so we don't error and exit after 60s inactivity - which is the
-    # ridiclous default value set by the docker-compose team.
-    os.environ['COMPOSE_HTTP_TIMEOUT'] = '86400'
+    compose_command.append(container)
+    compose_command.extend(command)
 
-    args = ['logs', '--follow', '--tail={0}'.format(tail)]
+    return run_compose_process(
+        kubetools_config, compose_command,
+        hide_output=capture_output,
+        progress_name=progress_name,
+    )
 
-    if containers:
-        args.extend(containers)
 
-    run_compose_process(kubetools_config, args)
+def follow_logs(kubetools_config, containers, tail='all', since=None, pattern=None):
+    # Stream the logs straight from the Docker API rather than via
+    # `docker-compose logs`, which times out after 60s of inactivity.
+    follow_containers_logs(
+        kubetools_config, containers,
+        tail=tail, since=since, pattern=pattern,
+    )
 
 
 def _print_containers(containers):
@@ -1,9 +1,12 @@
+import json
 import re
 
 from collections import OrderedDict
+from copy import deepcopy
 from functools import lru_cache
 from hashlib import md5
-from os import makedirs, path
+from os import makedirs, path, remove, replace
+from tempfile import NamedTemporaryFile
 
 import click
 import yaml
@@ -18,6 +21,7 @@ NON_COMPOSE_KEYS = (
     # Kubetools dev specific
     'devScripts',
     'containerContext',
+    'testResetCommand',
 
     # Kubetools -> Kubernetes specific
     'servicePorts',
@@ -33,6 +37,12 @@ NON_COMPOSE_KEYS = (
     'is_dependency',
 )
 
+# Compose name -> (hash of the inputs, compose config generated from them)
+COMPOSE_CONFIGS = {}
+
+# Compose filename -> compose config last written to it by this process
+WRITTEN_COMPOSE_CONFIGS = {}
+
 CONTAINER_KEYS = ('dependencies', 'deployments')
 CONTAINER_KEY_TO_FLAG = {
     'dependencies': 'is_dependency',
@@ -59,6 +69,16 @@ def get_compose_name(kubetools_config):
     return dockerise_label(name_env)
 
 
+def get_compose_image_name(kubetools_config, name):
+    # Images built by docker-compose (v1) are named PROJECT_SERVICE
+    return '{0}_{1}'.format(get_compose_name(kubetools_config), name)
+
+
+def get_service_image_name(kubetools_config, name, config):
+    # Services with their own image are built (tagged) as that image instead
+    return config.get('image') or get_compose_image_name(kubetools_config, name)
+
+
 def get_compose_dirname(kubetools_config):
     settings = get_settings()
     return path.join(
@@ -101,7 +121,53 @@ def get_all_containers_by_name(kubetools_config, container_keys=CONTAINER_KEYS):
     ))
 
 
+def get_build_args(build):
+    '''
+    Get the args of a container build config as a dict.
+    '''
+
+    build_args = build.get('args') or {}
+    if isinstance(build_args, list):
+        build_args = dict(arg.split('=', 1) for arg in build_args)
+    return build_args
+
+
+def get_container_start_groups(kubetools_config, names=None):
+    '''
+    Get groups of container names to start in order - all dependencies, which
+    must be ready before any of the deployments are started.
+    '''
+
+    all_containers = get_all_containers(kubetools_config)
+
+    # Filter matching containers if specified
+    if names:
+        all_containers = [
+            (name, container)
+            for name, container in all_containers
+            if name in names
+        ]
+
+    dependency_names = [
+        name for name, container in all_containers
+        if container.get('is_dependency')
+    ]
+    deployment_names = [
+        name for name, container in all_containers
+        if not container.get('is_dependency')
+    ]
+
+    return [
+        names
+        for names in (dependency_names, deployment_names)
+        if names
+    ]
+
+
 def _create_compose_service(kubetools_config, name, config, envvars=None):
+    # Copy so we don't strip keys (eg preBuildCommands) from the kubetools config
+    config = deepcopy(config)
+
     for invalid_build_key in (
         'preBuildCommands',
         'registry',
@@ -133,26 +199,32 @@ def _create_compose_service(kubetools_config, name, config, envvars=None):
         service['build']['context'] = '.'
 
     if 'ports' in config:
-        # Generate a consistent base port for this project/container combo
-        hash_string = '{0}-{1}'.format(get_project_name(kubetools_config), name)
-
-        # MD5 the string, integer that and then modulus 10k to shorten it down
-        port_base = int(md5(hash_string.encode('utf-8')).hexdigest(), 16) % 10000
-        # And bump by 10k so we don't stray into the privileged port range (<1025)
-        port_base += 10000
-
-        # Reassign ports with explicit host port numbers
         ports = []
 
         for port in config['ports']:
             if isinstance(port, dict):
                 port = port['port']
+            ports.append(port)
 
-            ports.append(
-                '{0}:{1}'.format(int(port_base) + int(port), port),
-            )
+        # Only expose the container ports and let Docker pick free host ports,
+        # so isolated environments of the same project never collide.
+        if kubetools_config.get('_ephemeral_ports'):
+            service['ports'] = [str(port) for port in ports]
 
-        service['ports'] = ports
+        else:
+            # Generate a consistent base port for this project/container combo
+            hash_string = '{0}-{1}'.format(get_project_name(kubetools_config), name)
+
+            # MD5 the string, integer that and then modulus 10k to shorten it down
+            port_base = int(md5(hash_string.encode('utf-8')).hexdigest(), 16) % 10000
+            # And bump by 10k so we don't stray into the privileged port range (<1025)
+            port_base += 10000
+
+            # Reassign ports with explicit host port numbers
+            service['ports'] = [
+                '{0}:{1}'.format(int(port_base) + int(port), port)
+                for port in ports
+            ]
 
     # Make our service - drop anything kubernetes or kubetools specific
     service = {
@@ -187,46 +259,87 @@ def _create_compose_service(kubetools_config, name, config, envvars=None):
 @lru_cache(maxsize=1)
 def get_dev_network_environment_variables():
     # This "fixes" a horrible circular dependency between config/docker_util
-    from .docker_util import get_all_docker_dev_network_containers
-    containers = get_all_docker_dev_network_containers()
+    from .docker_util import get_dev_network_aliases
 
-    envvars = set()
+    return [
+        'DEV_{0}={1}'.format(alias.upper().replace('-', '_'), alias)
+        for alias in get_dev_network_aliases()
+    ]
 
-    for container in containers:
-        networks = container.attrs['NetworkSettings']['Networks']
-        if 'dev' not in networks:
-            continue
 
-        aliases = networks['dev']['Aliases']
-        for alias in aliases:
-            if '-' in alias:
-                break
-        else:  # no alias with "-"
-            continue
+def _get_compose_config_hash(kubetools_config, dev_network_envvars):
+    hash_data = json.dumps(
+        [kubetools_config, sorted(dev_network_envvars or [])],
+        sort_keys=True,
+        default=str,
+    )
+    return md5(hash_data.encode('utf-8')).hexdigest()
 
-        envar = alias.upper().replace('-', '_')
-        envvars.add('DEV_{0}={1}'.format(envar, alias))
-    return list(envvars)
 
+def write_file_if_changed(filename, data):
+    if path.exists(filename):
+        with open(filename, 'r') as f:
+            if f.read() == data:
+                return
 
-def create_compose_config(kubetools_config):
+    # Write to a temporary file and rename so nothing ever reads a partial file
+    with NamedTemporaryFile(
+        'w',
+        dir=path.dirname(filename),
+        prefix='.{0}.'.format(path.basename(filename)),
+        delete=False,
+    ) as f:
+        f.write(data)
+
+    replace(f.name, filename)
+
+
+def is_dev_network_env(kubetools_config):
     # If we're not in a custom env, everything sits on the "dev" network. Envs
     # remain encapsulated inside their own network.
+    DEV_DEFAULT_ENV = get_settings().DEV_DEFAULT_ENV
+    return kubetools_config.get('env', DEV_DEFAULT_ENV) == DEV_DEFAULT_ENV
+
+
+def get_compose_network_name(kubetools_config):
+    if is_dev_network_env(kubetools_config):
+        return 'dev'
+
+    # Network docker-compose creates for the default network of a project
+    return '{0}_default'.format(get_compose_name(kubetools_config))
+
+
+def get_compose_config(kubetools_config):
+    '''
+    Generate the docker-compose config for a Kubetools config, memoized on the
+    inputs so repeated calls don't regenerate (or print) anything.
+    '''
+
     DEV_DEFAULT_ENV = get_settings().DEV_DEFAULT_ENV
     ktd_env = kubetools_config.get('env', DEV_DEFAULT_ENV)
-    dev_network = ktd_env == DEV_DEFAULT_ENV
+    dev_network = is_dev_network_env(kubetools_config)
 
+    # Note: this also flags containers as dependencies/deployments in the config
     all_containers = get_all_containers(kubetools_config)
 
+    dev_network_envvars = None
+    if dev_network:
+        dev_network_envvars = get_dev_network_environment_variables()
+
+    compose_name = get_compose_name(kubetools_config)
+    config_hash = _get_compose_config_hash(kubetools_config, dev_network_envvars)
+
+    if compose_name in COMPOSE_CONFIGS:
+        previous_hash, compose_config = COMPOSE_CONFIGS[compose_name]
+        if previous_hash == config_hash:
+            return compose_config
+
     envvars = [
         'KTD_ENV={0}'.format(ktd_env),
     ]
 
-    dev_network_envvars = None
-    if dev_network:
-        dev_network_envvars = get_dev_network_environment_variables()
-        if dev_network_envvars:
-            envvars.extend(dev_network_envvars)
+    if dev_network_envvars:
+        envvars.extend(dev_network_envvars)
 
     click.echo('--> Injecting environment variables:')
     for envar in envvars:
@@ -254,11 +367,36 @@ def create_compose_config(kubetools_config):
             },
         }
 
+    COMPOSE_CONFIGS[compose_name] = (config_hash, compose_config)
+    return compose_config
+
+
+def create_compose_config(kubetools_config):
+    compose_config = get_compose_config(kubetools_config)
+    compose_filename = get_compose_filename(kubetools_config)
+
+    # Skip writing entirely if nothing has changed since we last wrote the file
+    if (
+        WRITTEN_COMPOSE_CONFIGS.get(compose_filename) is compose_config
+        and path.exists(compose_filename)
+    ):
+        return
+
     yaml_data = yaml.safe_dump(compose_config)
 
     compose_dirname = get_compose_dirname(kubetools_config)
     if not path.exists(compose_dirname):
         makedirs(compose_dirname)
 
-    with click.open_file(get_compose_filename(kubetools_config), 'w') as f:
-        f.write(yaml_data)
+    write_file_if_changed(compose_filename, yaml_data)
+    WRITTEN_COMPOSE_CONFIGS[compose_filename] = compose_config
+
+
+def remove_compose_config(kubetools_config):
+    compose_filename = get_compose_filename(kubetools_config)
+
+    COMPOSE_CONFIGS.pop(get_compose_name(kubetools_config), None)
+    WRITTEN_COMPOSE_CONFIGS.pop(compose_filename, None)
+
+    if path.exists(compose_filename):
+        remove(compose_filename)
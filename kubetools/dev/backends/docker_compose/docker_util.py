@@ -1,6 +1,9 @@
+import json
 import sys
 
 from functools import lru_cache
+from os import makedirs, path
+from threading import Lock
 
 import docker
 import requests
@@ -8,6 +11,7 @@ import requests
 from kubetools.dev.process_util import run_process
 from kubetools.exceptions import KubeDevError
 from kubetools.log import logger
+from kubetools.settings import get_settings_directory
 
 from .config import (
     create_compose_config,
@@ -15,8 +19,12 @@ from .config import (
     get_all_containers,
     get_compose_filename,
     get_compose_name,
+    write_file_if_changed,
 )
 
+# Persisted index of container ID -> dev network alias, see get_dev_network_aliases
+DEV_NETWORK_ALIASES_FILENAME = 'dev-network-aliases.json'
+
 
 @lru_cache(maxsize=1)
 def get_docker_client():
@@ -58,39 +66,101 @@ def ensure_docker_dev_network():
             new_network.remove()
 
 
-def get_all_docker_dev_network_containers():
+def _get_dev_network_alias(docker_client, container_id):
+    try:
+        container = docker_client.api.inspect_container(container_id)
+    except docker.errors.NotFound:
+        return
+
+    network = container['NetworkSettings']['Networks'].get('dev') or {}
+
+    # Pick the project specific alias, eg app-mariadb
+    for alias in network.get('Aliases') or []:
+        if '-' in alias:
+            return alias
+
+
+def get_dev_network_aliases():
     '''
-    Gets the container names for everything using the global dev network.
+    Gets the project aliases (eg app-mariadb) of everything using the global
+    dev network.
 
     Note only containers created with the default "dev" env become part of this
     network - any custom env (eg when testing or `--env`) won't be included.
+
+    Aliases never change for a container, so they're kept in an index (by
+    container ID) in the settings directory and only new containers, listed by
+    Docker, need inspecting.
     '''
 
     docker_client = get_docker_client()
 
-    labels = [
-        # Ignore containers created by run/exec/etc (not services)
-        'com.docker.compose.oneoff=False',
-        # Load anything from a compose project
-        'com.docker.compose.project',
-    ]
-
-    docker_containers = docker_client.containers.list(all=True, filters={
-        'label': labels,
+    # Let Docker filter down to (non one-off) compose containers on the network
+    docker_containers = docker_client.api.containers(all=True, filters={
+        'network': 'dev',
+        'label': [
+            'com.docker.compose.oneoff=False',
+            'com.docker.compose.project',
+        ],
     })
 
-    return docker_containers
+    index_filename = path.join(get_settings_directory(), DEV_NETWORK_ALIASES_FILENAME)
+
+    index = {}
+    if path.exists(index_filename):
+        try:
+            with open(index_filename, 'r') as f:
+                index = json.load(f)
+        except ValueError:
+            logger.warning('Ignoring invalid dev network alias index: {0}'.format(
+                index_filename,
+            ))
+
+    # Rebuild the index from the current containers, dropping removed ones
+    new_index = {}
+    for container in docker_containers:
+        container_id = container['Id']
+
+        if container_id in index:
+            new_index[container_id] = index[container_id]
+        else:
+            new_index[container_id] = _get_dev_network_alias(docker_client, container_id)
+
+    if new_index != index:
+        makedirs(path.dirname(index_filename), exist_ok=True)
+        write_file_if_changed(index_filename, json.dumps(new_index, sort_keys=True))
 
+    return sorted(set(alias for alias in new_index.values() if alias))
 
-def get_containers_status(
+
+def _get_container_ports(docker_container):
+    ports = []
+    seen_local_ports = set()
+
+    # Container list data has one item per host binding (eg IPv4 & IPv6), we only
+    # want the first binding for each container port.
+    for port in docker_container['Ports']:
+        if not port.get('PublicPort'):
+            continue
+
+        local_port = '{0}/{1}'.format(port['PrivatePort'], port['Type'])
+        if local_port in seen_local_ports:
+            continue
+
+        seen_local_ports.add(local_port)
+        ports.append({
+            'local': local_port,
+            'host': str(port['PublicPort']),
+        })
+
+    return ports
+
+
+def _list_containers_status(
     kubetools_config,
     container_name=None,
     all_environments=False,
 ):
-    '''
-    Get the status of any containers for the current Kubetools project.
-    '''
-
     docker_client = get_docker_client()
 
     labels = [
@@ -115,7 +185,9 @@ def get_containers_status(
         )
 
     logger.debug('Listing Docker containers with labels={0}'.format(labels))
-    docker_containers = docker_client.containers.list(all=True, filters={
+    # Use the list API directly - the containers collection inspects every
+    # container individually, and the list data has everything we need.
+    docker_containers = docker_client.api.containers(all=True, filters={
         'label': labels,
     })
 
@@ -123,44 +195,30 @@ def get_containers_status(
     docker_name = dockerise_label(kubetools_config['name'])
 
     for container in docker_containers:
-        compose_project = container.labels['com.docker.compose.project']
+        container_labels = container['Labels'] or {}
+
+        compose_project = container_labels['com.docker.compose.project']
         if all_environments:
             if not compose_project.startswith(docker_name):
                 continue
 
             # For old Kubetools versions (<8) this label won't exist
-            kubetools_name = container.labels.get('kubetools.project.name')
+            kubetools_name = container_labels.get('kubetools.project.name')
             if kubetools_name and kubetools_config['name'] != kubetools_name:
                 continue
 
-        env = container.labels.get('kubetools.project.env')
+        env = container_labels.get('kubetools.project.env')
         # Compatability for existing containers created with kubetools <8
         if not env:
             env = compose_project.replace(docker_name, '')
 
-        # Where the name is compose-name_container_N, get container
-        name = container.name.split('_')[1]
-
-        status = container.status == 'running'
-        ports = []
-
-        if container.attrs['NetworkSettings']['Ports']:
-            for (
-                local_port, host_port,
-            ) in container.attrs['NetworkSettings']['Ports'].items():
-                if not host_port:
-                    continue
-
-                ports.append({
-                    'local': local_port,
-                    'host': host_port[0]['HostPort'],
-                })
+        name = container_labels['com.docker.compose.service']
 
         container_data = {
-            'up': status,
-            'ports': ports,
-            'id': container.id,
-            'labels': container.labels,
+            'up': container['State'] == 'running',
+            'ports': _get_container_ports(container),
+            'id': container['Id'],
+            'labels': container_labels,
         }
 
         env_containers = env_to_containers.setdefault(env, {})
@@ -194,9 +252,106 @@ def get_containers_status(
     return env_to_containers.get(kubetools_config['env'], {})
 
 
+class ContainersStatusSnapshot(object):
+    '''
+    Status of the containers in a compose project. Docker is listed once and then
+    only the containers we change are refreshed, rather than listing everything
+    each time we need a status.
+    '''
+
+    def __init__(self, kubetools_config):
+        self.kubetools_config = kubetools_config
+        self.containers = None
+        self.lock = Lock()
+
+    def get_all(self):
+        with self.lock:
+            if self.containers is None:
+                self.containers = _list_containers_status(self.kubetools_config)
+            return self.containers
+
+    def get(self, name):
+        return self.get_all().get(name)
+
+    def refresh(self, names=None):
+        if names is None:
+            with self.lock:
+                self.containers = None
+            return
+
+        containers = self.get_all()
+
+        for name in names:
+            container_status = _list_containers_status(
+                self.kubetools_config,
+                container_name=name,
+            ).get(name)
+
+            if container_status:
+                containers[name] = container_status
+
+
+# Compose project name -> ContainersStatusSnapshot, shared by everything a single
+# ktd command does.
+CONTAINERS_STATUS_SNAPSHOTS = {}
+
+
+def get_containers_status_snapshot(kubetools_config):
+    compose_name = get_compose_name(kubetools_config)
+
+    if compose_name not in CONTAINERS_STATUS_SNAPSHOTS:
+        CONTAINERS_STATUS_SNAPSHOTS[compose_name] = ContainersStatusSnapshot(kubetools_config)
+
+    return CONTAINERS_STATUS_SNAPSHOTS[compose_name]
+
+
+def refresh_containers_status(kubetools_config, names=None):
+    '''
+    Refresh the status of containers (or all if no names) after changing them.
+    '''
+
+    get_containers_status_snapshot(kubetools_config).refresh(names)
+
+
+def get_containers_status(kubetools_config, all_environments=False):
+    '''
+    Get the status of any containers for the current Kubetools project.
+    '''
+
+    if all_environments:
+        return _list_containers_status(kubetools_config, all_environments=True)
+
+    return get_containers_status_snapshot(kubetools_config).get_all()
+
+
 def get_container_status(kubetools_config, name):
-    containers = get_containers_status(kubetools_config, container_name=name)
-    return containers.get(name)
+    return get_containers_status_snapshot(kubetools_config).get(name)
+
+
+def kill_run_containers(kubetools_config, remove=False):
+    '''
+    Kill any running one-off (`run`) containers for this project, or with
+    remove=True remove all of them (running or not).
+    '''
+
+    docker_client = get_docker_client()
+
+    for container in docker_client.api.containers(all=remove, filters={
+        'label': [
+            'com.docker.compose.project={0}'.format(get_compose_name(kubetools_config)),
+            'com.docker.compose.oneoff=True',
+        ],
+    }):
+        logger.debug('Killing run container: {0}'.format(container['Id']))
+
+        try:
+            if remove:
+                docker_client.api.remove_container(container['Id'], force=True)
+            else:
+                docker_client.api.kill(container['Id'])
+        # The container may have exited/been removed in the meantime
+        except docker.errors.APIError as e:
+            logger.debug('Could not kill run container: {0}'.format(e))
 
 
 def run_compose_process(kubetools_config, command_args, **kwargs):
@@ -0,0 +1,176 @@
+import re
+
+from collections import deque
+from itertools import cycle
+from threading import Condition, Thread
+
+import click
+
+from kubetools.log import logger
+from kubetools.settings import get_settings
+
+from .docker_util import get_containers_status, get_docker_client
+
+# Same colour order docker-compose uses for its log prefixes
+PREFIX_COLORS = ('cyan', 'yellow', 'green', 'magenta', 'blue')
+
+# Max time the writer waits between checks that the readers are still alive
+WRITER_WAIT_TIME = 0.5
+
+
+class LogMultiplexer(object):
+    '''
+    Follows the logs of many containers at once, writing them interleaved with
+    a coloured name prefix (like `docker-compose logs`).
+
+    Each container is read by its own thread into a bounded buffer, and a single
+    writer drains every buffer in one write. When a noisy container outpaces the
+    terminal the oldest buffered lines are dropped (and counted) rather than
+    slowing every other container down. The optional pattern is matched against
+    the raw bytes so lines that don't match are never decoded.
+    '''
+
+    def __init__(self, buffer_size=None, pattern=None):
+        if buffer_size is None:
+            buffer_size = int(get_settings().DEV_LOG_BUFFER_LINES)
+
+        self.buffer_size = buffer_size
+        self.pattern = re.compile(pattern.encode('utf-8')) if pattern else None
+
+        self.condition = Condition()
+        self.containers = []
+        self.buffers = {}
+        self.dropped_lines = {}
+        self.readers = []
+
+    def add(self, name, container_id):
+        self.containers.append((name, container_id))
+        self.buffers[name] = deque(maxlen=self.buffer_size)
+        self.dropped_lines[name] = 0
+
+    def _buffer_lines(self, name, lines):
+        buffer = self.buffers[name]
+
+        with self.condition:
+            dropped = len(buffer) + len(lines) - self.buffer_size
+            if dropped > 0:
+                self.dropped_lines[name] += dropped
+
+            buffer.extend(lines)
+            self.condition.notify()
+
+    def _read_logs(self, name, container_id, tail, since):
+        docker_client = get_docker_client()
+        pattern = self.pattern
+
+        # Chunks from the Docker API don't necessarily align with lines
+        remainder = b''
+
+        try:
+            for chunk in docker_client.api.logs(
+                container_id,
+                stream=True,
+                follow=True,
+                tail=tail,
+                since=since,
+            ):
+                lines = (remainder + chunk).split(b'\n')
+                remainder = lines.pop()
+
+                if pattern:
+                    lines = [line for line in lines if pattern.search(line)]
+
+                if lines:
+                    self._buffer_lines(name, lines)
+        except Exception as e:
+            logger.warning('Error following logs for {0}: {1}'.format(name, e))
+
+        if remainder and (not pattern or pattern.search(remainder)):
+            self._buffer_lines(name, [remainder])
+
+        # Wake the writer so it notices this reader has finished
+        with self.condition:
+            self.condition.notify()
+
+    def _get_prefixes(self):
+        max_length = max(len(name) for name, _ in self.containers)
+
+        return {
+            name: click.style('{0} | '.format(name.ljust(max_length)), fg=color)
+            for (name, _), color in zip(self.containers, cycle(PREFIX_COLORS))
+        }
+
+    def _drain_buffers(self, prefixes):
+        output_lines = []
+
+        with self.condition:
+            for name, _ in self.containers:
+                prefix = prefixes[name]
+
+                dropped = self.dropped_lines[name]
+                if dropped:
+                    output_lines.append('{0}{1}'.format(prefix, click.style(
+                        '... {0} lines dropped (output too fast)'.format(dropped),
+                        'yellow',
+                    )))
+                    self.dropped_lines[name] = 0
+
+                buffer = self.buffers[name]
+                while buffer:
+                    output_lines.append('{0}{1}'.format(
+                        prefix, buffer.popleft().decode('utf-8', 'replace'),
+                    ))
+
+        return output_lines
+
+    def _has_buffered_lines(self):
+        return any(self.buffers.values()) or any(self.dropped_lines.values())
+
+    def follow(self, tail='all', since=None):
+        if not self.containers:
+            return
+
+        prefixes = self._get_prefixes()
+
+        for name, container_id in self.containers:
+            reader = Thread(
+                target=self._read_logs,
+                args=(name, container_id, tail, since),
+            )
+            reader.daemon = True
+            reader.start()
+            self.readers.append(reader)
+
+        while True:
+            with self.condition:
+                if not self._has_buffered_lines():
+                    if not any(reader.is_alive() for reader in self.readers):
+                        break
+
+                    self.condition.wait(WRITER_WAIT_TIME)
+
+            output_lines = self._drain_buffers(prefixes)
+            if output_lines:
+                click.echo('\n'.join(output_lines))
+
+
+def follow_containers_logs(
+    kubetools_config, containers,
+    tail='all', since=None, pattern=None,
+):
+    containers_status = get_containers_status(kubetools_config)
+
+    if not containers:
+        containers = sorted(containers_status.keys())
+
+    multiplexer = LogMultiplexer(pattern=pattern)
+
+    for name in containers:
+        container_status = containers_status.get(name)
+        if not container_status or not container_status['id']:
+            logger.warning('No container found for {0}'.format(name))
+            continue
+
+        multiplexer.add(name, container_status['id'])
+
+    multiplexer.follow(tail=tail, since=since)
@@ -0,0 +1,242 @@
+'''
+Readiness checks for dev containers, run directly against the Docker API (and
+the containers HTTP ports) rather than via docker-compose processes.
+'''
+
+from calendar import timegm
+from threading import Thread
+from time import sleep, strptime, time
+
+import click
+import docker
+import requests
+
+from kubetools.exceptions import KubeDevError
+from kubetools.log import logger
+from kubetools.settings import get_settings
+
+from .config import get_all_containers_by_name
+from .docker_util import get_container_status, get_docker_client
+
+# Retry failed checks after PROBE_INITIAL_DELAY seconds, doubling each time up
+# to PROBE_MAX_DELAY seconds.
+PROBE_INITIAL_DELAY = 0.05
+PROBE_MAX_DELAY = 2
+
+# How long a container without any probe/healthcheck must stay running
+NO_PROBE_RUNNING_TIME = 2
+
+
+class ContainerUnhealthyError(KubeDevError):
+    '''
+    Raised by checks when the container will never become ready.
+    '''
+
+
+def _wait_until(name, check, max_time):
+    deadline = time() + max_time
+    delay = PROBE_INITIAL_DELAY
+
+    while True:
+        try:
+            return check()
+
+        except ContainerUnhealthyError as e:
+            raise KubeDevError('Container {0} failed: {1}'.format(
+                click.style(name, bold=True), e,
+            ))
+
+        except KubeDevError as e:
+            if time() + delay > deadline:
+                raise KubeDevError('Container {0} was not ready after {1}s: {2}'.format(
+                    click.style(name, bold=True), max_time, e,
+                ))
+
+            logger.debug('Container {0} not ready: {1}'.format(name, e))
+
+        sleep(delay)
+        delay = min(delay * 2, PROBE_MAX_DELAY)
+
+
+def _run_with_timeout(function, timeout):
+    # Daemon thread so a call that never returns can't block ktd from exiting
+    result = {}
+
+    def run():
+        try:
+            result['value'] = function()
+        except Exception as e:
+            result['error'] = e
+
+    thread = Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+
+    if thread.is_alive():
+        raise KubeDevError('Timed out after {0}s'.format(timeout))
+
+    if 'error' in result:
+        raise result['error']
+
+    return result['value']
+
+
+def _make_exec_check(container_id, command, timeout):
+    docker_client = get_docker_client()
+
+    def run_command():
+        exec_id = docker_client.api.exec_create(container_id, command)
+        output = docker_client.api.exec_start(exec_id)
+        return docker_client.api.exec_inspect(exec_id)['ExitCode'], output
+
+    def check():
+        # Docker has no exec timeout, so give up waiting for a hung command
+        try:
+            exit_code, output = _run_with_timeout(run_command, timeout)
+        except (docker.errors.APIError, KubeDevError) as e:
+            raise KubeDevError('Exec check failed: {0}'.format(e))
+
+        if exit_code:
+            raise KubeDevError('Exec check exited {0}: {1}'.format(
+                exit_code, output.decode('utf-8', 'ignore').strip(),
+            ))
+
+    return check
+
+
+def _make_http_check(url, timeout):
+    # Keep the connection alive between checks
+    session = requests.Session()
+
+    def check():
+        try:
+            response = session.get(url, timeout=timeout)
+            response.raise_for_status()
+
+        except requests.RequestException as e:
+            raise KubeDevError('Container start failed HTTP check: {0}'.format(e))
+
+    return check
+
+
+def _get_http_url(kubetools_config, name, http_config):
+    status = get_container_status(kubetools_config, name)
+
+    http_path = http_config.get('path', '/')
+    tcp_port = '{0}/tcp'.format(http_config.get('port', 80))
+
+    # Find the localhost port # matching the containers HTTP port
+    target_port = None
+    for port in status['ports']:
+        if port['local'] == tcp_port:
+            target_port = port['host']
+            break
+
+    return 'http://{0}:{1}{2}'.format(get_settings().DEV_HOST, target_port, http_path)
+
+
+def _make_health_check(container_id):
+    docker_client = get_docker_client()
+
+    def check():
+        state = docker_client.api.inspect_container(container_id)['State']
+        health_status = state['Health']['Status']
+
+        if health_status == 'unhealthy':
+            # Stop checking, Docker has already used up the healthcheck retries
+            raise ContainerUnhealthyError('Docker healthcheck is unhealthy')
+
+        if health_status != 'healthy':
+            raise KubeDevError('Container healthcheck is {0}'.format(health_status))
+
+    return check
+
+
+def _parse_docker_time(value):
+    # Docker returns UTC RFC 3339 times with nanoseconds, eg
+    # 2020-01-01T00:00:00.123456789Z, which we only need to the second.
+    return timegm(strptime(value[:19], '%Y-%m-%dT%H:%M:%S'))
+
+
+def _wait_while_running(name, container_id, state):
+    docker_client = get_docker_client()
+
+    # Only wait for whatever is left of the time it must have been running for
+    running_time = time() - _parse_docker_time(state['StartedAt'])
+    wait_time = NO_PROBE_RUNNING_TIME - running_time
+
+    if wait_time > 0:
+        try:
+            # Returns as soon as the container stops (or times out if it doesn't)
+            docker_client.api.wait(container_id, timeout=wait_time, condition='not-running')
+        except requests.RequestException:
+            return
+
+    elif state['Running']:
+        return
+
+    raise KubeDevError('Container {0} did not stay up for >{1}s'.format(
+        click.style(name, bold=True), NO_PROBE_RUNNING_TIME,
+    ))
+
+
+def probe_container(kubetools_config, name):
+    '''
+    Wait for a container to be ready, using any readinessProbe/probes config,
+    or else the Docker healthcheck for the container, or else just check it
+    stays running.
+    '''
+
+    containers = get_all_containers_by_name(kubetools_config)
+    config = containers[name]
+
+    container_id = get_container_status(kubetools_config, name)['id']
+
+    # Check for readinessProbe or probes (probes = readiness + liveness)
+    probe = config.get('readinessProbe', config.get('probes'))
+    if probe:
+        timeout = probe.get('timeoutSeconds', 5)
+        retries = probe.get('failureThreshold', 5)
+        max_time = timeout * retries
+
+        # Execute a command to check for container up?
+        if 'exec' in probe:
+            ready_command = probe['exec']['command']
+
+            click.echo('--> Waiting for {0} to be ready with {1} (timeout={2}s)'.format(
+                name, click.style(' '.join(ready_command), bold=True), max_time,
+            ))
+
+            _wait_until(
+                name,
+                _make_exec_check(container_id, ready_command, timeout),
+                max_time,
+            )
+
+        # Check HTTP status to check for container up?
+        if 'httpGet' in probe:
+            http_url = _get_http_url(kubetools_config, name, probe['httpGet'])
+
+            click.echo('--> Waiting for {0} to be ready with HTTP GET {1} (timeout={2}s)'.format(
+                name, click.style(probe['httpGet'].get('path', '/'), bold=True), max_time,
+            ))
+
+            logger.debug('Executing HTTP check: {0}'.format(http_url))
+            _wait_until(name, _make_http_check(http_url, timeout), max_time)
+
+        return
+
+    state = get_docker_client().api.inspect_container(container_id)['State']
+
+    # Use the Docker healthcheck (eg from the image) if there is one
+    if 'Health' in state:
+        click.echo('--> Waiting for {0} to be healthy'.format(name))
+        _wait_until(
+            name,
+            _make_health_check(container_id),
+            int(get_settings().WAIT_MAX_TIME),
+        )
+
+    # No probe? Check it stays running as a super basic check
+    else:
+        _wait_while_running(name, container_id, state)
@@ -1,20 +1,33 @@
+from signal import signal, SIGTERM
+from threading import Event, Lock
+from time import time
+from uuid import uuid4
+
 import click
 
-from kubetools.exceptions import KubeDevError
+from tabulate import tabulate
+
+from kubetools.exceptions import KubeDevCommandError, KubeDevError
+from kubetools.log import logger
 from kubetools.settings import get_settings
 
 from . import dev
 from .backend import (
     build_containers,
     destroy_containers,
+    exec_container,
     find_container_for_config,
+    get_all_containers_by_name,
     get_containers_status,
+    kill_run_containers,
     print_containers,
+    remove_compose_config,
     run_container,
     start_containers,
     stop_containers,
     up_containers,
 )
+from .process_util import run_in_threads
 
 
 @dev.command()
@@ -208,6 +221,173 @@ def up(
     )))
 
 
+TEST_RESULT_COLORS = {
+    'passed': 'green',
+    'failed': 'red',
+    'cancelled': 'yellow',
+    'skipped': 'yellow',
+}
+
+
+def _make_skipped_result(kubetools_config, test):
+    return {
+        'name': test.get('name', ' '.join(test['command'])),
+        'container': find_container_for_config(kubetools_config, test),
+        'result': 'skipped',
+        'duration': 0,
+    }
+
+
+def _run_test(kubetools_config, test, arguments=None, capture_output=False):
+    command = list(test['command'])
+    if arguments:
+        command.extend(arguments)
+
+    result = {
+        'name': test.get('name', ' '.join(command)),
+        'container': find_container_for_config(kubetools_config, test),
+        'output': None,
+    }
+
+    if not capture_output:
+        click.echo('--> Running test {0} in container {1}'.format(
+            click.style(result['name'], bold=True),
+            result['container'],
+        ))
+
+    start = time()
+
+    try:
+        result['output'] = run_container(
+            kubetools_config,
+            result['container'],
+            command,
+            envvars=test.get('environment', []),
+            capture_output=capture_output,
+            progress_name='test {0}'.format(result['name']),
+        )
+        result['result'] = 'passed'
+
+    except KubeDevCommandError as e:
+        result['output'] = e.args[1]
+        result['result'] = 'failed'
+
+    result['duration'] = time() - start
+    return result
+
+
+def _run_tests_in_parallel(kubetools_config, tests, arguments=None, fail_fast=False):
+    failed = Event()
+    output_lock = Lock()
+
+    # Tests currently running, and those still running when the first failure
+    # killed the containers (keyed by id as test names need not be unique).
+    tests_lock = Lock()
+    running_tests = set()
+    killed_tests = set()
+
+    def run_test(test):
+        with tests_lock:
+            if failed.is_set():
+                return _make_skipped_result(kubetools_config, test)
+            running_tests.add(id(test))
+
+        result = _run_test(kubetools_config, test, arguments, capture_output=True)
+
+        with tests_lock:
+            running_tests.remove(id(test))
+
+        with output_lock:
+            if result['result'] == 'failed' and fail_fast:
+                # Tests killed because another failed are cancelled, not failed
+                if id(test) in killed_tests:
+                    result['result'] = 'cancelled'
+                elif not failed.is_set():
+                    with tests_lock:
+                        failed.set()
+                        killed_tests.update(running_tests)
+                    kill_run_containers(kubetools_config)
+
+            # Print each tests output in one block as it completes
+            click.echo('--> Test {0} {1} in container {2}'.format(
+                click.style(result['name'], bold=True),
+                click.style(result['result'], TEST_RESULT_COLORS[result['result']]),
+                result['container'],
+            ))
+
+            if result['output']:
+                click.echo(result['output'])
+            click.echo()
+
+        return result
+
+    return run_in_threads(run_test, tests)
+
+
+def _reset_warm_dependencies(kubetools_config):
+    containers_status = get_containers_status(kubetools_config)
+    dependencies = get_all_containers_by_name(kubetools_config, ('dependencies',))
+
+    reset_commands = {}
+
+    for name, config in dependencies.items():
+        reset_command = config.get('testResetCommand')
+        if not reset_command:
+            logger.warning((
+                'Dependency {0} has no testResetCommand, its state will be kept '
+                'between warm pool test runs'
+            ).format(name))
+            continue
+
+        container_status = containers_status.get(name)
+
+        # Fresh containers (first run/config changed) don't need resetting
+        if not container_status or not container_status['id']:
+            continue
+
+        reset_commands[name] = reset_command
+
+    # Stopped containers keep their state, so start them to reset it
+    stopped_names = [
+        name for name in reset_commands
+        if not containers_status[name]['up']
+    ]
+    if stopped_names:
+        start_containers(kubetools_config, stopped_names)
+
+    for name, reset_command in reset_commands.items():
+        if isinstance(reset_command, str):
+            reset_command = ['sh', '-c', reset_command]
+
+        click.echo('--> Resetting warm dependency {0}'.format(
+            click.style(name, bold=True),
+        ))
+        exec_container(
+            kubetools_config, name, reset_command,
+            capture_output=True,
+            progress_name='reset {0}'.format(name),
+        )
+
+
+def _raise_system_exit(signum, frame):
+    raise SystemExit(128 + signum)
+
+
+def _print_test_results(results):
+    rows = [
+        (
+            result['name'],
+            result['container'],
+            click.style(result['result'].upper(), TEST_RESULT_COLORS[result['result']]),
+            '{0:.1f}s'.format(result['duration']),
+        )
+        for result in results
+    ]
+
+    click.echo(tabulate(rows, headers=('Test', 'Container', 'Result', 'Duration')))
+    click.echo()
+
+
 @dev.command()
 @click.argument('arguments', nargs=-1)
 @click.option(
@@ -215,9 +395,44 @@ def up(
     is_flag=True,
     help="Don't remove any test environment containers after completion",
 )
+@click.option(
+    '--parallel',
+    is_flag=True,
+    help='Run the tests at the same time, each in a new container.',
+)
+@click.option(
+    '--fail-fast',
+    is_flag=True,
+    help='Stop running tests after the first failure.',
+)
+@click.option(
+    '--isolated',
+    is_flag=True,
+    help=(
+        'Run in a unique environment with Docker assigned host ports, so test runs '
+        'of the same project can run side by side (eg on a shared CI host).'
+    ),
+)
+@click.option(
+    '--run-id',
+    envvar='KTD_TEST_RUN_ID',
+    help='Unique ID for an isolated test run (implies --isolated, default random).',
+)
+@click.option(
+    '--warm-pool',
+    is_flag=True,
+    help=(
+        'Keep dependency containers running between test runs, resetting them with '
+        'their testResetCommand before each run.'
+    ),
+)
 @click.pass_obj
 @click.pass_context
-def test(ctx, kubetools_config, keep_containers=False, arguments=None):
+def test(
+    ctx, kubetools_config,
+    keep_containers=False, parallel=False, fail_fast=False,
+    isolated=False, run_id=None, warm_pool=False, arguments=None,
+):
     '''
     Execute tests in a new environment.
 
@@ -232,7 +447,30 @@ def test(ctx, kubetools_config, keep_containers=False, arguments=None):
     if kubetools_config.get('env', DEV_DEFAULT_ENV) == DEV_DEFAULT_ENV:
         kubetools_config['env'] = 'test'
 
+    if run_id:
+        isolated = True
+
+    if isolated and warm_pool:
+        raise KubeDevError('Isolated test environments cannot use a warm pool')
+
+    if isolated:
+        if not run_id:
+            run_id = uuid4().hex[:8]
+
+        kubetools_config['env'] = '{0}-{1}'.format(kubetools_config['env'], run_id)
+        kubetools_config['_ephemeral_ports'] = True
+
+        click.echo('--> Using isolated test environment: {0}'.format(
+            click.style(kubetools_config['env'], bold=True),
+        ))
+
+        # Make sure CI cancellations (SIGTERM) still tear the environment down
+        signal(SIGTERM, _raise_system_exit)
+
     try:
+        if warm_pool:
+            _reset_warm_dependencies(kubetools_config)
+
         ctx.invoke(up, is_testing=True)
 
         click.echo()
@@ -243,31 +481,32 @@ def test(ctx, kubetools_config, keep_containers=False, arguments=None):
         if not tests:
             raise KubeDevError('No tests provided in kubetools config!')
 
-        for test in tests:
-            command = test['command']
+        if parallel:
+            results = _run_tests_in_parallel(
+                kubetools_config, tests,
+                arguments=arguments,
+                fail_fast=fail_fast,
+            )
 
-            if arguments:
-                command.extend(arguments)
+        else:
+            results = []
 
-            container_name = find_container_for_config(
-                kubetools_config, test,
-            )
+            for test in tests:
+                if fail_fast and any(result['result'] == 'failed' for result in results):
+                    results.append(_make_skipped_result(kubetools_config, test))
+                    continue
 
-            click.echo('--> Running test {0} in container {1}'.format(
-                click.style(test.get(
-                    'name',
-                    ' '.join(command),
-                ), bold=True),
-                container_name,
-            ))
+                results.append(_run_test(kubetools_config, test, arguments))
+                click.echo()
 
-            run_container(
-                kubetools_config,
-                container_name,
-                command,
-                envvars=test.get('environment', []),
-            )
-            click.echo()
+        _print_test_results(results)
+
+        failed_results = [result for result in results if result['result'] != 'passed']
+        if failed_results:
+            raise KubeDevError('{0}/{1} tests did not pass: {2}'.format(
+                len(failed_results), len(tests),
+                ', '.join(result['name'] for result in failed_results),
+            ))
 
     except Exception:
         click.echo(click.style('Exception!', 'red', bold=True))
@@ -278,4 +517,15 @@ def test(ctx, kubetools_config, keep_containers=False, arguments=None):
 
     finally:
         if not keep_containers:
-            ctx.invoke(destroy)
+            if isolated:
+                click.echo('--> Destroying isolated test environment')
+                destroy_containers(kubetools_config, remove_images=True)
+                remove_compose_config(kubetools_config)
+            elif warm_pool:
+                click.echo('--> Destroying test containers (keeping warm dependencies)')
+                destroy_containers(kubetools_config, list(get_all_containers_by_name(
+                    kubetools_config, ('deployments',),
+                ).keys()))
+                kill_run_containers(kubetools_config, remove=True)
+            else:
+                ctx.invoke(destroy)
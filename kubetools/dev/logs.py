@@ -1,3 +1,7 @@
+import re
+
+from time import time
+
 import click
 
 from . import dev
@@ -8,6 +12,44 @@ from .backend import (
 
 DEFAULT_LOG_LINES = 5
 
+SINCE_UNIT_SECONDS = {
+    's': 1,
+    'm': 60,
+    'h': 60 * 60,
+    'd': 24 * 60 * 60,
+}
+
+
+def _parse_since(ctx, param, value):
+    if value is None:
+        return
+
+    # Unix timestamp
+    if value.isdigit():
+        return int(value)
+
+    # Relative duration, eg 30s/10m/2h
+    match = re.match(r'^(\d+)([smhd])$', value)
+    if not match:
+        raise click.BadParameter(
+            'must be a unix timestamp or a duration such as 30s, 10m, 2h or 1d',
+        )
+
+    amount, unit = match.groups()
+    return int(time()) - int(amount) * SINCE_UNIT_SECONDS[unit]
+
+
+def _validate_pattern(ctx, param, value):
+    if value is None:
+        return
+
+    try:
+        re.compile(value)
+    except re.error as e:
+        raise click.BadParameter('invalid regex: {0}'.format(e))
+
+    return value
+
 
 @dev.command()
 @click.argument('containers', nargs=-1)
@@ -27,11 +69,22 @@ DEFAULT_LOG_LINES = 5
     is_flag=True,
     help='Show all of the output history rather than `-n` lines',
 )
+@click.option(
+    '--since',
+    callback=_parse_since,
+    help='Only show lines logged since a unix timestamp or duration (eg 10m).',
+)
+@click.option(
+    'pattern', '--grep',
+    callback=_validate_pattern,
+    help='Only show lines matching this regex.',
+)
 @click.pass_obj
 def logs(
     kubetools_config,
     containers, all_containers,
     number_of_lines, with_history,
+    since, pattern,
 ):
     '''
     Follow logs for the dev environment.
@@ -50,7 +103,7 @@ def logs(
 
     tail = number_of_lines
     if with_history:
-        # "all" is a special value for `docker-compose logs tail=X`
+        # "all" is a special value for the Docker logs tail
         tail = 'all'
         if number_of_lines != DEFAULT_LOG_LINES:
             click.echo(click.style(
@@ -58,4 +111,7 @@ def logs(
                 'yellow',
             ))
 
-    follow_logs(kubetools_config, containers, tail=tail)
+    follow_logs(
+        kubetools_config, containers,
+        tail=tail, since=since, pattern=pattern,
+    )
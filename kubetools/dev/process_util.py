@@ -1,40 +1,139 @@
 import logging
+import os
 import re
 
-from subprocess import CalledProcessError, PIPE, Popen, STDOUT
-from threading import Thread
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import SEEK_END
+from subprocess import CalledProcessError, PIPE, Popen, STDOUT, TimeoutExpired
+from tempfile import TemporaryFile
+from threading import Event, Lock, Thread
 
-from kubetools.cli.server_util import UPDATE_DIVISOR, wait_with_spinner
+from kubetools.cli.server_util import wait_with_spinner
 from kubetools.exceptions import KubeDevCommandError
 from kubetools.log import logger
+from kubetools.settings import get_settings
 
+ANSI_ESCAPE_REGEX = re.compile(r'(\x9B|\x1B\[)[0-?]*[ -\/]*[@-~]')
 
-def _read_command_output(command, output_lines):
-    # Read the commands output indefinitely
-    while True:
-        stdout_line = command.stdout.readline()
-
-        if stdout_line:
-            # Remove any trailing newline
-            stdout_line = stdout_line.decode().strip('\n')
-            # # Strip non-alphanumeric  characters
-            # stdout_line = re.sub(r'[^a-zA-Z0-9_\.\-\s]', '', stdout_line)
-
-            # Strip any ANSI escape characters
-            stdout_line = re.sub(
-                r'(\x9B|\x1B\[)[0-?]*[ -\/]*[@-~]',
-                '',
-                stdout_line,
-            )
+# Max bytes to read from a command's output at once
+OUTPUT_READ_SIZE = 64 * 1024
 
-            output_lines.append(stdout_line)
+# Max seconds to wait for a command to exit once its output is closed
+PROCESS_EXIT_TIMEOUT = 5
 
-        # No line from the command? We're done!
-        else:
+
+class CommandOutput(object):
+    '''
+    Captures a command's output into a bounded buffer of lines, with ANSI escape
+    characters stripped. Lines that overflow the buffer are either counted and
+    dropped or, with spill=True, also written to a temporary file so the complete
+    output can still be read back (get_output(full=True)) when needed.
+
+    The updated event is set whenever new lines arrive (and on finish), and
+    status holds the latest line.
+    '''
+
+    def __init__(self, max_lines=None, spill=False):
+        if max_lines is None:
+            max_lines = int(get_settings().DEV_OUTPUT_BUFFER_LINES)
+
+        self.lines = deque(maxlen=max_lines)
+        self.spill_file = TemporaryFile() if spill else None
+        self.dropped_lines = 0
+
+        self.status = ''
+        self.updated = Event()
+        self.finished = False
+
+        self._remainder = b''
+        self._lock = Lock()
+
+    def _spill(self, lines):
+        if self.spill_file:
+            self.spill_file.write('{0}\n'.format('\n'.join(lines)).encode('utf-8'))
+        self.dropped_lines += len(lines)
+
+    def _add_lines(self, data):
+        # Decode and strip escape characters from the whole chunk at once
+        lines = ANSI_ESCAPE_REGEX.sub('', data.decode('utf-8', 'replace')).split('\n')
+
+        with self._lock:
+            overflow = len(self.lines) + len(lines) - self.lines.maxlen
+
+            if overflow > 0:
+                evict_count = min(overflow, len(self.lines))
+                self._spill([self.lines.popleft() for _ in range(evict_count)])
+
+                # Still too many? Spill the oldest of the new lines directly
+                if overflow > evict_count:
+                    self._spill(lines[:overflow - evict_count])
+                    lines = lines[overflow - evict_count:]
+
+            self.lines.extend(lines)
+            self.status = lines[-1]
+
+        self.updated.set()
+
+    def write(self, chunk):
+        # Only process complete lines, keeping any partial line for next time
+        data, newline, self._remainder = (self._remainder + chunk).rpartition(b'\n')
+
+        if newline:
+            self._add_lines(data)
+
+    def finish(self):
+        if self._remainder:
+            self._add_lines(self._remainder)
+            self._remainder = b''
+
+        self.finished = True
+        self.updated.set()
+
+    def get_output(self, full=False):
+        '''
+        Get the buffered (most recent) output, or with full=True the complete
+        output including any lines spilled to the temporary file.
+        '''
+
+        with self._lock:
+            output = '\n'.join(self.lines)
+
+            if full and self.spill_file:
+                self.spill_file.seek(0)
+                spilled = self.spill_file.read().decode('utf-8')
+                self.spill_file.seek(0, SEEK_END)
+                output = '{0}{1}'.format(spilled, output)
+
+            elif self.dropped_lines:
+                output = '... ({0} earlier lines dropped)\n{1}'.format(
+                    self.dropped_lines, output,
+                )
+
+        return output
+
+    def close(self):
+        if self.spill_file:
+            self.spill_file.close()
+
+
+def _read_command_output(command, output):
+    # Read whatever output is available in chunks rather than line by line
+    stdout_fd = command.stdout.fileno()
+
+    while True:
+        chunk = os.read(stdout_fd, OUTPUT_READ_SIZE)
+
+        # No output from the command? We're done!
+        if not chunk:
             break
 
+        output.write(chunk)
+
+    output.finish()
+
 
-def _run_process_with_spinner(args):
+def _run_process_with_spinner(args, name=None):
     command = Popen(
         ' '.join(args),
         stdout=PIPE,
@@ -43,50 +142,44 @@ def _run_process_with_spinner(args):
         shell=True,
     )
 
-    # Buffers
-    output_lines = []
+    # Keep the end of the output (for errors) without holding it all in memory
+    output = CommandOutput()
 
     command_reader = Thread(
         target=_read_command_output,
-        args=(command, output_lines),
+        args=(command, output),
     )
     command_reader.start()
 
     def check_status(previous_status):
         # Command complete (we've read everything)? Exit here
-        if not command_reader.is_alive():
+        if output.finished:
             return
 
-        if output_lines:
-            return output_lines[-1]
+        if output.updated.is_set():
+            output.updated.clear()
+            return output.status
 
         return previous_status
 
-    wait_with_spinner(
-        check_status,
-        # This means we run the get_line check every .5 seconds
-        check_status_divisor=(UPDATE_DIVISOR / 2),
-    )
-
-    # Re-join the stdout/stderr lines
-    stdout = '\n'.join(output_lines)
+    wait_with_spinner(check_status, event=output.updated, name=name)
 
-    # Poll the command to populate it's return code
-    command.poll()
+    stdout = output.get_output()
+    output.close()
 
-    # Ensure the command is dead
+    # Wait for the command to exit (its output is closed) to get the return code
     try:
-        command.terminate()
-        command.kill()
+        command.wait(timeout=PROCESS_EXIT_TIMEOUT)
 
-    # If already dead, just ignore
-    except Exception:
-        pass
+    # Still running without any output? Ensure the command is dead
+    except TimeoutExpired:
+        command.kill()
+        command.wait()
 
     return command.returncode, stdout
 
 
-def run_process(args, env=None, hide_output=False):
+def run_process(args, env=None, hide_output=False, progress_name=None):
     if logger.level <= logging.DEBUG:  # always show output when debugging
         hide_output = False
 
@@ -97,7 +190,7 @@ def run_process(args, env=None, hide_output=False):
         # the subprocess in a thread and read its output into two lists, which we
         # then rejoin to return.
         if hide_output:
-            code, stdout = _run_process_with_spinner(args)
+            code, stdout = _run_process_with_spinner(args, name=progress_name)
 
         # Inline? Simply start the process and "communicate", this will print stdout
         # and stderr to the terminal and also capture them into variables.
@@ -106,7 +199,8 @@ def run_process(args, env=None, hide_output=False):
             stdout, _ = command.communicate()
             code = command.returncode
 
-        if code > 0:
+        # Non-zero, including negative codes of commands killed by a signal
+        if code != 0:
             raise KubeDevCommandError(
                 'External process failed: {0}'.format(args),
                 stdout,
@@ -119,3 +213,26 @@ def run_process(args, env=None, hide_output=False):
             'External process failed: {0}'.format(args),
             getattr(e, 'output', e),
         )
+
+
+def run_in_threads(function, items, max_workers=None):
+    '''
+    Call function for each item in a pool of threads and return the results in
+    order. Waits for every call to complete before raising the first exception.
+    '''
+
+    items = list(items)
+    if not items:
+        return []
+
+    if max_workers is None:
+        max_workers = int(get_settings().DEV_MAX_WORKERS)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = [executor.submit(function, item) for item in items]
+
+    errors = [future.exception() for future in futures if future.exception()]
+    if errors:
+        raise errors[0]
+
+    return [future.result() for future in futures]
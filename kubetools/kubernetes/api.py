@@ -8,6 +8,33 @@ from kubetools.exceptions import KubeBuildError
 from kubetools.settings import get_settings
 
 
+DEPLOYMENT_REVISION_ANNOTATION_KEY = 'deployment.kubernetes.io/revision'
+
+# Container waiting reasons that won't resolve themselves, a rollout with any pod
+# in one of these states is failed immediately rather than waiting for timeout.
+TERMINAL_CONTAINER_WAITING_REASONS = (
+    'CrashLoopBackOff',
+    'CreateContainerConfigError',
+    'CreateContainerError',
+    'ImagePullBackOff',
+    'InvalidImageName',
+)
+
+# Container waiting reasons when pulling an image has failed
+FAILED_PULL_CONTAINER_WAITING_REASONS = (
+    'ErrImageNeverPull',
+    'ImagePullBackOff',
+    'InvalidImageName',
+)
+
+# Container waiting reasons that can only happen once the image has been pulled
+PULLED_CONTAINER_WAITING_REASONS = (
+    'CrashLoopBackOff',
+    'CreateContainerError',
+    'RunContainerError',
+)
+
+
 def get_object_labels_dict(obj):
     return obj.metadata.labels or {}
 
@@ -188,6 +215,7 @@ def update_deployment(env, namespace, deployment):
 
 def wait_for_deployment(env, namespace, deployment):
     k8s_apps_api = _get_k8s_apps_api(env)
+    k8s_core_api = _get_k8s_core_api(env)
 
     def check_deployment():
         d = k8s_apps_api.read_namespaced_deployment(
@@ -195,12 +223,220 @@ def wait_for_deployment(env, namespace, deployment):
             namespace=namespace,
         )
 
-        if d.status.ready_replicas == d.status.replicas:
+        if is_deployment_rolled_out(d):
             return True
 
+        # Conditions & pods may still be from the previous (failed) rollout
+        if not _is_deployment_status_current(d):
+            return False
+
+        failure = get_deployment_rollout_failure(
+            d, _list_deployment_new_pods(k8s_apps_api, k8s_core_api, namespace, d),
+        )
+        if failure:
+            raise KubeBuildError(
+                f'Deployment {get_object_name(deployment)} failed to roll out: {failure}',
+            )
+
     _wait_for(check_deployment, get_object_name(deployment))
 
 
+def _is_deployment_status_current(deployment):
+    # Status that hasn't caught up with the latest spec describes the previous
+    # rollout, so cannot be trusted.
+    return (
+        (deployment.status.observed_generation or 0)
+        >= (deployment.metadata.generation or 0)
+    )
+
+
+def is_deployment_rolled_out(deployment):
+    status = deployment.status
+
+    if not _is_deployment_status_current(deployment):
+        return False
+
+    desired_replicas = deployment.spec.replicas
+    if desired_replicas is None:
+        desired_replicas = 1
+
+    updated_replicas = status.updated_replicas or 0
+
+    if updated_replicas < desired_replicas:
+        return False
+
+    # Pods from the previous replica set are still around
+    if (status.replicas or 0) > updated_replicas:
+        return False
+
+    return (status.ready_replicas or 0) >= desired_replicas
+
+
+def get_deployment_rollout_failure(deployment, pods):
+    '''
+    Returns a description of why a deployment rollout can never complete, or
+    None if it may still succeed.
+    '''
+
+    if not _is_deployment_status_current(deployment):
+        return
+
+    for condition in deployment.status.conditions or []:
+        if condition.type == 'Progressing' and condition.reason == 'ProgressDeadlineExceeded':
+            return f'progress deadline exceeded ({condition.message})'
+
+    for pod in pods:
+        container_statuses = (
+            (pod.status.init_container_statuses or [])
+            + (pod.status.container_statuses or [])
+        )
+
+        for container_status in container_statuses:
+            waiting = container_status.state and container_status.state.waiting
+            if waiting and waiting.reason in TERMINAL_CONTAINER_WAITING_REASONS:
+                failure = (
+                    f'pod {get_object_name(pod)} container {container_status.name} '
+                    f'is in {waiting.reason}'
+                )
+                if waiting.message:
+                    failure = f'{failure} ({waiting.message})'
+                return failure
+
+
+def _list_deployment_new_pods(k8s_apps_api, k8s_core_api, namespace, deployment):
+    '''
+    List the pods belonging to the deployment's current (newest) replica set.
+    '''
+
+    revision = get_object_annotations_dict(deployment).get(DEPLOYMENT_REVISION_ANNOTATION_KEY)
+    if not revision:
+        return []
+
+    label_selector = _make_label_selector(deployment.spec.selector.match_labels)
+
+    replica_sets = k8s_apps_api.list_namespaced_replica_set(
+        namespace=namespace,
+        label_selector=label_selector,
+    ).items
+
+    for replica_set in replica_sets:
+        owner_uids = set(
+            owner.uid
+            for owner in replica_set.metadata.owner_references or []
+        )
+        if (
+            deployment.metadata.uid in owner_uids
+            and get_object_annotations_dict(replica_set).get(
+                DEPLOYMENT_REVISION_ANNOTATION_KEY,
+            ) == revision
+        ):
+            new_replica_set = replica_set
+            break
+    else:
+        return []
+
+    pods = k8s_core_api.list_namespaced_pod(
+        namespace=namespace,
+        label_selector=_make_label_selector(new_replica_set.spec.selector.match_labels),
+    ).items
+
+    return [
+        pod for pod in pods
+        if any(
+            owner.uid == new_replica_set.metadata.uid
+            for owner in pod.metadata.owner_references or []
+        )
+    ]
+
+
+def _make_label_selector(labels):
+    return ','.join(f'{key}={value}' for key, value in (labels or {}).items())
+
+
+def create_daemon_set(env, namespace, daemon_set):
+    k8s_apps_api = _get_k8s_apps_api(env)
+    return k8s_apps_api.create_namespaced_daemon_set(
+        body=daemon_set,
+        namespace=namespace,
+    )
+
+
+def delete_daemon_set(env, namespace, daemon_set):
+    k8s_apps_api = _get_k8s_apps_api(env)
+    k8s_apps_api.delete_namespaced_daemon_set(
+        name=get_object_name(daemon_set),
+        namespace=namespace,
+        propagation_policy='Background',
+    )
+
+
+def _is_container_image_pulled(container_status):
+    if container_status.image_id:
+        return True
+
+    state = container_status.state
+    if not state:
+        return False
+
+    if state.running or state.terminated:
+        return True
+
+    # The image was pulled but the container couldn't start, eg without `sh`
+    return bool(state.waiting and state.waiting.reason in PULLED_CONTAINER_WAITING_REASONS)
+
+
+def get_pod_image_pull_failure(pod):
+    '''
+    Returns a description of why a pod's images can't be pulled, or None.
+    '''
+
+    for container_status in pod.status.container_statuses or []:
+        waiting = container_status.state and container_status.state.waiting
+        if waiting and waiting.reason in FAILED_PULL_CONTAINER_WAITING_REASONS:
+            return f'{container_status.image} on {pod.spec.node_name}: {waiting.reason}'
+
+
+def wait_for_daemon_set_images(env, namespace, daemon_set):
+    '''
+    Wait for the containers (images) of a daemon set to be pulled on every node.
+    '''
+
+    k8s_apps_api = _get_k8s_apps_api(env)
+    k8s_core_api = _get_k8s_core_api(env)
+
+    def check_daemon_set():
+        d = k8s_apps_api.read_namespaced_daemon_set(
+            name=get_object_name(daemon_set),
+            namespace=namespace,
+        )
+
+        # No status for the latest spec yet, so desired pods is unknown
+        if (d.status.observed_generation or 0) < (d.metadata.generation or 0):
+            return False
+
+        pods = k8s_core_api.list_namespaced_pod(
+            namespace=namespace,
+            label_selector=_make_label_selector(d.spec.selector.match_labels),
+        ).items
+
+        pulled_pods = 0
+        for pod in pods:
+            failure = get_pod_image_pull_failure(pod)
+            if failure:
+                raise KubeBuildError(f'Failed to pull image {failure}')
+
+            container_statuses = pod.status.container_statuses or []
+            if (
+                len(container_statuses) == len(pod.spec.containers)
+                and all(_is_container_image_pulled(status) for status in container_statuses)
+            ):
+                pulled_pods += 1
+
+        return pulled_pods >= (d.status.desired_number_scheduled or 0)
+
+    _wait_for(check_daemon_set, get_object_name(daemon_set))
+
+
 def list_cronjobs(env, namespace):
     _batch_api_version, k8s_batch_api = _get_compatible_cronjob_api(env)
     return k8s_batch_api.list_namespaced_cron_job(namespace=namespace).items
@@ -274,7 +510,7 @@ def _is_job_running(job):
 valid_propagation_policies = ["Orphan", "Background", "Foreground"]
 
 
-def delete_job(env, namespace, job, propagation_policy=None):
+def delete_job(env, namespace, job, propagation_policy=None, wait=True):
     if propagation_policy and propagation_policy not in valid_propagation_policies:
         raise KubeBuildError(f"Propagation policy must be one of {valid_propagation_policies}")
     args = {}
@@ -287,7 +523,8 @@ def delete_job(env, namespace, job, propagation_policy=None):
         **args,
     )
 
-    _wait_for_no_object(k8s_batch_api, 'read_namespaced_job', namespace, job)
+    if wait:
+        _wait_for_no_object(k8s_batch_api, 'read_namespaced_job', namespace, job)
 
 
 def create_job(env, namespace, job):
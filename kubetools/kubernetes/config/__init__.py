@@ -7,6 +7,7 @@ from kubetools.constants import (
 from kubetools.exceptions import KubeConfigError
 
 from .cronjob import make_cronjob_config
+from .daemon_set import make_prepull_daemon_set_configs  # noqa: F401
 from .deployment import make_deployment_config
 from .job import make_job_config
 from .namespace import make_namespace_config
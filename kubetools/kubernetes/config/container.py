@@ -12,6 +12,9 @@ LABEL_ENVAR_KEYS = (
 )
 ANNOTATION_ENVAR_KEYS = ('version',)
 
+# Keys only used by ktd, never passed to Kubernetes
+DEV_ONLY_KEYS = ('testResetCommand',)
+
 
 def _make_probe_config(config):
     if 'httpGet' in config:
@@ -26,6 +29,14 @@ def _make_probe_config(config):
     return config
 
 
+def get_image_pull_policy(image):
+    # Images pinned to a digest can't change, so only pull them if they're not
+    # already on the node, otherwise always pull the image from the registry.
+    if '@' in image:
+        return 'IfNotPresent'
+    return 'Always'
+
+
 def make_container_config(
     name, container,
     envvars=None, labels=None,
@@ -44,8 +55,7 @@ def make_container_config(
     container_data = {
         'name': name,
 
-        # Always pull the image from the registry
-        'imagePullPolicy': 'Always',
+        'imagePullPolicy': get_image_pull_policy(image),
         'image': image,
 
         # Environment flag we use to determine if app is in Kube
@@ -128,6 +138,9 @@ def make_container_config(
                 'readonly': True,
             })
 
+    for key in DEV_ONLY_KEYS:
+        container.pop(key, None)
+
     # Finally, attach all remaining data
     container_data.update(container)
 
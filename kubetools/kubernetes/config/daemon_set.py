@@ -0,0 +1,109 @@
+import json
+
+from collections import OrderedDict
+
+from kubetools.constants import MANAGED_BY_ANNOTATION_KEY
+
+from .container import get_image_pull_policy
+from .util import get_hash
+
+PREPULL_LABEL_KEY = 'kubetools/prepull'
+
+# Pod spec keys copied from deployments so the pre-pull pods are scheduled onto the
+# same nodes and can pull the same (private) images.
+PREPULL_POD_SPEC_KEYS = (
+    'nodeSelector',
+    'affinity',
+    'tolerations',
+    'serviceAccountName',
+    'imagePullSecrets',
+)
+
+
+def make_prepull_daemon_set_config(name, images, pod_spec=None):
+    '''
+    Builds a Kubernetes daemon set configuration dict that pulls the images onto
+    every (selected) node. Each image is run as a container that just sleeps, the
+    images are pulled by the time the containers are created. Any pod_spec (see
+    PREPULL_POD_SPEC_KEYS) is added to the pod template spec.
+    '''
+
+    labels = {PREPULL_LABEL_KEY: name}
+
+    containers = []
+    for i, image in enumerate(images):
+        containers.append({
+            'name': f'image-{i}',
+            'image': image,
+            'imagePullPolicy': get_image_pull_policy(image),
+            'command': ['sh', '-c', 'sleep 3600'],
+            'resources': {
+                'requests': {'cpu': '1m', 'memory': '1Mi'},
+            },
+        })
+
+    template_spec = {
+        'containers': containers,
+        'terminationGracePeriodSeconds': 0,
+    }
+
+    if pod_spec:
+        template_spec.update(pod_spec)
+
+    return {
+        'apiVersion': 'apps/v1',
+        'kind': 'DaemonSet',
+        'metadata': {
+            'name': name,
+            'labels': labels,
+            'annotations': {
+                MANAGED_BY_ANNOTATION_KEY: 'kubetools',
+            },
+        },
+        'spec': {
+            'selector': {
+                'matchLabels': labels,
+            },
+            'template': {
+                'metadata': {
+                    'labels': labels,
+                },
+                'spec': template_spec,
+            },
+        },
+    }
+
+
+def make_prepull_daemon_set_configs(deployments):
+    '''
+    Builds a daemon set config to pre-pull the images of deployments for each set
+    of nodes (nodeSelector/affinity/tolerations) and pull credentials the
+    deployments use.
+    '''
+
+    node_key_to_images = OrderedDict()
+
+    for deployment in deployments:
+        template_spec = deployment['spec']['template']['spec']
+        node_key = json.dumps({
+            key: template_spec[key]
+            for key in PREPULL_POD_SPEC_KEYS
+            if template_spec.get(key) is not None
+        }, sort_keys=True)
+
+        images = node_key_to_images.setdefault(node_key, [])
+        for container in template_spec['containers']:
+            if container['image'] not in images:
+                images.append(container['image'])
+
+    daemon_sets = []
+
+    for node_key, images in node_key_to_images.items():
+        name = 'kubetools-prepull-{0}'.format(get_hash(node_key + ','.join(images)))
+
+        daemon_sets.append(make_prepull_daemon_set_config(
+            name, images,
+            pod_spec=json.loads(node_key),
+        ))
+
+    return daemon_sets
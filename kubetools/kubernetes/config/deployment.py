@@ -92,7 +92,7 @@ def make_deployment_config(
                 }
 
     if container_volumes:  # kube does not like an empty list
-        controller['spec']['template']['spec']['volumes'] = container_volumes.values()
+        controller['spec']['template']['spec']['volumes'] = list(container_volumes.values())
 
     for container in containers:
         if 'volumes' in container:
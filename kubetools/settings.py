@@ -13,10 +13,22 @@ class KubetoolsSettings(object):
     DEV_DEFAULT_ENV = 'dev'  # default environment name in dev
     DEV_HOST = 'localhost'  # dev host to link people to (should map to 127.0.0.1)
     DEV_CONFIG_DIRNAME = '.kubetools'  # project directroy to generate compose config
-    DEV_BACKEND = 'docker_compose'  # backend to use for development
+    DEV_BACKEND = 'docker_compose'  # backend to use for development (or docker_api)
+    DEV_MAX_WORKERS = 4  # max containers to start/probe/build at once in dev
+    DEV_LOG_BUFFER_LINES = 1000  # max unprinted log lines kept per container in ktd logs
+    DEV_OUTPUT_BUFFER_LINES = 1000  # max command output lines kept in memory in dev
 
     CRONJOBS_BATCH_API_VERSION = 'batch/v1'  # if k8s version < 1.21+ should be 'batch/v1beta1'
 
+    PRE_BUILD_MAX_WORKERS = 4  # max preBuildCommands lists to run at once when deploying
+    BASE_IMAGE_CHECK_INTERVAL = 3600  # seconds between checks for updated base images
+    IMAGE_BUILDER = 'cli'  # build deploy images with the docker CLI (or sdk)
+    IMAGE_TAG_SCHEME = 'commit'  # tag deploy images by commit (or content, see below)
+    ''' With `content`, images are also tagged by a hash of the build inputs (the
+    Dockerfile, the build context files not in .dockerignore and the build args). Commits
+    that don't change these reuse the existing image instead of building a new one.
+    '''
+
     REGISTRY_CHECK_SCRIPT = None
     ''' Optional external script to check if an image exists in the docker registry.
 
@@ -54,7 +54,6 @@ if __name__ == '__main__':
             'docker>=3,<5',
             'pyyaml>=3,<6',
             'requests>=2,<2.29.0',  # https://github.com/docker/docker-py/issues/3113
-            'pyretry',
             'packaging',
             # To support CronJob api versions 'batch/v1beta1' & 'batch/v1'
             'kubernetes>=21.7.0,<25.0.0',
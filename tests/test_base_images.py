@@ -0,0 +1,85 @@
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import mock, TestCase
+
+import docker
+
+from kubetools import base_images
+from kubetools.base_images import ensure_base_images, get_base_images
+
+from .util import start_patches
+
+DOCKERFILE = '''
+ARG PYTHON_VERSION=3.8
+FROM python:${PYTHON_VERSION} AS builder
+RUN make
+
+FROM --platform=linux/amd64 nginx:1.19
+COPY --from=builder /app /app
+
+FROM builder AS test
+FROM scratch
+'''
+
+
+class TestBaseImages(TestCase):
+    def setUp(self):
+        self.tempdir = mkdtemp()
+        self.addCleanup(rmtree, self.tempdir)
+
+        self.dockerfile = path.join(self.tempdir, 'Dockerfile')
+        self.write_dockerfile(DOCKERFILE)
+
+        self.docker_client = mock.MagicMock()
+        self.docker_client.images.pull.side_effect = lambda repository, tag: mock.MagicMock(
+            attrs={'RepoDigests': [f'{repository}@sha256:{tag}']},
+        )
+
+        start_patches(
+            self,
+            mock.patch.object(base_images, 'get_settings_directory', return_value=self.tempdir),
+            mock.patch('docker.from_env', return_value=self.docker_client),
+        )
+
+    def write_dockerfile(self, data):
+        with open(self.dockerfile, 'w') as f:
+            f.write(data)
+
+    def get_pulled_images(self):
+        return [
+            (call[0][0], call[1]['tag'])
+            for call in self.docker_client.images.pull.call_args_list
+        ]
+
+    def test_get_base_images(self):
+        self.assertEqual(get_base_images(self.dockerfile), ['python:3.8', 'nginx:1.19'])
+        self.assertEqual(
+            get_base_images(self.dockerfile, build_args={'PYTHON_VERSION': '3.9'}),
+            ['python:3.9', 'nginx:1.19'],
+        )
+
+    def test_base_images_checked_once_per_interval(self):
+        self.assertTrue(ensure_base_images(self.dockerfile))
+        self.assertTrue(ensure_base_images(self.dockerfile))
+
+        self.assertEqual(self.get_pulled_images(), [('python', '3.8'), ('nginx', '1.19')])
+
+        with mock.patch.object(base_images, 'time', return_value=10 ** 10):
+            ensure_base_images(self.dockerfile)
+
+        self.assertEqual(len(self.get_pulled_images()), 4)
+
+    def test_unreachable_registry_not_cached(self):
+        self.docker_client.images.pull.side_effect = docker.errors.APIError('offline')
+
+        self.assertTrue(ensure_base_images(self.dockerfile))
+        self.assertTrue(ensure_base_images(self.dockerfile))
+
+        self.assertEqual(len(self.get_pulled_images()), 4)
+
+    def test_unknown_base_image_needs_pull(self):
+        self.write_dockerfile('ARG BASE_IMAGE\nFROM ${BASE_IMAGE}\n')
+
+        self.assertFalse(ensure_base_images(self.dockerfile))
+        self.docker_client.images.pull.assert_not_called()
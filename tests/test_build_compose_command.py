@@ -43,3 +43,9 @@ class TestBuildComposeCommand(TestCase):
             'container',
         ]
         self.assertEqual(expected_result, result)
+
+    def test_tty_disabled(self):
+        command = ('python', 'scripts/blah.py')
+        result = build_run_compose_command(self.container, command, envvars=None, tty=False)
+        expected_result = ['run', '-T', '--entrypoint', 'python scripts/blah.py', 'container']
+        self.assertEqual(expected_result, result)
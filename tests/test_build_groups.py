@@ -0,0 +1,148 @@
+from copy import deepcopy
+from unittest import mock, TestCase
+
+from kubetools.dev.backends import docker_compose
+from kubetools.dev.backends.docker_compose import (
+    _build_containers,
+    build_containers,
+    get_build_groups,
+)
+from kubetools.dev.backends.docker_compose.config import get_compose_image_name
+
+KUBETOOLS_CONFIG = {
+    'name': 'app',
+    'env': 'dev',
+    'deployments': {
+        'app': {
+            'containers': {
+                'web': {'build': {'dockerfile': 'Dockerfile'}},
+                'worker': {'build': {
+                    'dockerfile': 'Dockerfile',
+                    'preBuildCommands': [['make', 'assets']],
+                }},
+                'custom': {
+                    'build': {'dockerfile': 'Dockerfile'},
+                    'image': 'custom-app:dev',
+                },
+                'api': {'build': {'dockerfile': 'Dockerfile.api'}},
+            },
+        },
+    },
+    'dependencies': {
+        'redis': {
+            'containers': {
+                'redis': {'image': 'redis:6'},
+            },
+        },
+    },
+}
+
+
+class TestBuildGroups(TestCase):
+    def setUp(self):
+        self.kubetools_config = deepcopy(KUBETOOLS_CONFIG)
+
+    def test_services_sharing_a_build_grouped(self):
+        with mock.patch('click.echo'):
+            build_groups = get_build_groups(self.kubetools_config)
+
+        self.assertEqual(build_groups, [['web', 'worker', 'custom'], ['api']])
+
+    def test_build_groups_filtered(self):
+        with mock.patch('click.echo'):
+            build_groups = get_build_groups(self.kubetools_config, ['worker', 'redis'])
+
+        self.assertEqual(build_groups, [['worker']])
+
+    def test_build_groups_built_in_threads(self):
+        with mock.patch.object(
+            docker_compose, '_build_containers',
+        ) as fake_build_containers, mock.patch('click.echo'):
+            build_containers(self.kubetools_config)
+
+        self.assertEqual(
+            sorted(call[0][1] for call in fake_build_containers.call_args_list),
+            [['api'], ['web', 'worker', 'custom']],
+        )
+
+
+class TestBuildContainers(TestCase):
+    def setUp(self):
+        self.kubetools_config = deepcopy(KUBETOOLS_CONFIG)
+
+    def build_containers(self, names, containers_status=None):
+        docker_client = mock.MagicMock()
+
+        with mock.patch.object(
+            docker_compose, 'get_containers_status', return_value=containers_status or {},
+        ), mock.patch.object(
+            docker_compose, 'ensure_base_images', return_value=True,
+        ), mock.patch.object(
+            docker_compose, 'run_compose_process',
+        ) as fake_run_compose_process, mock.patch.object(
+            docker_compose, 'get_docker_client', return_value=docker_client,
+        ):
+            _build_containers(self.kubetools_config, names)
+
+        return fake_run_compose_process, docker_client
+
+    def test_duplicate_services_tagged(self):
+        fake_run_compose_process, docker_client = self.build_containers(
+            ['web', 'worker', 'custom'],
+        )
+
+        # Built once, then tagged for the other services
+        fake_run_compose_process.assert_called_once_with(
+            self.kubetools_config,
+            ('build', 'web'),
+            hide_output=True,
+            progress_name='build web',
+        )
+        docker_client.images.get.assert_called_once_with(
+            get_compose_image_name(self.kubetools_config, 'web'),
+        )
+
+        image = docker_client.images.get.return_value
+        self.assertEqual(image.tag.call_args_list, [
+            mock.call(get_compose_image_name(self.kubetools_config, 'worker'), tag=None),
+            mock.call('custom-app', tag='dev'),
+        ])
+
+    def test_service_with_image_tagged_from_its_image(self):
+        _, docker_client = self.build_containers(['custom', 'web'])
+
+        docker_client.images.get.assert_called_once_with('custom-app:dev')
+        docker_client.images.get.return_value.tag.assert_called_once_with(
+            get_compose_image_name(self.kubetools_config, 'web'),
+            tag=None,
+        )
+
+    def test_up_services_skipped(self):
+        fake_run_compose_process, docker_client = self.build_containers(
+            ['web', 'worker'],
+            containers_status={'web': {'up': True}},
+        )
+
+        fake_run_compose_process.assert_called_once_with(
+            self.kubetools_config,
+            ('build', 'worker'),
+            hide_output=True,
+            progress_name='build worker',
+        )
+        docker_client.images.get.assert_not_called()
+
+
+class TestDestroyContainers(TestCase):
+    def test_remove_images(self):
+        with mock.patch.object(
+            docker_compose, 'get_containers_status', return_value={},
+        ), mock.patch.object(
+            docker_compose, 'run_compose_process',
+        ) as fake_run_compose_process, mock.patch.object(
+            docker_compose, 'refresh_containers_status',
+        ):
+            docker_compose.destroy_containers({}, remove_images=True)
+
+        fake_run_compose_process.assert_called_once_with(
+            {}, ('down', '--remove-orphans', '--rmi', 'local'),
+        )
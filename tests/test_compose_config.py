@@ -0,0 +1,71 @@
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import mock, TestCase
+
+from kubetools.config import load_kubetools_config
+from kubetools.dev.backends.docker_compose.config import (
+    create_compose_config,
+    get_compose_config,
+    get_compose_filename,
+    remove_compose_config,
+)
+
+
+class TestCreateComposeConfig(TestCase):
+    def setUp(self):
+        self.tempdir = mkdtemp()
+
+        app_dir = path.join('tests', 'configs', 'ktd-compose-bug')
+        self.kubetools_config = load_kubetools_config(app_dir, env='test', dev=True)
+        self.kubetools_config['_filename'] = path.join(self.tempdir, 'kubetools.yml')
+
+    def tearDown(self):
+        rmtree(self.tempdir)
+
+    def _get_container(self):
+        return self.kubetools_config['deployments']['demo-app']['containers']['demo-container']
+
+    def test_compose_config_generated_once(self):
+        with mock.patch(
+            'kubetools.dev.backends.docker_compose.config.yaml.safe_dump',
+            return_value='services: {}\n',
+        ) as mock_dump:
+            create_compose_config(self.kubetools_config)
+            create_compose_config(self.kubetools_config)
+
+        mock_dump.assert_called_once()
+
+        with open(get_compose_filename(self.kubetools_config), 'r') as f:
+            self.assertEqual(f.read(), 'services: {}\n')
+
+    def test_compose_config_regenerated_on_change(self):
+        create_compose_config(self.kubetools_config)
+        self._get_container()['environment'] = ['FOO=bar']
+        create_compose_config(self.kubetools_config)
+
+        with open(get_compose_filename(self.kubetools_config), 'r') as f:
+            self.assertIn('FOO=bar', f.read())
+
+    def test_pre_build_commands_not_removed_from_config(self):
+        self._get_container()['build']['preBuildCommands'] = [['make', 'assets']]
+        create_compose_config(self.kubetools_config)
+
+        self.assertIn('preBuildCommands', self._get_container()['build'])
+
+    def test_ephemeral_ports(self):
+        self._get_container()['ports'] = [80, {'port': 8080}]
+
+        ports = get_compose_config(self.kubetools_config)['services']['demo-container']['ports']
+        self.assertTrue(all(':' in port for port in ports))
+
+        self.kubetools_config['_ephemeral_ports'] = True
+
+        ports = get_compose_config(self.kubetools_config)['services']['demo-container']['ports']
+        self.assertEqual(ports, ['80', '8080'])
+
+    def test_remove_compose_config(self):
+        create_compose_config(self.kubetools_config)
+        remove_compose_config(self.kubetools_config)
+
+        self.assertFalse(path.exists(get_compose_filename(self.kubetools_config)))
@@ -0,0 +1,31 @@
+from unittest import TestCase
+
+from kubetools.kubernetes.config.container import make_container_config
+
+
+class TestContainerConfig(TestCase):
+    def test_tagged_image_always_pulled(self):
+        container_config = make_container_config('webserver', {
+            'image': 'registry/app:context-commit-abc',
+        })
+        self.assertEqual(container_config['imagePullPolicy'], 'Always')
+
+    def test_digest_image_pulled_if_not_present(self):
+        container_config = make_container_config('webserver', {
+            'image': 'registry/app:context-commit-abc@sha256:c0ffee',
+        })
+        self.assertEqual(container_config['imagePullPolicy'], 'IfNotPresent')
+
+    def test_pull_policy_from_config(self):
+        container_config = make_container_config('webserver', {
+            'image': 'registry/app:context-commit-abc@sha256:c0ffee',
+            'imagePullPolicy': 'Always',
+        })
+        self.assertEqual(container_config['imagePullPolicy'], 'Always')
+
+    def test_dev_only_keys_removed(self):
+        container_config = make_container_config('mariadb', {
+            'image': 'mariadb:10',
+            'testResetCommand': 'mysql -e "DROP DATABASE test"',
+        })
+        self.assertNotIn('testResetCommand', container_config)
@@ -0,0 +1,70 @@
+from os import path
+from unittest import mock, TestCase
+
+from kubetools.config import load_kubetools_config
+from kubetools.dev.backends.docker_compose.docker_util import (
+    CONTAINERS_STATUS_SNAPSHOTS,
+    get_container_status,
+    get_containers_status,
+    refresh_containers_status,
+)
+
+
+def make_docker_container(name, state='running'):
+    return {
+        'Id': '{0}-id'.format(name),
+        'Names': ['/genericapptest_{0}_1'.format(name)],
+        'State': state,
+        'Labels': {
+            'com.docker.compose.project': 'genericapptest',
+            'com.docker.compose.service': name,
+            'kubetools.project.name': 'generic-app',
+            'kubetools.project.env': 'test',
+        },
+        'Ports': [
+            {'IP': '0.0.0.0', 'PrivatePort': 80, 'PublicPort': 10080, 'Type': 'tcp'},
+            {'IP': '::', 'PrivatePort': 80, 'PublicPort': 10080, 'Type': 'tcp'},
+            {'PrivatePort': 8080, 'Type': 'tcp'},
+        ],
+    }
+
+
+class TestContainersStatus(TestCase):
+    def setUp(self):
+        app_dir = path.join('tests', 'configs', 'basic_app')
+        self.kubetools_config = load_kubetools_config(app_dir, env='test', dev=True)
+
+        CONTAINERS_STATUS_SNAPSHOTS.clear()
+
+        patcher = mock.patch(
+            'kubetools.dev.backends.docker_compose.docker_util.get_docker_client',
+        )
+        self.docker_client = patcher.start().return_value
+        self.docker_client.api.containers.return_value = [
+            make_docker_container('webserver'),
+        ]
+        self.addCleanup(patcher.stop)
+
+    def test_containers_listed_once(self):
+        containers = get_containers_status(self.kubetools_config)
+        container = get_container_status(self.kubetools_config, 'webserver')
+
+        self.docker_client.api.containers.assert_called_once()
+        self.assertIs(containers['webserver'], container)
+        self.assertEqual(container['up'], True)
+        self.assertEqual(container['ports'], [{'local': '80/tcp', 'host': '10080'}])
+
+    def test_refresh_container(self):
+        get_containers_status(self.kubetools_config)
+
+        self.docker_client.api.containers.return_value = [
+            make_docker_container('webserver', state='exited'),
+        ]
+        refresh_containers_status(self.kubetools_config, ['webserver'])
+
+        self.assertEqual(self.docker_client.api.containers.call_count, 2)
+        self.assertIn(
+            'com.docker.compose.service=webserver',
+            self.docker_client.api.containers.call_args[1]['filters']['label'],
+        )
+        self.assertEqual(get_container_status(self.kubetools_config, 'webserver')['up'], False)
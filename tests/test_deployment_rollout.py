@@ -0,0 +1,133 @@
+from unittest import mock, TestCase
+
+from kubernetes.client import (
+    V1ContainerState,
+    V1ContainerStateWaiting,
+    V1ContainerStatus,
+    V1Deployment,
+    V1DeploymentCondition,
+    V1DeploymentSpec,
+    V1DeploymentStatus,
+    V1LabelSelector,
+    V1ObjectMeta,
+    V1Pod,
+    V1PodStatus,
+    V1PodTemplateSpec,
+)
+
+from kubetools.kubernetes import api
+from kubetools.kubernetes.api import (
+    get_deployment_rollout_failure,
+    is_deployment_rolled_out,
+)
+
+
+def make_deployment(generation=2, replicas=2, **status):
+    status.setdefault('observed_generation', 2)
+    return V1Deployment(
+        metadata=V1ObjectMeta(name='app', generation=generation),
+        spec=V1DeploymentSpec(
+            replicas=replicas,
+            selector=V1LabelSelector(match_labels={'app': 'app'}),
+            template=V1PodTemplateSpec(),
+        ),
+        status=V1DeploymentStatus(**status),
+    )
+
+
+def make_deadline_exceeded_condition():
+    return V1DeploymentCondition(
+        type='Progressing',
+        status='False',
+        reason='ProgressDeadlineExceeded',
+        message='ReplicaSet "app-1234" has timed out progressing.',
+    )
+
+
+def make_pod(reason):
+    return V1Pod(
+        metadata=V1ObjectMeta(name='app-1234'),
+        status=V1PodStatus(container_statuses=[V1ContainerStatus(
+            name='webserver',
+            image='image',
+            image_id='',
+            ready=False,
+            restart_count=3,
+            state=V1ContainerState(waiting=V1ContainerStateWaiting(reason=reason)),
+        )]),
+    )
+
+
+class TestDeploymentRollout(TestCase):
+    def test_rolled_out(self):
+        deployment = make_deployment(replicas=2, updated_replicas=2, ready_replicas=2)
+        self.assertTrue(is_deployment_rolled_out(deployment))
+
+    def test_stale_status_is_not_rolled_out(self):
+        deployment = make_deployment(
+            observed_generation=1,
+            replicas=2, updated_replicas=2, ready_replicas=2,
+        )
+        self.assertFalse(is_deployment_rolled_out(deployment))
+
+    def test_old_replicas_remaining_is_not_rolled_out(self):
+        deployment = make_deployment(replicas=3, updated_replicas=2, ready_replicas=3)
+        self.assertFalse(is_deployment_rolled_out(deployment))
+
+    def test_zero_replicas_rolled_out(self):
+        deployment = make_deployment(replicas=0)
+        self.assertTrue(is_deployment_rolled_out(deployment))
+
+    def test_progress_deadline_exceeded_fails(self):
+        deployment = make_deployment(conditions=[make_deadline_exceeded_condition()])
+        failure = get_deployment_rollout_failure(deployment, [])
+        self.assertIn('progress deadline exceeded', failure)
+
+    def test_stale_status_does_not_fail(self):
+        deployment = make_deployment(
+            observed_generation=1,
+            conditions=[make_deadline_exceeded_condition()],
+        )
+        failure = get_deployment_rollout_failure(deployment, [make_pod('CrashLoopBackOff')])
+        self.assertIsNone(failure)
+
+    def test_crashloop_pod_fails(self):
+        failure = get_deployment_rollout_failure(
+            make_deployment(),
+            [make_pod('CrashLoopBackOff')],
+        )
+        self.assertEqual(failure, 'pod app-1234 container webserver is in CrashLoopBackOff')
+
+    def test_creating_pod_does_not_fail(self):
+        failure = get_deployment_rollout_failure(
+            make_deployment(),
+            [make_pod('ContainerCreating')],
+        )
+        self.assertIsNone(failure)
+
+
+class TestWaitForDeployment(TestCase):
+    def test_stale_failing_status_waits_for_new_rollout(self):
+        k8s_apps_api = mock.MagicMock()
+        k8s_apps_api.read_namespaced_deployment.side_effect = [
+            # First poll after the patch, still the previous rollout's status
+            make_deployment(
+                observed_generation=1,
+                replicas=2, updated_replicas=2,
+                conditions=[make_deadline_exceeded_condition()],
+            ),
+            make_deployment(replicas=2, updated_replicas=2, ready_replicas=2),
+        ]
+        k8s_core_api = mock.MagicMock()
+
+        with mock.patch.object(
+            api, '_get_k8s_apps_api', return_value=k8s_apps_api,
+        ), mock.patch.object(
+            api, '_get_k8s_core_api', return_value=k8s_core_api,
+        ), mock.patch.object(api, 'sleep'):
+            api.wait_for_deployment('staging', 'default', make_deployment())
+
+        self.assertEqual(k8s_apps_api.read_namespaced_deployment.call_count, 2)
+        # The previous replica set's pods are never looked at
+        k8s_apps_api.list_namespaced_replica_set.assert_not_called()
+        k8s_core_api.list_namespaced_pod.assert_not_called()
@@ -0,0 +1,84 @@
+import json
+
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import mock, TestCase
+
+from kubetools.dev.backends.docker_compose import docker_util
+from kubetools.dev.backends.docker_compose.docker_util import (
+    DEV_NETWORK_ALIASES_FILENAME,
+    get_dev_network_aliases,
+)
+
+from .util import start_patches
+
+
+def make_inspect_data(aliases):
+    return {
+        'NetworkSettings': {
+            'Networks': {
+                'dev': {'Aliases': aliases},
+            },
+        },
+    }
+
+
+class TestDevNetworkAliases(TestCase):
+    def setUp(self):
+        self.settings_directory = path.join(mkdtemp(), 'kubetools')
+        self.addCleanup(rmtree, path.dirname(self.settings_directory))
+
+        self.docker_client = mock.MagicMock()
+        self.docker_client.api.inspect_container.side_effect = lambda container_id: {
+            'app-1': make_inspect_data(['app', 'app-mariadb', 'c0ffee']),
+            'app-2': make_inspect_data(['app', 'app-redis']),
+            'other': make_inspect_data(None),
+        }[container_id]
+
+        start_patches(
+            self,
+            mock.patch.object(
+                docker_util, 'get_docker_client',
+                return_value=self.docker_client,
+            ),
+            mock.patch.object(
+                docker_util, 'get_settings_directory',
+                return_value=self.settings_directory,
+            ),
+        )
+
+    def set_containers(self, container_ids):
+        self.docker_client.api.containers.return_value = [
+            {'Id': container_id} for container_id in container_ids
+        ]
+
+    def test_aliases_indexed(self):
+        self.set_containers(['app-1', 'app-2', 'other'])
+
+        self.assertEqual(get_dev_network_aliases(), ['app-mariadb', 'app-redis'])
+        self.assertEqual(self.docker_client.api.inspect_container.call_count, 3)
+
+        self.docker_client.api.containers.assert_called_once_with(all=True, filters={
+            'network': 'dev',
+            'label': [
+                'com.docker.compose.oneoff=False',
+                'com.docker.compose.project',
+            ],
+        })
+
+        # Known containers aren't inspected again
+        self.docker_client.api.inspect_container.reset_mock()
+        self.assertEqual(get_dev_network_aliases(), ['app-mariadb', 'app-redis'])
+        self.docker_client.api.inspect_container.assert_not_called()
+
+    def test_removed_containers_dropped_from_index(self):
+        self.set_containers(['app-1', 'app-2'])
+        get_dev_network_aliases()
+
+        self.set_containers(['app-1'])
+        self.assertEqual(get_dev_network_aliases(), ['app-mariadb'])
+
+        index_filename = path.join(self.settings_directory, DEV_NETWORK_ALIASES_FILENAME)
+        with open(index_filename, 'r') as f:
+            self.assertEqual(json.load(f), {'app-1': 'app-mariadb'})
@@ -0,0 +1,240 @@
+from os import path
+from unittest import mock, TestCase
+
+from kubetools.dev.backends import docker_api
+from kubetools.exceptions import KubeDevCommandError
+
+
+class TestMakeVolumeBind(TestCase):
+    def test_anonymous_volume(self):
+        self.assertEqual(docker_api._make_volume_bind('/data'), ('/data', None))
+
+    def test_named_volume(self):
+        self.assertEqual(
+            docker_api._make_volume_bind('data:/var/lib/data'),
+            ('/var/lib/data', 'data:/var/lib/data'),
+        )
+
+    def test_relative_path_with_mode(self):
+        self.assertEqual(
+            docker_api._make_volume_bind('./src:/app:ro'),
+            ('/app', '{0}:/app:ro'.format(path.abspath('src'))),
+        )
+
+    def test_long_syntax_bind(self):
+        self.assertEqual(
+            docker_api._make_volume_bind({
+                'type': 'bind',
+                'source': '/src',
+                'target': '/app',
+                'read_only': True,
+            }),
+            ('/app', '/src:/app:ro'),
+        )
+
+    def test_long_syntax_anonymous_volume(self):
+        self.assertEqual(
+            docker_api._make_volume_bind({'type': 'volume', 'target': '/data'}),
+            ('/data', None),
+        )
+
+
+class TestMakePortBindings(TestCase):
+    def test_port_bindings(self):
+        container_ports, port_bindings = docker_api._make_port_bindings([
+            80,
+            '8000:8080',
+            '5353:53/udp',
+        ])
+
+        self.assertEqual(container_ports, [80, 8080, (53, 'udp')])
+        self.assertEqual(port_bindings, {
+            '80': None,
+            '8080': 8000,
+            '53/udp': 5353,
+        })
+
+
+class TestCreateContainer(TestCase):
+    def create_container(self, service, **kwargs):
+        docker_client = mock.MagicMock()
+        docker_client.api.create_container.return_value = {'Id': 'container-id'}
+
+        with mock.patch.object(
+            docker_api, 'get_docker_client', return_value=docker_client,
+        ), mock.patch.object(
+            docker_api, '_ensure_image', return_value='image',
+        ), mock.patch.object(
+            docker_api, '_ensure_project_network',
+        ), mock.patch.object(
+            docker_api, 'get_compose_network_name', return_value='dev',
+        ):
+            container_id = docker_api._create_container(
+                {}, 'app', service,
+                container_name='app_app_1',
+                labels={'com.docker.compose.service': 'app'},
+                **kwargs,
+            )
+
+        self.assertEqual(container_id, 'container-id')
+        return docker_client
+
+    def test_create_container_kwargs(self):
+        docker_client = self.create_container({
+            'image': 'image',
+            'command': ['uwsgi'],
+            'environment': {'KEY': 'value'},
+            'labels': {'label': 'value'},
+            'ports': ['8000:80'],
+            'volumes': [
+                '/data',
+                './src:/app',
+                {'type': 'tmpfs', 'target': '/tmp'},
+            ],
+            'working_dir': '/app',
+            'privileged': True,
+        }, aliases=['app'])
+
+        docker_client.api.create_host_config.assert_called_once_with(
+            binds=['{0}:/app'.format(path.abspath('src'))],
+            port_bindings={'80': 8000},
+            network_mode='dev',
+            tmpfs={'/tmp': ''},
+            privileged=True,
+        )
+        docker_client.api.create_endpoint_config.assert_called_once_with(aliases=['app'])
+
+        container_kwargs = docker_client.api.create_container.call_args[1]
+        self.assertEqual(container_kwargs['image'], 'image')
+        self.assertEqual(container_kwargs['name'], 'app_app_1')
+        self.assertEqual(container_kwargs['command'], ['uwsgi'])
+        self.assertEqual(container_kwargs['environment'], ['KEY=value'])
+        self.assertEqual(container_kwargs['working_dir'], '/app')
+        self.assertEqual(container_kwargs['ports'], [80])
+        self.assertEqual(container_kwargs['volumes'], ['/data', '/app'])
+        self.assertEqual(container_kwargs['labels'], {
+            'label': 'value',
+            'com.docker.compose.service': 'app',
+        })
+
+    def test_kwargs_override_service(self):
+        docker_client = self.create_container(
+            {'image': 'image', 'ports': ['8000:80'], 'entrypoint': ['uwsgi']},
+            publish_ports=False,
+            entrypoint=['bash'],
+        )
+
+        container_kwargs = docker_client.api.create_container.call_args[1]
+        self.assertEqual(container_kwargs['entrypoint'], ['bash'])
+        self.assertIsNone(container_kwargs['ports'])
+
+
+class TestCommandExitCodes(TestCase):
+    def run_container(self, exit_code):
+        docker_client = mock.MagicMock()
+        docker_client.api.wait.return_value = {'StatusCode': exit_code}
+
+        with mock.patch.object(
+            docker_api, 'get_docker_client', return_value=docker_client,
+        ), mock.patch.object(
+            docker_api, '_get_service', return_value={'image': 'image'},
+        ), mock.patch.object(
+            docker_api, '_create_container', return_value='container-id',
+        ), mock.patch.object(
+            docker_api, '_capture_output', return_value='output',
+        ), mock.patch.object(
+            docker_api, 'get_compose_name', return_value='app',
+        ):
+            try:
+                return docker_api.run_container({}, 'app', ['true'], capture_output=True)
+            finally:
+                # The one-off container is always removed
+                docker_client.api.remove_container.assert_called_once_with(
+                    'container-id', force=True,
+                )
+
+    def exec_container(self, exit_code):
+        docker_client = mock.MagicMock()
+        docker_client.api.exec_inspect.return_value = {'ExitCode': exit_code}
+
+        with mock.patch.object(
+            docker_api, 'get_docker_client', return_value=docker_client,
+        ), mock.patch.object(
+            docker_api, '_get_container_id', return_value='container-id',
+        ), mock.patch.object(
+            docker_api, '_capture_output', return_value='output',
+        ):
+            return docker_api.exec_container({}, 'app', ['true'], capture_output=True)
+
+    def test_run_container_success(self):
+        self.assertEqual(self.run_container(0), 'output')
+
+    def test_run_container_failure(self):
+        with self.assertRaises(KubeDevCommandError):
+            self.run_container(1)
+
+    def test_exec_container_success(self):
+        self.assertEqual(self.exec_container(0), 'output')
+
+    def test_exec_container_failure(self):
+        with self.assertRaises(KubeDevCommandError):
+            self.exec_container(2)
+
+
+class TestBuildContainers(TestCase):
+    def test_duplicate_services_tagged(self):
+        services = {
+            'web': {'build': {'dockerfile': 'Dockerfile'}},
+            'custom': {'build': {'dockerfile': 'Dockerfile'}, 'image': 'custom-app:dev'},
+        }
+        docker_client = mock.MagicMock()
+
+        with mock.patch.object(
+            docker_api, 'get_containers_status', return_value={},
+        ), mock.patch.object(
+            docker_api, 'get_docker_client', return_value=docker_client,
+        ), mock.patch.object(
+            docker_api, '_get_service', side_effect=lambda config, name: services[name],
+        ), mock.patch.object(
+            docker_api, '_build_image', return_value='app_web',
+        ) as fake_build_image:
+            docker_api._build_containers({}, ['web', 'custom'])
+
+        fake_build_image.assert_called_once_with({}, 'web', services['web'])
+        docker_client.api.tag.assert_called_once_with('app_web', 'custom-app', 'dev')
+
+
+class TestDestroyContainers(TestCase):
+    def test_remove_images(self):
+        docker_client = mock.MagicMock()
+        docker_client.api.containers.return_value = [
+            {'Id': 'web-id', 'Names': ['/app_web_1'], 'Labels': {
+                'com.docker.compose.service': 'web',
+            }},
+        ]
+
+        with mock.patch.object(
+            docker_api, 'get_docker_client', return_value=docker_client,
+        ), mock.patch.object(
+            docker_api, 'get_compose_name', return_value='app',
+        ), mock.patch.object(
+            docker_api, 'get_compose_network_name', return_value='app_default',
+        ), mock.patch.object(
+            docker_api, 'is_dev_network_env', return_value=False,
+        ), mock.patch.object(
+            docker_api, 'get_compose_config', return_value={'services': {
+                'web': {'build': {'dockerfile': 'Dockerfile'}},
+                'custom': {'build': {'dockerfile': 'Dockerfile'}, 'image': 'custom-app:dev'},
+                'redis': {'image': 'redis:6'},
+            }},
+        ), mock.patch.object(
+            docker_api, 'get_compose_image_name', return_value='app_web',
+        ), mock.patch.object(
+            docker_api, 'refresh_containers_status',
+        ):
+            docker_api.destroy_containers({}, remove_images=True)
+
+        docker_client.api.remove_container.assert_called_once_with('web-id', force=True)
+        docker_client.api.remove_network.assert_called_once_with('app_default')
+        # Only images built for the environment are removed
+        docker_client.api.remove_image.assert_called_once_with('app_web', force=True)
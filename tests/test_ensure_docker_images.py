@@ -0,0 +1,266 @@
+from os import makedirs, path
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import mock, TestCase
+
+from kubetools.config import load_kubetools_config
+from kubetools.deploy import image
+from kubetools.deploy.build import Build
+from kubetools.deploy.image import get_build_content_hash
+from kubetools.exceptions import KubeBuildError
+
+from .util import start_patches
+
+
+def write_file(filename, data):
+    makedirs(path.dirname(filename), exist_ok=True)
+    with open(filename, 'w') as f:
+        f.write(data)
+
+
+class TestEnsureDockerImages(TestCase):
+    def setUp(self):
+        self.app_dir = path.join('tests', 'configs', 'docker_registry')
+        self.kubetools_config = load_kubetools_config(self.app_dir, env='staging')
+
+        start_patches(
+            self,
+            mock.patch.object(image, 'run_shell_command'),
+            mock.patch.object(image, '_find_last_pushed_commit', return_value='previous'),
+            mock.patch.object(image, 'retag_image'),
+            mock.patch.object(image, 'ensure_base_images', return_value=True),
+            mock.patch.object(image, 'get_manifest_digest', return_value='sha256:c0ffee'),
+            mock.patch('click.echo'),
+        )
+
+        self.run_shell_command = image.run_shell_command
+        self.retag_image = image.retag_image
+
+    def get_build_commands(self):
+        return {
+            args[args.index('-t') + 1]: (args, kwargs)
+            for args, kwargs in self.run_shell_command.call_args_list
+            if args[:2] == ('docker', 'build')
+        }
+
+    def get_commands(self):
+        return [args for args, kwargs in self.run_shell_command.call_args_list]
+
+    def test_build_uses_previous_commit_image_cache(self):
+        def has_app_commit_image(registry, app_name, context_name, commit_hash):
+            # Only one of the contexts was built for the previous commit
+            return commit_hash == 'previous' and context_name == 'generic-containerContext'
+
+        with mock.patch.object(image, 'has_app_commit_image', has_app_commit_image):
+            image._ensure_docker_images(
+                self.kubetools_config, Build('staging', 'default'), self.app_dir,
+                'current', default_registry='registry',
+            )
+
+        build_commands = self.get_build_commands()
+
+        args, kwargs = build_commands[
+            'registry/generic-app:generic-containerContext-commit-current'
+        ]
+        self.assertEqual(
+            args[args.index('--cache-from') + 1],
+            'registry/generic-app:generic-containerContext-commit-previous',
+        )
+        self.assertIn('BUILDKIT_INLINE_CACHE=1', args)
+        self.assertNotIn('--pull', args)
+        self.assertEqual(kwargs['env'], {'DOCKER_BUILDKIT': '1'})
+
+        # No previous image for this context, so no cache to use
+        args, kwargs = build_commands[
+            'specific-registry/generic-app:registry-containerContext-commit-current'
+        ]
+        self.assertNotIn('--cache-from', args)
+        self.assertIn('BUILDKIT_INLINE_CACHE=1', args)
+
+    def test_additional_tags_added_in_registry(self):
+        with mock.patch.object(image, 'has_app_commit_image', return_value=False):
+            image._ensure_docker_images(
+                self.kubetools_config, Build('staging', 'default'), self.app_dir,
+                'current', default_registry='registry', additional_tags=['latest'],
+            )
+
+        # Only the commit tag is pushed, latest is added in the registry
+        self.assertIn(
+            ('docker', 'push', 'registry/generic-app:generic-containerContext-commit-current'),
+            self.get_commands(),
+        )
+        self.assertNotIn(
+            ('docker', 'push', 'registry/generic-app:latest'),
+            self.get_commands(),
+        )
+        self.retag_image.assert_any_call(
+            'registry', 'generic-app', 'generic-containerContext-commit-current', ['latest'],
+        )
+
+    def test_additional_tags_tuple(self):
+        # The CLI passes multiple options as a tuple
+        with mock.patch.object(image, 'has_app_commit_image', return_value=False):
+            image._ensure_docker_images(
+                self.kubetools_config, Build('staging', 'default'), self.app_dir,
+                'current', default_registry='registry', additional_tags=('latest',),
+            )
+
+        self.retag_image.assert_any_call(
+            'registry', 'generic-app', 'generic-containerContext-commit-current', ['latest'],
+        )
+
+    def test_existing_commit_image_gets_additional_tags(self):
+        with mock.patch.object(image, 'has_app_commit_image', return_value=True):
+            image._ensure_docker_images(
+                self.kubetools_config, Build('staging', 'default'), self.app_dir,
+                'current', default_registry='registry', additional_tags=['latest'],
+            )
+
+        self.assertEqual(self.get_build_commands(), {})
+        self.retag_image.assert_any_call(
+            'specific-registry', 'generic-app', 'registry-containerContext-commit-current',
+            ['latest'],
+        )
+
+    def test_image_without_digest(self):
+        image.get_manifest_digest.side_effect = KubeBuildError('No digest')
+
+        with mock.patch.object(image, 'has_app_commit_image', return_value=True):
+            context_to_image = image._ensure_docker_images(
+                self.kubetools_config, Build('staging', 'default'), self.app_dir,
+                'current', default_registry='registry',
+            )
+
+        self.assertEqual(
+            context_to_image['generic-containerContext'],
+            'registry/generic-app:generic-containerContext-commit-current',
+        )
+
+    def test_retag_falls_back_to_docker_push(self):
+        self.retag_image.side_effect = KubeBuildError('Registry down')
+
+        with mock.patch.object(image, 'has_app_commit_image', return_value=True):
+            image._ensure_docker_images(
+                self.kubetools_config, Build('staging', 'default'), self.app_dir,
+                'current', default_registry='registry', additional_tags=['latest'],
+            )
+
+        self.assertIn((
+            'docker', 'tag',
+            'registry/generic-app:generic-containerContext-commit-current',
+            'registry/generic-app:latest',
+        ), self.get_commands())
+        self.assertIn(('docker', 'push', 'registry/generic-app:latest'), self.get_commands())
+
+    def test_content_image_exists_skips_build(self):
+        def has_app_image(registry, app_name, version):
+            return '-content-' in version
+
+        start_patches(
+            self,
+            mock.patch.object(image, 'get_build_content_hash', return_value='c0ffee'),
+            mock.patch.object(image, 'has_app_image', has_app_image),
+            mock.patch.object(image.get_settings(), 'IMAGE_TAG_SCHEME', 'content'),
+        )
+
+        context_to_image = image._ensure_docker_images(
+            self.kubetools_config, Build('staging', 'default'), self.app_dir,
+            'current', default_registry='registry',
+        )
+
+        self.assertEqual(self.get_build_commands(), {})
+        self.assertEqual(
+            context_to_image['generic-containerContext'],
+            'registry/generic-app:generic-containerContext-commit-current@sha256:c0ffee',
+        )
+        self.retag_image.assert_any_call(
+            'registry', 'generic-app', 'generic-containerContext-content-c0ffee',
+            ['generic-containerContext-commit-current'],
+        )
+
+    def test_sdk_builder_archives_context_once(self):
+        start_patches(
+            self,
+            mock.patch.object(image, 'has_app_commit_image', return_value=False),
+            mock.patch.object(image, 'make_context_archive'),
+            mock.patch.object(image, 'build_image'),
+            mock.patch.object(image.get_settings(), 'IMAGE_BUILDER', 'sdk'),
+        )
+
+        image._ensure_docker_images(
+            self.kubetools_config, Build('staging', 'default'), self.app_dir,
+            'current', default_registry='registry',
+        )
+
+        self.assertEqual(self.get_build_commands(), {})
+        image.make_context_archive.assert_called_once()
+
+        context_archive = image.make_context_archive.return_value
+        self.assertEqual(image.build_image.call_count, 4)
+        for call in image.build_image.call_args_list:
+            self.assertIs(call[0][1], context_archive)
+        context_archive.close.assert_called_once_with()
+
+    def test_sdk_builder_closes_context_archive_on_failure(self):
+        start_patches(
+            self,
+            mock.patch.object(image, 'has_app_commit_image', return_value=False),
+            mock.patch.object(image, 'make_context_archive'),
+            mock.patch.object(image, 'build_image', side_effect=KubeBuildError('Build failed')),
+            mock.patch.object(image.get_settings(), 'IMAGE_BUILDER', 'sdk'),
+        )
+
+        with self.assertRaises(KubeBuildError):
+            image._ensure_docker_images(
+                self.kubetools_config, Build('staging', 'default'), self.app_dir,
+                'current', default_registry='registry',
+            )
+
+        image.make_context_archive.return_value.close.assert_called_once_with()
+
+
+class TestBuildContentHash(TestCase):
+    def setUp(self):
+        self.app_dir = mkdtemp()
+        self.addCleanup(rmtree, self.app_dir)
+
+        write_file(path.join(self.app_dir, 'Dockerfile'), 'FROM python\nCOPY . /app\n')
+        write_file(path.join(self.app_dir, '.dockerignore'), '# Local files\nlocal\n')
+        write_file(path.join(self.app_dir, 'app', 'main.py'), 'print(1)\n')
+
+    def get_hash(self, build_args=()):
+        return get_build_content_hash(self.app_dir, 'Dockerfile', build_args)
+
+    def test_ignored_files_not_hashed(self):
+        content_hash = self.get_hash()
+
+        write_file(path.join(self.app_dir, 'local', 'notes.txt'), 'notes')
+        self.assertEqual(self.get_hash(), content_hash)
+
+    def test_context_files_hashed(self):
+        content_hash = self.get_hash()
+
+        write_file(path.join(self.app_dir, 'app', 'main.py'), 'print(2)\n')
+        self.assertNotEqual(self.get_hash(), content_hash)
+
+    def test_kubetools_state_not_hashed(self):
+        content_hash = self.get_hash()
+
+        write_file(path.join(self.app_dir, '.kubetools', 'prebuild-cache.json'), '{}')
+        self.assertEqual(self.get_hash(), content_hash)
+
+    def test_build_args_hashed(self):
+        self.assertNotEqual(self.get_hash(['VERSION=1']), self.get_hash(['VERSION=2']))
+
+    def test_environment_build_args_hashed(self):
+        with mock.patch.dict('os.environ', {'VERSION': '1'}):
+            content_hash = self.get_hash(['VERSION'])
+
+        with mock.patch.dict('os.environ', {'VERSION': '2'}):
+            self.assertNotEqual(self.get_hash(['VERSION']), content_hash)
+
+    def test_build_args_order_not_hashed(self):
+        self.assertEqual(
+            self.get_hash(['A=1', 'B=2']),
+            self.get_hash(['B=2', 'A=1']),
+        )
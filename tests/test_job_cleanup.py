@@ -0,0 +1,121 @@
+from unittest import mock, TestCase
+
+from kubernetes.client import (
+    V1Namespace,
+    V1ObjectMeta,
+    V1OwnerReference,
+    V1Pod,
+)
+
+from kubetools.deploy.commands import cleanup, deploy
+from kubetools.kubernetes import api
+
+from .util import start_patches
+
+
+def make_pod(name, owner_name=None):
+    owner_references = None
+    if owner_name:
+        owner_references = [V1OwnerReference(
+            api_version='batch/v1',
+            kind='Job',
+            name=owner_name,
+            uid='1234',
+        )]
+
+    return V1Pod(metadata=V1ObjectMeta(name=name, owner_references=owner_references))
+
+
+class TestDeleteJob(TestCase):
+    def setUp(self):
+        self.k8s_batch_api = mock.MagicMock()
+
+        start_patches(
+            self,
+            mock.patch.object(api, '_get_k8s_jobs_batch_api', return_value=self.k8s_batch_api),
+            mock.patch.object(api, '_wait_for_no_object'),
+        )
+
+    def test_delete_job_without_wait(self):
+        api.delete_job(
+            'staging', 'default', {'metadata': {'name': 'upgrade'}},
+            propagation_policy='Background',
+            wait=False,
+        )
+
+        self.k8s_batch_api.delete_namespaced_job.assert_called_once_with(
+            name='upgrade',
+            namespace='default',
+            propagation_policy='Background',
+        )
+        api._wait_for_no_object.assert_not_called()
+
+
+class TestDeleteCompletedJob(TestCase):
+    def setUp(self):
+        self.build = mock.MagicMock(env='staging', namespace='default')
+
+        patch = mock.patch.object(deploy, 'delete_job')
+        self.addCleanup(patch.stop)
+        self.delete_job = patch.start()
+
+    def test_job_with_ttl_left_to_ttl_controller(self):
+        deploy._delete_completed_job(self.build, {
+            'metadata': {'name': 'upgrade'},
+            'spec': {'ttlSecondsAfterFinished': 0},
+        })
+
+        self.delete_job.assert_not_called()
+
+    def test_job_deleted_in_background(self):
+        job = {
+            'metadata': {'name': 'upgrade'},
+            'spec': {},
+        }
+
+        deploy._delete_completed_job(self.build, job)
+
+        self.delete_job.assert_called_once_with(
+            'staging', 'default', job,
+            propagation_policy='Background',
+            wait=False,
+        )
+
+
+class TestCleanupJobs(TestCase):
+    def setUp(self):
+        self.build = mock.MagicMock(env='staging', namespace='app')
+
+        start_patches(
+            self,
+            mock.patch.object(cleanup, 'list_replica_sets', return_value=[]),
+            mock.patch.object(cleanup, 'list_complete_jobs', return_value=[
+                {'metadata': {'name': 'upgrade'}},
+            ]),
+            mock.patch.object(cleanup, 'list_pods', return_value=[
+                make_pod('upgrade-1234', owner_name='upgrade'),
+                make_pod('orphan'),
+            ]),
+            mock.patch.object(cleanup, 'list_namespaces', return_value=[
+                V1Namespace(metadata=V1ObjectMeta(name='app')),
+            ]),
+        )
+
+    def test_job_pods_deleted_with_job(self):
+        namespaces, replica_sets, pods, jobs = cleanup.get_cleanup_objects(
+            self.build, cleanup_jobs=True,
+        )
+
+        self.assertEqual([pod.metadata.name for pod in pods], ['orphan'])
+        self.assertEqual(len(jobs), 1)
+        # The job pods are removed by the job deletion, so the namespace is now empty
+        self.assertEqual(len(namespaces), 1)
+
+    def test_job_pods_kept_without_cleanup_jobs(self):
+        namespaces, replica_sets, pods, jobs = cleanup.get_cleanup_objects(
+            self.build, cleanup_jobs=False,
+        )
+
+        self.assertEqual([pod.metadata.name for pod in pods], ['orphan'])
+        self.assertEqual(jobs, [])
+        self.assertEqual(namespaces, [])
@@ -0,0 +1,69 @@
+from unittest import mock, TestCase
+
+import click
+
+from kubetools.dev.backends.docker_compose.log_util import LogMultiplexer
+
+
+def make_docker_client(container_logs):
+    docker_client = mock.MagicMock()
+    docker_client.api.logs.side_effect = (
+        lambda container_id, **kwargs: iter(container_logs[container_id])
+    )
+    return docker_client
+
+
+class TestLogMultiplexer(TestCase):
+    def follow(self, container_logs, **kwargs):
+        multiplexer = LogMultiplexer(buffer_size=100, **kwargs)
+        for container_id in container_logs:
+            multiplexer.add(container_id, container_id)
+
+        docker_client = make_docker_client(container_logs)
+
+        with mock.patch(
+            'kubetools.dev.backends.docker_compose.log_util.get_docker_client',
+            return_value=docker_client,
+        ), mock.patch('click.echo') as fake_echo:
+            multiplexer.follow(tail=5, since=123)
+
+        output = '\n'.join(call[0][0] for call in fake_echo.call_args_list)
+        return docker_client, click.unstyle(output).splitlines()
+
+    def test_follow_splits_chunks_into_lines(self):
+        docker_client, lines = self.follow({
+            'app': [b'hello wo', b'rld\nsecond ', b'line\nno newline'],
+            'db': [b'ready\n'],
+        })
+
+        self.assertEqual(sorted(lines), [
+            'app | hello world',
+            'app | no newline',
+            'app | second line',
+            'db  | ready',
+        ])
+
+        docker_client.api.logs.assert_any_call(
+            'app', stream=True, follow=True, tail=5, since=123,
+        )
+
+    def test_follow_filters_lines(self):
+        _, lines = self.follow(
+            {'app': [b'GET /health 200\nPOST /login 500\n', b'GET / 500\n']},
+            pattern=r' 500$',
+        )
+
+        self.assertEqual(lines, [
+            'app | POST /login 500',
+            'app | GET / 500',
+        ])
+
+    def test_buffer_drops_oldest_lines(self):
+        multiplexer = LogMultiplexer(buffer_size=2)
+        multiplexer.add('app', 'app')
+
+        multiplexer._buffer_lines('app', [b'one', b'two', b'three'])
+        lines = multiplexer._drain_buffers({'app': ''})
+
+        self.assertEqual(lines[1:], ['two', 'three'])
+        self.assertIn('1 lines dropped', click.unstyle(lines[0]))
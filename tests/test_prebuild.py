@@ -0,0 +1,152 @@
+from os import makedirs, path, remove
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import mock, TestCase
+
+from kubetools.deploy import prebuild
+from kubetools.deploy.build import Build
+from kubetools.deploy.prebuild import get_command_list_groups, run_pre_build_commands
+from kubetools.exceptions import KubeBuildError
+
+from .util import start_patches
+
+ASSETS_COMMAND = {
+    'command': ['make', 'assets'],
+    'inputs': ['assets/**'],
+    'outputs': ['dist'],
+}
+
+CSS_COMMAND = {
+    'command': ['make', 'css'],
+    'inputs': ['styles/*.scss'],
+    'outputs': ['dist/css'],
+}
+
+CONFIG_COMMAND = {
+    'command': ['make', 'config'],
+    'outputs': ['config.json'],
+}
+
+
+class TestPreBuildCommands(TestCase):
+    def setUp(self):
+        self.app_dir = mkdtemp()
+        self.addCleanup(rmtree, self.app_dir)
+
+        self.write_file(path.join('assets', 'app.js'), 'app')
+
+        start_patches(
+            self,
+            mock.patch.object(prebuild, 'run_shell_command', side_effect=self.fake_command),
+            mock.patch('click.echo'),
+        )
+
+        self.run_shell_command = prebuild.run_shell_command
+
+    def write_file(self, filename, data):
+        filename = path.join(self.app_dir, filename)
+        makedirs(path.dirname(filename), exist_ok=True)
+
+        with open(filename, 'w') as f:
+            f.write(data)
+
+    def fake_command(self, *args, **kwargs):
+        if args == ('make', 'assets'):
+            self.write_file(path.join('dist', 'app.min.js'), 'min')
+        elif args == ('make', 'fail'):
+            raise KubeBuildError('Command failed')
+
+    def run_commands(self, *command_lists):
+        run_pre_build_commands(
+            Build('staging', 'default'),
+            self.app_dir,
+            command_lists,
+            {'KUBE_ENV': 'staging', 'BUILD_COMMIT': 'abc'},
+        )
+
+    def test_unchanged_command_skipped(self):
+        self.run_commands([ASSETS_COMMAND])
+        self.run_commands([ASSETS_COMMAND])
+
+        self.assertEqual(self.run_shell_command.call_count, 1)
+
+    def test_changed_inputs_rerun(self):
+        self.run_commands([ASSETS_COMMAND])
+        self.write_file(path.join('assets', 'app.js'), 'changed')
+        self.run_commands([ASSETS_COMMAND])
+
+        self.assertEqual(self.run_shell_command.call_count, 2)
+
+    def test_missing_outputs_rerun(self):
+        self.run_commands([ASSETS_COMMAND])
+        remove(path.join(self.app_dir, 'dist', 'app.min.js'))
+        self.run_commands([ASSETS_COMMAND])
+
+        self.assertEqual(self.run_shell_command.call_count, 2)
+
+    def test_commands_without_inputs_always_run(self):
+        self.run_commands([['make', 'config']])
+        self.run_commands([['make', 'config']])
+
+        self.assertEqual(self.run_shell_command.call_count, 2)
+
+    def test_identical_command_lists_run_once(self):
+        self.run_commands(
+            [['make', 'config'], ASSETS_COMMAND],
+            [['make', 'config'], ASSETS_COMMAND],
+            [['make', 'other']],
+        )
+
+        self.assertEqual(
+            sorted(call[0] for call in self.run_shell_command.call_args_list),
+            [('make', 'assets'), ('make', 'config'), ('make', 'other')],
+        )
+
+    def test_failure_stops_later_command_lists(self):
+        with self.assertRaises(KubeBuildError):
+            self.run_commands([['make', 'fail']], [['make', 'other']])
+
+        self.assertEqual(
+            [call[0] for call in self.run_shell_command.call_args_list],
+            [('make', 'fail')],
+        )
+
+
+class TestCommandListGroups(TestCase):
+    def test_independent_lists_grouped(self):
+        self.assertEqual(
+            get_command_list_groups([[ASSETS_COMMAND], [CONFIG_COMMAND]]),
+            [[[ASSETS_COMMAND], [CONFIG_COMMAND]]],
+        )
+
+    def test_overlapping_lists_not_grouped(self):
+        # Both write within dist
+        self.assertEqual(
+            get_command_list_groups([[ASSETS_COMMAND], [CSS_COMMAND], [CONFIG_COMMAND]]),
+            [[[ASSETS_COMMAND]], [[CSS_COMMAND], [CONFIG_COMMAND]]],
+        )
+
+    def test_undeclared_lists_run_alone(self):
+        self.assertEqual(
+            get_command_list_groups([
+                [ASSETS_COMMAND],
+                [['npm', 'install']],
+                [{'command': ['npm', 'install']}],
+                [CONFIG_COMMAND],
+            ]),
+            [
+                [[ASSETS_COMMAND]],
+                [[['npm', 'install']]],
+                [[{'command': ['npm', 'install']}]],
+                [[CONFIG_COMMAND]],
+            ],
+        )
+
+    def test_list_with_any_undeclared_command_runs_alone(self):
+        self.assertEqual(
+            get_command_list_groups([
+                [CONFIG_COMMAND],
+                [ASSETS_COMMAND, ['make', 'other']],
+            ]),
+            [[[CONFIG_COMMAND]], [[ASSETS_COMMAND, ['make', 'other']]]],
+        )
@@ -0,0 +1,165 @@
+from unittest import mock, TestCase
+
+from kubernetes.client import (
+    V1Container,
+    V1ContainerState,
+    V1ContainerStateWaiting,
+    V1ContainerStatus,
+    V1DaemonSet,
+    V1DaemonSetSpec,
+    V1DaemonSetStatus,
+    V1LabelSelector,
+    V1ObjectMeta,
+    V1Pod,
+    V1PodSpec,
+    V1PodStatus,
+    V1PodTemplateSpec,
+)
+
+from kubetools.exceptions import KubeBuildError
+from kubetools.kubernetes import api
+from kubetools.kubernetes.config import make_prepull_daemon_set_configs
+from kubetools.kubernetes.config.deployment import make_deployment_config
+
+from .util import start_patches
+
+
+def make_deployment(name, images, node_selector_labels=None):
+    return make_deployment_config(
+        name,
+        {
+            f'container-{i}': {'image': image}
+            for i, image in enumerate(images)
+        },
+        node_selector_labels=node_selector_labels,
+    )
+
+
+def make_pod(image_id='', waiting_reason=None):
+    state = None
+    if waiting_reason:
+        state = V1ContainerState(waiting=V1ContainerStateWaiting(reason=waiting_reason))
+
+    return V1Pod(
+        metadata=V1ObjectMeta(name='kubetools-prepull-1234'),
+        spec=V1PodSpec(
+            containers=[V1Container(name='image-0', image='app')],
+            node_name='node-1',
+        ),
+        status=V1PodStatus(container_statuses=[V1ContainerStatus(
+            name='image-0',
+            image='app',
+            image_id=image_id,
+            ready=False,
+            restart_count=0,
+            state=state,
+        )]),
+    )
+
+
+class TestPrepullDaemonSetConfigs(TestCase):
+    def test_daemon_set_per_node_selector(self):
+        daemon_sets = make_prepull_daemon_set_configs([
+            make_deployment('web', ['app@sha256:1', 'nginx:1.19']),
+            make_deployment('worker', ['app@sha256:1']),
+            make_deployment('gpu', ['app@sha256:1'], node_selector_labels={'gpu': 'true'}),
+        ])
+
+        self.assertEqual(len(daemon_sets), 2)
+
+        default_spec = daemon_sets[0]['spec']['template']['spec']
+        self.assertNotIn('nodeSelector', default_spec)
+        self.assertEqual(
+            [
+                (container['image'], container['imagePullPolicy'])
+                for container in default_spec['containers']
+            ],
+            [('app@sha256:1', 'IfNotPresent'), ('nginx:1.19', 'Always')],
+        )
+
+        gpu_spec = daemon_sets[1]['spec']['template']['spec']
+        self.assertEqual(gpu_spec['nodeSelector'], {'gpu': 'true'})
+        self.assertEqual(len(gpu_spec['containers']), 1)
+
+    def test_daemon_set_copies_scheduling_and_pull_secrets(self):
+        tolerations = [{'key': 'gpu', 'operator': 'Exists', 'effect': 'NoSchedule'}]
+        affinity = {'nodeAffinity': {'requiredDuringSchedulingIgnoredDuringExecution': {
+            'nodeSelectorTerms': [{'matchExpressions': [
+                {'key': 'pool', 'operator': 'In', 'values': ['gpu']},
+            ]}],
+        }}}
+        image_pull_secrets = [{'name': 'registry'}]
+
+        deployment = make_deployment('gpu', ['app@sha256:1'])
+        deployment['spec']['template']['spec'].update({
+            'tolerations': tolerations,
+            'affinity': affinity,
+            'imagePullSecrets': image_pull_secrets,
+        })
+
+        daemon_sets = make_prepull_daemon_set_configs([
+            make_deployment('web', ['app@sha256:1']),
+            deployment,
+        ])
+
+        self.assertEqual(len(daemon_sets), 2)
+        self.assertNotIn('tolerations', daemon_sets[0]['spec']['template']['spec'])
+
+        gpu_spec = daemon_sets[1]['spec']['template']['spec']
+        self.assertEqual(gpu_spec['tolerations'], tolerations)
+        self.assertEqual(gpu_spec['affinity'], affinity)
+        self.assertEqual(gpu_spec['imagePullSecrets'], image_pull_secrets)
+
+
+class TestWaitForDaemonSetImages(TestCase):
+    def setUp(self):
+        self.k8s_apps_api = mock.MagicMock()
+        self.k8s_apps_api.read_namespaced_daemon_set.return_value = V1DaemonSet(
+            metadata=V1ObjectMeta(name='kubetools-prepull-1234', generation=1),
+            spec=V1DaemonSetSpec(
+                selector=V1LabelSelector(match_labels={'kubetools/prepull': '1234'}),
+                template=V1PodTemplateSpec(),
+            ),
+            status=V1DaemonSetStatus(
+                observed_generation=1,
+                desired_number_scheduled=2,
+                current_number_scheduled=2,
+                number_misscheduled=0,
+                number_ready=0,
+            ),
+        )
+        self.k8s_core_api = mock.MagicMock()
+
+        start_patches(
+            self,
+            mock.patch.object(api, '_get_k8s_apps_api', return_value=self.k8s_apps_api),
+            mock.patch.object(api, '_get_k8s_core_api', return_value=self.k8s_core_api),
+            mock.patch.object(api, 'sleep'),
+        )
+
+    def set_pods(self, *pod_lists):
+        self.k8s_core_api.list_namespaced_pod.side_effect = [
+            mock.MagicMock(items=pods) for pods in pod_lists
+        ]
+
+    def test_waits_for_all_pods_pulled(self):
+        pulled_pod = make_pod('docker-pullable://app@sha256:1')
+
+        self.set_pods(
+            [pulled_pod, make_pod()],
+            [pulled_pod, make_pod(waiting_reason='RunContainerError')],
+        )
+
+        api.wait_for_daemon_set_images('staging', 'default', {
+            'metadata': {'name': 'kubetools-prepull-1234'},
+        })
+
+        self.assertEqual(self.k8s_core_api.list_namespaced_pod.call_count, 2)
+
+    def test_pull_failure(self):
+        self.set_pods([make_pod(waiting_reason='ImagePullBackOff')])
+
+        with self.assertRaises(KubeBuildError):
+            api.wait_for_daemon_set_images('staging', 'default', {
+                'metadata': {'name': 'kubetools-prepull-1234'},
+            })
@@ -0,0 +1,150 @@
+from os import path
+from threading import Event
+from unittest import mock, TestCase
+
+import requests
+
+from kubetools.config import load_kubetools_config
+from kubetools.dev.backends.docker_compose import probe
+from kubetools.exceptions import KubeDevError
+
+from .util import start_patches
+
+
+class TestProbeContainer(TestCase):
+    def setUp(self):
+        self.kubetools_config = load_kubetools_config(
+            path.join('tests', 'configs', 'dependencies'),
+            env='test',
+            dev=True,
+        )
+
+        self.docker_client = mock.MagicMock()
+
+        start_patches(
+            self,
+            mock.patch.object(probe, 'get_docker_client', return_value=self.docker_client),
+            mock.patch.object(probe, 'get_container_status', return_value={
+                'id': 'container-id',
+                'ports': [{'local': '80/tcp', 'host': 10080}],
+            }),
+            mock.patch.object(probe, 'sleep'),
+            mock.patch('click.echo'),
+        )
+
+        self.sleep = probe.sleep
+
+    def test_exec_probe_backs_off(self):
+        self.docker_client.api.exec_inspect.side_effect = [
+            {'ExitCode': 1},
+            {'ExitCode': 1},
+            {'ExitCode': 0},
+        ]
+        self.docker_client.api.exec_start.return_value = b'not yet'
+
+        probe.probe_container(self.kubetools_config, 'elasticsearch')
+
+        self.docker_client.api.exec_create.assert_called_with(
+            'container-id', ['curl', 'wardrobe-elasticsearch:9200'],
+        )
+        self.assertEqual(
+            [call[0][0] for call in self.sleep.call_args_list],
+            [0.05, 0.1],
+        )
+
+    def test_exec_probe_times_out(self):
+        self.docker_client.api.exec_inspect.return_value = {'ExitCode': 1}
+        self.docker_client.api.exec_start.return_value = b'not yet'
+
+        with mock.patch.object(probe, 'time', side_effect=[0, 0, 10, 30]):
+            with self.assertRaises(KubeDevError) as context:
+                probe.probe_container(self.kubetools_config, 'elasticsearch')
+
+        self.assertIn('not yet', str(context.exception))
+
+    def test_exec_probe_attempt_times_out(self):
+        container = self.kubetools_config['dependencies']['elasticsearch']['containers'][
+            'elasticsearch'
+        ]
+        container['probes']['timeoutSeconds'] = 0.1
+
+        # First attempt hangs (until the test completes), the second succeeds
+        hung = Event()
+        self.addCleanup(hung.set)
+
+        def exec_start(exec_id):
+            if self.docker_client.api.exec_start.call_count == 1:
+                hung.wait(5)
+            return b'ok'
+
+        self.docker_client.api.exec_start.side_effect = exec_start
+        self.docker_client.api.exec_inspect.return_value = {'ExitCode': 0}
+
+        probe.probe_container(self.kubetools_config, 'elasticsearch')
+
+        self.assertFalse(hung.is_set())
+        self.assertEqual(self.docker_client.api.exec_start.call_count, 2)
+
+    def test_hung_exec_probe_fails_after_max_time(self):
+        container = self.kubetools_config['dependencies']['elasticsearch']['containers'][
+            'elasticsearch'
+        ]
+        container['probes'].update({'timeoutSeconds': 0.1, 'failureThreshold': 2})
+
+        hung = Event()
+        self.addCleanup(hung.set)
+        self.docker_client.api.exec_start.side_effect = lambda exec_id: hung.wait(5)
+
+        with self.assertRaises(KubeDevError) as context:
+            probe.probe_container(self.kubetools_config, 'elasticsearch')
+
+        self.assertIn('Timed out after 0.1s', str(context.exception))
+
+    def test_http_probe_reuses_session(self):
+        container = self.kubetools_config['dependencies']['riak']['containers']['riak']
+        container['probes'] = {'httpGet': {'path': '/ping', 'port': 80}}
+
+        response = mock.MagicMock()
+        response.raise_for_status.side_effect = [requests.HTTPError('503'), None]
+
+        with mock.patch('requests.Session') as fake_session:
+            fake_session.return_value.get.return_value = response
+            probe.probe_container(self.kubetools_config, 'riak')
+
+        fake_session.assert_called_once_with()
+        fake_session.return_value.get.assert_called_with(
+            'http://localhost:10080/ping', timeout=5,
+        )
+        self.assertEqual(fake_session.return_value.get.call_count, 2)
+
+    def test_unhealthy_healthcheck_fails_immediately(self):
+        self.docker_client.api.inspect_container.return_value = {
+            'State': {'Running': True, 'Health': {'Status': 'unhealthy'}},
+        }
+
+        with self.assertRaises(KubeDevError):
+            probe.probe_container(self.kubetools_config, 'memcache-1')
+
+        self.sleep.assert_not_called()
+
+    def test_no_probe_already_running(self):
+        self.docker_client.api.inspect_container.return_value = {
+            'State': {'Running': True, 'StartedAt': '2020-01-01T00:00:00.123456789Z'},
+        }
+
+        probe.probe_container(self.kubetools_config, 'memcache-1')
+
+        self.docker_client.api.wait.assert_not_called()
+
+    def test_no_probe_container_exits(self):
+        self.docker_client.api.inspect_container.return_value = {
+            'State': {'Running': True, 'StartedAt': '2020-01-01T00:00:00Z'},
+        }
+
+        with mock.patch.object(probe, 'time', return_value=1577836800.5):
+            with self.assertRaises(KubeDevError):
+                probe.probe_container(self.kubetools_config, 'memcache-1')
+
+        self.docker_client.api.wait.assert_called_once_with(
+            'container-id', timeout=1.5, condition='not-running',
+        )
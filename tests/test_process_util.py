@@ -0,0 +1,133 @@
+import logging
+import signal
+
+from threading import Barrier
+from time import sleep
+from unittest import mock, TestCase
+
+from kubetools.dev import process_util
+from kubetools.dev.process_util import (
+    _run_process_with_spinner,
+    CommandOutput,
+    run_in_threads,
+    run_process,
+)
+from kubetools.exceptions import KubeDevCommandError
+
+
+class TestCommandOutput(TestCase):
+    def test_write_strips_ansi_across_chunks(self):
+        output = CommandOutput(max_lines=10)
+
+        output.write(b'\x1b[32mStep 1/2\x1b[0m\nStep ')
+        self.assertEqual(output.status, 'Step 1/2')
+        self.assertTrue(output.updated.is_set())
+
+        output.write(b'2/2\npartial')
+        output.finish()
+
+        self.assertEqual(output.get_output(), 'Step 1/2\nStep 2/2\npartial')
+        self.assertEqual(output.status, 'partial')
+        self.assertTrue(output.finished)
+
+    def test_overflow_drops_oldest_lines(self):
+        output = CommandOutput(max_lines=2)
+        output.write(b'one\ntwo\nthree\nfour\n')
+
+        self.assertEqual(list(output.lines), ['three', 'four'])
+        self.assertEqual(
+            output.get_output(),
+            '... (2 earlier lines dropped)\nthree\nfour',
+        )
+
+    def test_overflow_spills_to_file(self):
+        output = CommandOutput(max_lines=2, spill=True)
+        output.write(b'one\ntwo\n')
+        output.write(b'three\nfour\nfive\n')
+
+        self.assertEqual(list(output.lines), ['four', 'five'])
+        # Only read back from the file when asked for
+        self.assertEqual(
+            output.get_output(),
+            '... (3 earlier lines dropped)\nfour\nfive',
+        )
+        self.assertEqual(output.get_output(full=True), 'one\ntwo\nthree\nfour\nfive')
+        output.close()
+
+
+class TestRunProcessWithSpinner(TestCase):
+    def test_run_process_with_spinner(self):
+        code, stdout = _run_process_with_spinner(
+            ['printf', "'\\033[1mbold\\033[0m\\nplain'"],
+        )
+
+        self.assertEqual(code, 0)
+        self.assertEqual(stdout, 'bold\nplain')
+
+    def test_return_code_of_command_exiting_after_output_closed(self):
+        # The output finishes (both streams closed) well before the command exits
+        for _ in range(3):
+            code, stdout = _run_process_with_spinner(
+                ['echo', 'hi', ';', 'exec', '>&-', '2>&-', ';', 'sleep', '0.2', ';', 'exit', '3'],
+            )
+
+            self.assertEqual(code, 3)
+            self.assertEqual(stdout, 'hi')
+
+    @mock.patch.object(process_util, 'get_settings')
+    def test_output_bounded(self, fake_get_settings):
+        fake_get_settings.return_value.DEV_OUTPUT_BUFFER_LINES = '2'
+
+        code, stdout = _run_process_with_spinner(['seq', '5'])
+
+        self.assertEqual(code, 0)
+        self.assertEqual(stdout, '... (3 earlier lines dropped)\n4\n5')
+
+    def test_return_code_never_none(self):
+        for _ in range(30):
+            self.assertEqual(_run_process_with_spinner(['echo', 'hi']), (0, 'hi'))
+
+    @mock.patch.object(process_util, 'PROCESS_EXIT_TIMEOUT', 0.1)
+    def test_command_killed_after_output_closed(self):
+        code, _ = _run_process_with_spinner(['exec', '>&-', '2>&-', ';', 'sleep', '2'])
+        self.assertEqual(code, -signal.SIGKILL)
+
+    @mock.patch.object(process_util.logger, 'level', logging.INFO)
+    @mock.patch.object(process_util, '_run_process_with_spinner', return_value=(-9, ''))
+    def test_run_process_killed_command_fails(self, mock_run_process_with_spinner):
+        with self.assertRaises(KubeDevCommandError):
+            run_process(['sleep', '2'], hide_output=True)
+
+
+class TestRunInThreads(TestCase):
+    def test_results_in_order(self):
+        def double(item):
+            # Complete out of order
+            sleep(0.01 * (3 - item))
+            return item * 2
+
+        self.assertEqual(run_in_threads(double, [0, 1, 2], max_workers=3), [0, 2, 4])
+
+    def test_runs_in_parallel(self):
+        started = Barrier(3, timeout=5)
+
+        # Would time out (BrokenBarrierError) unless all 3 run at once
+        run_in_threads(lambda item: started.wait(), range(3), max_workers=3)
+
+    def test_waits_for_all_before_raising(self):
+        completed = []
+
+        def run(item):
+            if item == 0:
+                raise ValueError('failed')
+
+            sleep(0.05)
+            completed.append(item)
+
+        with self.assertRaises(ValueError):
+            run_in_threads(run, [0, 1, 2], max_workers=3)
+
+        self.assertEqual(sorted(completed), [1, 2])
+
+    def test_no_items(self):
+        self.assertEqual(run_in_threads(lambda item: item, []), [])
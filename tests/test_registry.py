@@ -0,0 +1,75 @@
+from unittest import mock, TestCase
+
+from kubetools.deploy.registry import get_manifest_digest, retag_image
+from kubetools.exceptions import KubeBuildError
+
+MANIFEST = b'{"schemaVersion": 2}'
+MANIFEST_TYPE = 'application/vnd.docker.distribution.manifest.v2+json'
+
+
+class TestRetagImage(TestCase):
+    def setUp(self):
+        patch = mock.patch('requests.Session')
+        self.addCleanup(patch.stop)
+        self.session = patch.start().return_value
+
+        self.session.get.return_value = mock.MagicMock(
+            status_code=200,
+            content=MANIFEST,
+            headers={'Content-Type': MANIFEST_TYPE},
+        )
+        self.session.put.return_value = mock.MagicMock(status_code=201)
+
+    def test_manifest_copied_to_each_tag(self):
+        retag_image('registry', 'app', 'context-commit-abc', ['latest', 'stable'])
+
+        self.session.get.assert_called_once()
+        self.assertEqual(
+            self.session.get.call_args[0][0],
+            'http://registry/v2/app/manifests/context-commit-abc',
+        )
+
+        self.assertEqual(self.session.put.call_args_list, [
+            mock.call(
+                f'http://registry/v2/app/manifests/{tag}',
+                data=MANIFEST,
+                headers={'Content-Type': MANIFEST_TYPE},
+                timeout=30,
+            )
+            for tag in ('latest', 'stable')
+        ])
+
+    def test_unsupported_manifest_type(self):
+        self.session.get.return_value.headers = {
+            'Content-Type': 'application/vnd.docker.distribution.manifest.v1+prettyjws',
+        }
+
+        with self.assertRaises(KubeBuildError):
+            retag_image('registry', 'app', 'context-commit-abc', ['latest'])
+
+        self.session.put.assert_not_called()
+
+    def test_put_failure(self):
+        self.session.put.return_value.status_code = 403
+
+        with self.assertRaises(KubeBuildError):
+            retag_image('registry', 'app', 'context-commit-abc', ['latest'])
+
+
+class TestGetManifestDigest(TestCase):
+    def test_digest_from_header(self):
+        with mock.patch('requests.head') as fake_head:
+            fake_head.return_value = mock.MagicMock(
+                status_code=200,
+                headers={'Docker-Content-Digest': 'sha256:c0ffee'},
+            )
+            digest = get_manifest_digest('registry', 'app', 'context-commit-abc')
+
+        self.assertEqual(digest, 'sha256:c0ffee')
+
+    def test_missing_image(self):
+        with mock.patch('requests.head') as fake_head:
+            fake_head.return_value = mock.MagicMock(status_code=404, headers={})
+
+            with self.assertRaises(KubeBuildError):
+                get_manifest_digest('registry', 'app', 'context-commit-abc')
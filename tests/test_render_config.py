@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+from os import listdir, path
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import mock, TestCase
+
+import click
+import yaml
+
+from kubetools.cli import generate_config
+from kubetools.cli.generate_config import (
+    _get_app_dirs,
+    _get_changed_app_dirs,
+    _render_app,
+    _write_app_objects,
+    render,
+)
+from kubetools.exceptions import KubeConfigError
+
+CONFIGS_DIR = path.join('tests', 'configs')
+
+
+class TestRenderConfig(TestCase):
+    def test_get_app_dirs(self):
+        app_dirs = _get_app_dirs((
+            path.join(CONFIGS_DIR, 'basic_*'),
+            path.join(CONFIGS_DIR, 'dependencies'),
+            path.join(CONFIGS_DIR, 'basic_app'),
+        ))
+
+        self.assertEqual(app_dirs, [
+            path.join(CONFIGS_DIR, 'basic_app'),
+            path.join(CONFIGS_DIR, 'dependencies'),
+        ])
+
+    def test_get_app_dirs_missing_config(self):
+        with self.assertRaises(KubeConfigError):
+            _get_app_dirs((CONFIGS_DIR,))
+
+    def test_get_changed_app_dirs(self):
+        app_dirs = [
+            path.join(CONFIGS_DIR, 'basic_app'),
+            path.join(CONFIGS_DIR, 'dependencies'),
+        ]
+
+        with mock.patch(
+            'kubetools.cli.generate_config.run_shell_command',
+            side_effect=[b'tests/configs/dependencies/kubetools.yml\n', b''],
+        ) as fake_run:
+            changed_app_dirs = _get_changed_app_dirs(app_dirs, 'origin/master')
+
+        fake_run.assert_any_call(
+            'git', 'diff', '--name-only', '--relative', 'origin/master', '--', *app_dirs,
+        )
+        self.assertEqual(changed_app_dirs, [path.join(CONFIGS_DIR, 'dependencies')])
+
+    def test_get_changed_app_dirs_untracked(self):
+        app_dirs = [
+            path.join(CONFIGS_DIR, 'basic_app'),
+            path.join(CONFIGS_DIR, 'dependencies'),
+        ]
+
+        with mock.patch(
+            'kubetools.cli.generate_config.run_shell_command',
+            side_effect=[b'', b'tests/configs/basic_app/kubetools.yml\n'],
+        ) as fake_run:
+            changed_app_dirs = _get_changed_app_dirs(app_dirs, 'origin/master')
+
+        fake_run.assert_called_with(
+            'git', 'ls-files', '--others', '--exclude-standard', '--', *app_dirs,
+        )
+        self.assertEqual(changed_app_dirs, [path.join(CONFIGS_DIR, 'basic_app')])
+
+    def test_render_app(self):
+        app_name, objects = _render_app(
+            path.join(CONFIGS_DIR, 'basic_app'),
+            env='staging',
+            replicas=1,
+            default_registry=None,
+        )
+
+        self.assertEqual(app_name, 'generic-app')
+        self.assertIn(
+            ('deployment', 'generic-app'),
+            [(kind, name) for kind, name, _ in objects],
+        )
+
+        output_dir = mkdtemp()
+        self.addCleanup(rmtree, output_dir)
+        _write_app_objects(output_dir, app_name, objects)
+
+        filenames = listdir(path.join(output_dir, app_name))
+        self.assertIn('deployment-generic-app.yml', filenames)
+
+        with open(path.join(output_dir, app_name, 'deployment-generic-app.yml')) as f:
+            self.assertEqual(yaml.safe_load(f)['kind'], 'Deployment')
+
+    def test_write_app_objects_removes_previous_objects(self):
+        output_dir = mkdtemp()
+        self.addCleanup(rmtree, output_dir)
+
+        _write_app_objects(output_dir, 'app', [
+            ('deployment', 'web', {'kind': 'Deployment'}),
+            ('deployment', 'worker', {'kind': 'Deployment'}),
+        ])
+        _write_app_objects(output_dir, 'app', [
+            ('deployment', 'web', {'kind': 'Deployment'}),
+        ])
+
+        self.assertEqual(listdir(path.join(output_dir, 'app')), ['deployment-web.yml'])
+
+    def test_render_duplicate_app_names_writes_nothing(self):
+        output_dir = mkdtemp()
+        self.addCleanup(rmtree, output_dir)
+
+        app_names = {'web': 'web', 'worker': 'worker', 'web-copy': 'web'}
+
+        def render_app(app_dir, env, replicas, default_registry):
+            return app_names[app_dir], [('deployment', 'app', {'kind': 'Deployment'})]
+
+        ctx = click.Context(render)
+        ctx.meta['kube_context'] = 'staging'
+
+        with mock.patch.object(
+            generate_config, '_get_app_dirs', return_value=list(app_names),
+        ), mock.patch.object(
+            generate_config, '_render_app', render_app,
+        ), mock.patch.object(
+            # Render in threads so the patched _render_app is used
+            generate_config, 'ProcessPoolExecutor', ThreadPoolExecutor,
+        ):
+            with self.assertRaises(KubeConfigError):
+                ctx.invoke(render, app_dirs=tuple(app_names), output_dir=output_dir)
+
+        # The duplicate is found before any app is written
+        self.assertEqual(listdir(output_dir), [])
@@ -0,0 +1,62 @@
+from threading import Event, Timer
+from time import time
+from unittest import mock, TestCase
+
+from kubetools.deploy import util
+from kubetools.deploy.util import run_shell_command
+from kubetools.exceptions import KubeBuildError
+
+
+class TestRunShellCommand(TestCase):
+    def test_output_returned(self):
+        output = run_shell_command('sh', '-c', 'echo out; echo err >&2')
+        self.assertEqual(output, b'out\nerr\n')
+
+    def test_env_added_to_environ(self):
+        with mock.patch.dict('os.environ', {'KUBETOOLS_TEST_ENVIRON': 'environ'}):
+            output = run_shell_command(
+                'sh', '-c', 'echo $KUBETOOLS_TEST_ENVIRON $KUBETOOLS_TEST_ENV',
+                env={'KUBETOOLS_TEST_ENV': 'env'},
+            )
+
+        self.assertEqual(output, b'environ env\n')
+
+    def test_output_streamed_to_handler(self):
+        lines = []
+
+        with mock.patch.object(util, 'OUTPUT_TAIL_LINES', 2):
+            output = run_shell_command(
+                'sh', '-c', 'echo 1; echo 2; echo 3',
+                output_handler=lines.append,
+            )
+
+        self.assertIsNone(output)
+        self.assertEqual(lines, ['1', '2', '3'])
+
+    def test_failure_includes_output_tail(self):
+        with mock.patch.object(util, 'OUTPUT_TAIL_LINES', 2):
+            with self.assertRaises(KubeBuildError) as context:
+                run_shell_command(
+                    'sh', '-c', 'echo 1; echo 2; echo 3; exit 1',
+                    output_handler=lambda line: None,
+                )
+
+        self.assertTrue(str(context.exception).endswith('\n\n2\n3\n'))
+
+    def test_timeout(self):
+        start = time()
+
+        with self.assertRaises(KubeBuildError) as context:
+            run_shell_command('sleep', '10', timeout=0.2)
+
+        self.assertIn('timed out', str(context.exception))
+        self.assertLess(time() - start, 5)
+
+    def test_cancel(self):
+        cancel_event = Event()
+        Timer(0.2, cancel_event.set).start()
+
+        with self.assertRaises(KubeBuildError) as context:
+            run_shell_command('sleep', '10', cancel_event=cancel_event)
+
+        self.assertIn('cancelled', str(context.exception))
@@ -0,0 +1,347 @@
+import signal
+
+from threading import Event
+from time import sleep
+from unittest import mock, TestCase
+
+import click
+
+from kubetools.dev import environment
+from kubetools.exceptions import KubeDevError
+
+from .util import start_patches
+
+TESTS = [
+    {'name': 'unit', 'command': ['pytest', 'unit']},
+    {'name': 'integration', 'command': ['pytest', 'integration']},
+    {'name': 'lint', 'command': ['flake8']},
+]
+
+
+def make_result(test, result, output=None):
+    return {
+        'name': test['name'],
+        'container': 'app',
+        'output': output,
+        'result': result,
+        'duration': 1,
+    }
+
+
+class TestRunTestsInParallel(TestCase):
+    def setUp(self):
+        self.fake_run_test, self.fake_kill_run_containers, self.fake_echo, _ = start_patches(
+            self,
+            mock.patch.object(environment, '_run_test'),
+            mock.patch.object(environment, 'kill_run_containers'),
+            mock.patch('click.echo'),
+            mock.patch.object(environment, 'find_container_for_config', return_value='app'),
+        )
+
+    def run_tests(self, results, fail_fast=True):
+        def run_test(kubetools_config, test, arguments, capture_output):
+            self.assertTrue(capture_output)
+            return results[test['name']](test)
+
+        self.fake_run_test.side_effect = run_test
+
+        return {
+            result['name']: result['result']
+            for result in environment._run_tests_in_parallel({}, TESTS, fail_fast=fail_fast)
+        }
+
+    def test_failure_without_fail_fast(self):
+        results = self.run_tests({
+            'unit': lambda test: make_result(test, 'failed'),
+            'integration': lambda test: make_result(test, 'passed'),
+            'lint': lambda test: make_result(test, 'passed'),
+        }, fail_fast=False)
+
+        self.assertEqual(results, {
+            'unit': 'failed',
+            'integration': 'passed',
+            'lint': 'passed',
+        })
+        self.fake_kill_run_containers.assert_not_called()
+
+    def test_fail_fast_cancels_running_tests(self):
+        running = Event()
+        lint_finished = Event()
+
+        def failing_test(test):
+            # Fail while the integration tests are still running
+            running.wait(1)
+            lint_finished.wait(1)
+            return make_result(test, 'failed')
+
+        def passing_test(test):
+            lint_finished.set()
+            return make_result(test, 'passed')
+
+        def killed_test(test):
+            running.set()
+            for _ in range(100):
+                if self.fake_kill_run_containers.called:
+                    break
+                sleep(0.01)
+            # The killed container exits non-zero
+            return make_result(test, 'failed')
+
+        results = self.run_tests({
+            'unit': failing_test,
+            'integration': killed_test,
+            'lint': passing_test,
+        })
+
+        self.assertEqual(results, {
+            'unit': 'failed',
+            'integration': 'cancelled',
+            'lint': 'passed',
+        })
+        self.fake_kill_run_containers.assert_called_once_with({})
+
+    def test_fail_fast_keeps_failures_finished_before_kill(self):
+        printing = Event()
+        finished = []
+
+        def echo(message=None, *args, **kwargs):
+            if message and 'lint' in message and not printing.is_set():
+                # Hold the output lock until both failing tests have finished
+                printing.set()
+                for _ in range(100):
+                    if len(finished) == 2:
+                        break
+                    sleep(0.01)
+                sleep(0.1)
+
+        self.fake_echo.side_effect = echo
+
+        def failing_test(test):
+            printing.wait(1)
+            finished.append(test['name'])
+            return make_result(test, 'failed')
+
+        results = self.run_tests({
+            'unit': failing_test,
+            'integration': failing_test,
+            'lint': lambda test: make_result(test, 'passed'),
+        })
+
+        # Both failed at the same time, before either killed the other
+        self.assertEqual(results, {
+            'unit': 'failed',
+            'integration': 'failed',
+            'lint': 'passed',
+        })
+        self.fake_kill_run_containers.assert_called_once_with({})
+
+    def test_fail_fast_skips_tests_not_started(self):
+        with mock.patch.object(
+            environment, 'run_in_threads',
+            # Run the tests one after another
+            side_effect=lambda function, items: [function(item) for item in items],
+        ):
+            results = self.run_tests({
+                'unit': lambda test: make_result(test, 'failed'),
+                'integration': lambda test: make_result(test, 'passed'),
+                'lint': lambda test: make_result(test, 'passed'),
+            })
+
+        self.assertEqual(results, {
+            'unit': 'failed',
+            'integration': 'skipped',
+            'lint': 'skipped',
+        })
+
+
+class TestTestCommand(TestCase):
+    def setUp(self):
+        (
+            self.fake_up, self.fake_run_test, self.fake_run_tests_in_parallel,
+            self.fake_destroy, self.fake_echo, _,
+        ) = start_patches(
+            self,
+            mock.patch.object(environment, 'up'),
+            mock.patch.object(environment, '_run_test'),
+            mock.patch.object(environment, '_run_tests_in_parallel'),
+            mock.patch.object(environment, 'destroy'),
+            mock.patch('click.echo'),
+            mock.patch.object(environment, 'find_container_for_config', return_value='app'),
+        )
+
+    def run_test(self, **kwargs):
+        kubetools_config = {
+            'env': 'test',
+            'tests': TESTS,
+        }
+
+        ctx = click.Context(environment.test, obj=kubetools_config)
+        ctx.invoke(environment.test, **kwargs)
+
+    def get_echoed(self):
+        return '\n'.join(
+            str(call[0][0]) for call in self.fake_echo.call_args_list
+            if call[0]
+        )
+
+    def test_sequential_tests(self):
+        self.fake_run_test.side_effect = (
+            lambda config, test, arguments: make_result(test, 'passed')
+        )
+
+        self.run_test(arguments=('-x',))
+
+        self.assertEqual(
+            [call[0][1:] for call in self.fake_run_test.call_args_list],
+            [(test, ('-x',)) for test in TESTS],
+        )
+        self.fake_run_tests_in_parallel.assert_not_called()
+        self.fake_up.assert_called_once_with(is_testing=True)
+        self.fake_destroy.assert_called_once_with()
+
+    def test_sequential_fail_fast(self):
+        self.fake_run_test.side_effect = (
+            lambda config, test, arguments: make_result(
+                test, 'failed' if test['name'] == 'unit' else 'passed',
+            )
+        )
+
+        with self.assertRaises(KubeDevError) as context:
+            self.run_test(fail_fast=True)
+
+        self.assertEqual(self.fake_run_test.call_count, 1)
+        self.assertEqual(
+            context.exception.args[0],
+            '3/3 tests did not pass: unit, integration, lint',
+        )
+        self.fake_destroy.assert_called_once_with()
+
+    def test_parallel_tests(self):
+        self.fake_run_tests_in_parallel.return_value = [
+            make_result(test, 'passed') for test in TESTS
+        ]
+
+        self.run_test(parallel=True, fail_fast=True, arguments=('-x',))
+
+        self.fake_run_tests_in_parallel.assert_called_once_with(
+            mock.ANY, TESTS,
+            arguments=('-x',),
+            fail_fast=True,
+        )
+        self.fake_run_test.assert_not_called()
+
+    def test_results_table(self):
+        self.fake_run_tests_in_parallel.return_value = [
+            make_result(TESTS[0], 'passed'),
+            make_result(TESTS[1], 'failed'),
+            make_result(TESTS[2], 'cancelled'),
+        ]
+
+        with self.assertRaises(KubeDevError) as context:
+            self.run_test(parallel=True)
+
+        self.assertEqual(
+            context.exception.args[0],
+            '2/3 tests did not pass: integration, lint',
+        )
+
+        table_lines = click.unstyle(self.get_echoed()).splitlines()
+        header_index = next(
+            index for index, line in enumerate(table_lines)
+            if line.split() == ['Test', 'Container', 'Result', 'Duration']
+        )
+        self.assertEqual(
+            [line.split() for line in table_lines[header_index + 2:header_index + 5]],
+            [
+                ['unit', 'app', 'PASSED', '1.0s'],
+                ['integration', 'app', 'FAILED', '1.0s'],
+                ['lint', 'app', 'CANCELLED', '1.0s'],
+            ],
+        )
+
+    def test_no_tests(self):
+        ctx = click.Context(environment.test, obj={'env': 'test'})
+
+        with self.assertRaises(KubeDevError):
+            ctx.invoke(environment.test)
+
+        self.fake_destroy.assert_called_once_with()
+
+
+class TestIsolatedTestCommand(TestCase):
+    def setUp(self):
+        (
+            self.fake_up, self.fake_signal, self.fake_destroy_containers,
+            self.fake_remove_compose_config, self.fake_destroy, _, _,
+        ) = start_patches(
+            self,
+            mock.patch.object(environment, 'up'),
+            mock.patch.object(environment, 'signal'),
+            mock.patch.object(environment, 'destroy_containers'),
+            mock.patch.object(environment, 'remove_compose_config'),
+            mock.patch.object(environment, 'destroy'),
+            mock.patch.object(environment, '_run_test', side_effect=(
+                lambda config, test, arguments: make_result(test, 'passed')
+            )),
+            mock.patch('click.echo'),
+        )
+
+        self.kubetools_config = {
+            'env': 'test',
+            'tests': TESTS,
+        }
+
+    def run_test(self, **kwargs):
+        ctx = click.Context(environment.test, obj=self.kubetools_config)
+        ctx.invoke(environment.test, **kwargs)
+
+    def assert_destroyed(self):
+        self.fake_destroy_containers.assert_called_once_with(
+            self.kubetools_config,
+            remove_images=True,
+        )
+        self.fake_remove_compose_config.assert_called_once_with(self.kubetools_config)
+        self.fake_destroy.assert_not_called()
+
+    def test_run_id(self):
+        self.run_test(run_id='ci-1234')
+
+        self.assertEqual(self.kubetools_config['env'], 'test-ci-1234')
+        self.assertTrue(self.kubetools_config['_ephemeral_ports'])
+        self.assert_destroyed()
+
+    def test_random_run_id(self):
+        self.run_test(isolated=True)
+
+        self.assertRegex(self.kubetools_config['env'], r'^test-[0-9a-f]{8}$')
+        self.assertTrue(self.kubetools_config['_ephemeral_ports'])
+
+    def test_not_isolated(self):
+        self.run_test()
+
+        self.assertEqual(self.kubetools_config['env'], 'test')
+        self.assertNotIn('_ephemeral_ports', self.kubetools_config)
+        self.fake_signal.assert_not_called()
+        self.fake_destroy_containers.assert_not_called()
+        self.fake_destroy.assert_called_once_with()
+
+    def test_sigterm_tears_down(self):
+        def up(is_testing):
+            # Simulate a CI cancellation while bringing the environment up
+            signum, handler = self.fake_signal.call_args[0]
+            handler(signum, None)
+
+        self.fake_up.side_effect = up
+
+        with self.assertRaises(SystemExit) as context:
+            self.run_test(isolated=True)
+
+        self.fake_signal.assert_called_once_with(signal.SIGTERM, mock.ANY)
+        self.assertEqual(context.exception.code, 128 + signal.SIGTERM)
+        self.assert_destroyed()
+
+    def test_keep_containers(self):
+        self.run_test(isolated=True, keep_containers=True)
+
+        self.fake_destroy_containers.assert_not_called()
+        self.fake_remove_compose_config.assert_not_called()
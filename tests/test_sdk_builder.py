@@ -0,0 +1,80 @@
+import tarfile
+
+from os import makedirs, path
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import mock, TestCase
+
+from kubetools.deploy.build import Build
+from kubetools.deploy.sdk_builder import _log_build_output, make_context_archive
+from kubetools.exceptions import KubeBuildError
+
+
+class TestContextArchive(TestCase):
+    def setUp(self):
+        self.app_dir = mkdtemp()
+        self.addCleanup(rmtree, self.app_dir)
+
+        for filename, data in (
+            ('.dockerignore', 'docker\nlocal\n'),
+            (path.join('docker', 'Dockerfile.web'), 'FROM python'),
+            (path.join('docker', 'Dockerfile.worker'), 'FROM python'),
+            (path.join('local', 'notes.txt'), 'notes'),
+            (path.join('app', 'main.py'), 'print(1)'),
+        ):
+            filename = path.join(self.app_dir, filename)
+            makedirs(path.dirname(filename), exist_ok=True)
+            with open(filename, 'w') as f:
+                f.write(data)
+
+    def test_archive_includes_ignored_dockerfiles(self):
+        context_archive = make_context_archive(self.app_dir, [
+            'docker/Dockerfile.web',
+            'docker/Dockerfile.worker',
+        ])
+        self.addCleanup(context_archive.close)
+
+        with tarfile.open(fileobj=context_archive) as archive:
+            names = archive.getnames()
+
+        self.assertIn('app/main.py', names)
+        self.assertIn('docker/Dockerfile.web', names)
+        self.assertIn('docker/Dockerfile.worker', names)
+        self.assertNotIn('local/notes.txt', names)
+
+
+class TestBuildOutput(TestCase):
+    def setUp(self):
+        self.build = Build('staging', 'default')
+        patch = mock.patch.object(self.build, 'log_info')
+        self.addCleanup(patch.stop)
+        self.log_info = patch.start()
+
+    def test_output_logged(self):
+        image_id = _log_build_output(self.build, [
+            {'status': 'Pulling from library/python', 'id': '3.8'},
+            {'status': 'Downloading', 'id': 'abc', 'progress': '[=>   ]'},
+            {'status': 'Downloading', 'id': 'abc', 'progress': '[==> ]'},
+            {'stream': 'Step 1/2 : FROM python\n'},
+            {'stream': ' ---> 1234\n'},
+            {'aux': {'ID': 'sha256:c0ffee'}},
+            {'stream': 'Successfully built c0ffee\n'},
+        ])
+
+        self.assertEqual(image_id, 'sha256:c0ffee')
+        self.assertEqual([call[0][0] for call in self.log_info.call_args_list], [
+            '3.8 Pulling from library/python',
+            'abc Downloading',
+            'Step 1/2 : FROM python',
+            ' ---> 1234',
+            'Successfully built c0ffee',
+        ])
+
+    def test_error_raised(self):
+        with self.assertRaises(KubeBuildError) as context:
+            _log_build_output(self.build, [
+                {'stream': 'Step 2/2 : RUN make\n'},
+                {'error': 'The command returned a non-zero code: 2'},
+            ])
+
+        self.assertIn('Step 2/2 : RUN make', str(context.exception))
@@ -0,0 +1,59 @@
+from io import StringIO
+from threading import Event
+from time import sleep
+from unittest import mock, TestCase
+
+from kubetools.cli import server_util
+from kubetools.cli.server_util import ProgressDisplay, wait_with_spinner
+
+from .util import start_patches
+
+
+class TestProgressDisplay(TestCase):
+    def setUp(self):
+        self.stdout = StringIO()
+
+        start_patches(
+            self,
+            mock.patch.object(server_util, 'IS_TTY', True),
+            mock.patch.object(server_util, 'TERMINAL_WIDTH', 100),
+            mock.patch.object(server_util, 'CLEAR_LINE', '<clear>'),
+            mock.patch.object(server_util, 'STDOUT', self.stdout),
+        )
+
+    def test_display_renders_a_line_per_task(self):
+        display = ProgressDisplay()
+
+        build = display.add_task('build app')
+        build.update('Step 1/4')
+        probe = display.add_task('probe db')
+
+        # Wait for both tasks to be drawn
+        for _ in range(50):
+            if 'probe db' in self.stdout.getvalue():
+                break
+            sleep(0.05)
+
+        build.done()
+        probe.done()
+
+        output = self.stdout.getvalue()
+        self.assertIn('build app in progress (status = Step 1/4)', output)
+        self.assertIn('probe db in progress', output)
+        self.assertTrue(output.endswith('<clear>'))
+        self.assertIsNone(display.render_thread)
+
+    def test_wait_with_spinner_wakes_on_event(self):
+        event = Event()
+        statuses = ['first', 'second', None]
+
+        def check_status(previous_status):
+            status = statuses.pop(0)
+            event.set()
+            return status
+
+        with mock.patch.object(server_util, 'PROGRESS_DISPLAY', ProgressDisplay()):
+            # A check interval of 100s would hang the test without the event
+            wait_with_spinner(check_status, check_status_divisor=100, tick_divisor=1, event=event)
+
+        self.assertEqual(statuses, [])
@@ -0,0 +1,124 @@
+from unittest import mock, TestCase
+
+import click
+
+from kubetools.dev import environment
+from kubetools.exceptions import KubeDevError
+
+DEPENDENCIES = {
+    'mariadb': {'testResetCommand': 'mysql -e "DROP DATABASE IF EXISTS test"'},
+    'redis': {'testResetCommand': ['redis-cli', 'FLUSHALL']},
+    'elasticsearch': {'testResetCommand': ['curl', '-XDELETE', 'localhost:9200/_all']},
+    'memcached': {},
+}
+
+
+def make_status(up):
+    return {'id': 'container-id', 'up': up}
+
+
+class TestResetWarmDependencies(TestCase):
+    def test_reset_warm_dependencies(self):
+        with mock.patch.object(
+            environment, 'get_containers_status', return_value={
+                'mariadb': make_status(True),
+                'redis': make_status(True),
+                'elasticsearch': make_status(False),
+                'memcached': make_status(True),
+            },
+        ), mock.patch.object(
+            environment, 'get_all_containers_by_name', return_value=DEPENDENCIES,
+        ), mock.patch.object(
+            environment, 'start_containers',
+        ) as fake_start_containers, mock.patch.object(
+            environment, 'exec_container',
+        ) as fake_exec_container, mock.patch('click.echo'):
+            with self.assertLogs('kubetools', level='WARNING') as logs:
+                environment._reset_warm_dependencies({})
+
+        # Stopped dependencies are started so they can be reset
+        fake_start_containers.assert_called_once_with({}, ['elasticsearch'])
+
+        self.assertEqual(
+            [call[0][1:3] for call in fake_exec_container.call_args_list],
+            [
+                ('mariadb', ['sh', '-c', 'mysql -e "DROP DATABASE IF EXISTS test"']),
+                ('redis', ['redis-cli', 'FLUSHALL']),
+                ('elasticsearch', ['curl', '-XDELETE', 'localhost:9200/_all']),
+            ],
+        )
+        self.assertTrue(all(
+            call[1]['capture_output']
+            for call in fake_exec_container.call_args_list
+        ))
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('memcached has no testResetCommand', logs.output[0])
+
+    def test_missing_dependencies_not_reset(self):
+        with mock.patch.object(
+            environment, 'get_containers_status', return_value={
+                'mariadb': {'id': None, 'up': None},
+            },
+        ), mock.patch.object(
+            environment, 'get_all_containers_by_name', return_value={
+                'mariadb': DEPENDENCIES['mariadb'],
+            },
+        ), mock.patch.object(
+            environment, 'start_containers',
+        ) as fake_start_containers, mock.patch.object(
+            environment, 'exec_container',
+        ) as fake_exec_container:
+            environment._reset_warm_dependencies({})
+
+        # Fresh containers (first run/config changed) are created by up
+        fake_start_containers.assert_not_called()
+        fake_exec_container.assert_not_called()
+
+
+class TestWarmPoolTest(TestCase):
+    def run_test(self, **kwargs):
+        kubetools_config = {
+            'env': 'test',
+            'tests': [{'name': 'unit', 'command': ['pytest']}],
+        }
+
+        ctx = click.Context(environment.test, obj=kubetools_config)
+        ctx.invoke(environment.test, **kwargs)
+
+    def test_warm_pool(self):
+        with mock.patch.object(
+            environment, '_reset_warm_dependencies',
+        ) as fake_reset_warm_dependencies, mock.patch.object(
+            environment, 'up',
+        ) as fake_up, mock.patch.object(
+            environment, '_run_test', return_value={
+                'name': 'unit',
+                'container': 'app',
+                'output': None,
+                'result': 'passed',
+                'duration': 1,
+            },
+        ), mock.patch.object(
+            environment, 'get_all_containers_by_name', return_value={'app': {}},
+        ) as fake_get_all_containers_by_name, mock.patch.object(
+            environment, 'destroy_containers',
+        ) as fake_destroy_containers, mock.patch.object(
+            environment, 'kill_run_containers',
+        ) as fake_kill_run_containers, mock.patch.object(
+            environment, 'destroy',
+        ) as fake_destroy, mock.patch('click.echo'):
+            self.run_test(warm_pool=True)
+
+        fake_reset_warm_dependencies.assert_called_once()
+        fake_up.assert_called_once_with(is_testing=True)
+
+        # Only the deployment containers are removed, dependencies are kept
+        self.assertEqual(fake_get_all_containers_by_name.call_args[0][1], ('deployments',))
+        self.assertEqual(fake_destroy_containers.call_args[0][1], ['app'])
+        fake_kill_run_containers.assert_called_once_with(mock.ANY, remove=True)
+        fake_destroy.assert_not_called()
+
+    def test_warm_pool_cannot_be_isolated(self):
+        with self.assertRaises(KubeDevError):
+            self.run_test(warm_pool=True, isolated=True)
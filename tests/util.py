@@ -0,0 +1,12 @@
+def start_patches(test_case, *patches):
+    '''
+    Start patches for the rest of a test (eg from setUp), returning the mocks.
+    '''
+
+    mocks = []
+
+    for patch in patches:
+        mocks.append(patch.start())
+        test_case.addCleanup(patch.stop)
+
+    return mocks